@@ -1,4 +1,4 @@
-from django.http import HttpResponse
+from django.http import HttpResponse, Http404
 from django.contrib.syndication.views import Feed
 from utility.custom_feed import ContentEncodedFeed
 from utility.location import get_ip_location, get_nearby_locations
@@ -17,7 +17,7 @@ from company.models import Testimonial
 from django.utils.text import Truncator
 from django.utils.html import strip_tags
 
-from locations.trie_cache import get_place_trie, get_district_trie, get_state_trie
+from locations.trie_cache import get_location_resolver
 
 from company.models import Company
 
@@ -135,25 +135,13 @@ class StyledDetailFeed(DetailFeed):
         feedgen.write(response, 'utf-8')
         return response
 
-MATCH_ORDER = [
-    ("state", get_state_trie, UniqueState),
-    ("district", get_district_trie, UniqueDistrict),
-    ("place", get_place_trie, UniquePlace),
-]
-
-def retrieve(slug):                 
-    # for model_type, trie, model, serializer_class in MATCH_ORDER:
-    for model_type, get_trie_fn, model in MATCH_ORDER:
-        trie = get_trie_fn()
-        matched_slug = trie.match_suffix(slug)
-        if matched_slug:
-            try:
-                instance = model.objects.get(slug=matched_slug)
-                return model_type, instance
-                
-            except model.DoesNotExist:
-                return None, None
-        
+def retrieve(slug):
+    match = get_location_resolver().resolve(slug)
+    if not match:
+        return None, None
+
+    return match.location_type, match
+
 
 class MultipageFeed(Feed):
     feed_type = ContentEncodedFeed
@@ -170,6 +158,9 @@ class MultipageFeed(Feed):
         
         else:
             _, location = retrieve(slug)
+            if not location:
+                raise Http404("No location matched the slug")
+
             self.region_slug = self.slug
             self.slug = slug.replace(location.slug, "place_name")
 
@@ -0,0 +1,133 @@
+import random
+
+from django.core.cache import cache
+
+from locations.models import Place
+from service.models import Service
+
+PINCODE_PLACES_KEY = "pincode_places:{}"
+PINCODE_PLACES_TIMEOUT = 60 * 60 * 6
+
+# The service part of the schema.org ItemList is shared by every pincode.
+# Bumping the version (on any service or company change) orphans the cached
+# fragment; a new random sample is also drawn when the fragment expires.
+SERVICE_SCHEMA_VERSION_KEY = "service_schema:version"
+SERVICE_SCHEMA_KEY = "service_schema:{}"
+SERVICE_SCHEMA_TIMEOUT = 60 * 10
+SERVICE_SCHEMA_SAMPLE_SIZE = 50
+
+
+def get_pincode_places(pincode):
+    """Places of a pincode and the location of the first one, cached per pincode."""
+    key = PINCODE_PLACES_KEY.format(pincode)
+
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    places = Place.objects.filter(pincode = pincode).distinct().order_by("name")
+
+    payload = {"places": list(places.values("name", "slug")), "location": None}
+
+    first_location = places.select_related("district", "state").first()
+    if first_location:
+        payload["location"] = {
+            "place": first_location.name,
+            "district": first_location.district.name,
+            "state": first_location.state.name,
+            "latitude": first_location.latitude,
+            "longitude": first_location.longitude,
+        }
+
+    cache.set(key, payload, timeout=PINCODE_PLACES_TIMEOUT)
+    return payload
+
+
+def invalidate_pincode_places(*pincodes):
+    keys = [PINCODE_PLACES_KEY.format(pincode) for pincode in pincodes if pincode is not None]
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_service_schema():
+    try:
+        cache.add(SERVICE_SCHEMA_VERSION_KEY, 0, timeout=None)
+        cache.incr(SERVICE_SCHEMA_VERSION_KEY)
+    except ValueError:
+        # Key evicted between add and incr
+        cache.set(SERVICE_SCHEMA_VERSION_KEY, 1, timeout=None)
+
+
+def get_service_schema_items():
+    """Location independent part of the ItemList entries for a random sample of services."""
+    key = SERVICE_SCHEMA_KEY.format(cache.get(SERVICE_SCHEMA_VERSION_KEY, 0))
+
+    items = cache.get(key)
+    if items is not None:
+        return items
+
+    service_ids = list(Service.objects.values_list("id", flat=True))
+    sample = random.sample(service_ids, min(SERVICE_SCHEMA_SAMPLE_SIZE, len(service_ids)))
+
+    items = []
+    for service in Service.objects.filter(id__in=sample).select_related("company"):
+        items.append({
+            "provider_name": f"{service.company.name}",
+            "provider_url": f"https://www.bzindia.in/company/{service.company.slug}",
+            "provider_logo": f"https://www.bzindia.in{service.company.logo.url if service.company.logo else '/#'}",
+            "name": f"{service.name}",
+            "description": f"{service.description}",
+            "image": f"https://www.bzindia.in/{service.image.url if service.image else '#'}",
+            "url": f"https://www.bzindia.in/service/{service.slug}",
+        })
+
+    cache.set(key, items, timeout=SERVICE_SCHEMA_TIMEOUT)
+    return items
+
+
+def get_service_schema(pincode, location):
+    """schema.org ItemList of services offered at `location`, in a fresh random order."""
+    items = get_service_schema_items()
+
+    address = {
+        "@type": "PostalAddress",
+        "streetAddress": f"{location['place']}",
+        "addressLocality": f"{location['district']}",
+        "addressRegion": f"{location['state']}",
+        "postalCode": f"{pincode}",
+        "addressCountry": "IN"
+    }
+    geo = {
+        "@type": "Place",
+        "geo": {
+            "@type": "GeoCoordinates",
+            "latitude": f"{location['latitude']}",
+            "longitude": f"{location['longitude']}"
+        }
+    }
+
+    return {
+        "@context": "http://schema.org",
+        "@type": "ItemList",
+        "itemListElement": [
+            {
+                "@type": "ListItem",
+                "position": f"{index + 1}",
+                "item": {
+                    "@type": "Service",
+                    "provider": {
+                        "@type": "Organization",
+                        "name": item["provider_name"],
+                        "url": item["provider_url"],
+                        "logo": item["provider_logo"],
+                        "address": address,
+                        "location": geo
+                    },
+                    "name": item["name"],
+                    "description": item["description"],
+                    "image": item["image"],
+                    "url": item["url"]
+                }
+            } for index, item in enumerate(random.sample(items, len(items)))
+        ]
+    }
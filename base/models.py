@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.text import slugify
+from utility.slugs import allocate_slug
 from ckeditor.fields import RichTextField
 
 class MetaTag(models.Model):
@@ -24,15 +25,7 @@ class MetaTag(models.Model):
         if not self.slug:
             base_slug = slugify(self.name)
 
-            slug = base_slug
-            count = 1
-
-            while MetaTag.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-
-                count += 1
-
-            self.slug = slug     
+            self.slug = allocate_slug(MetaTag, base_slug)
 
         super().save(*args, **kwargs)
 
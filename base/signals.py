@@ -0,0 +1,26 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from company.models import Company
+from locations.models import Place
+from service.models import Service
+
+from .local_places import invalidate_pincode_places, invalidate_service_schema
+
+
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=Company)
+def service_schema_changed(sender, **kwargs):
+    invalidate_service_schema()
+
+
+@receiver(post_init, sender=Place)
+def remember_place_pincode(sender, instance, **kwargs):
+    # The pincode as loaded, so moving a place also clears its old pincode
+    instance._cached_pincode = instance.__dict__.get("pincode")
+
+
+@receiver([post_save, post_delete], sender=Place)
+def pincode_places_changed(sender, instance, **kwargs):
+    invalidate_pincode_places(instance.pincode, getattr(instance, "_cached_pincode", None))
+    instance._cached_pincode = instance.pincode
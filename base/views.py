@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect
 from django.views.generic import View
 from django.urls import reverse_lazy
 from django.http import JsonResponse
+from django.conf import settings
 from django.db.models import Q
 import requests, os, logging
 
@@ -10,8 +11,12 @@ from company.models import Company, CompanyType
 from directory.models import TouristAttraction
 from locations.models import Place
 from locations.models import IndianLocation, SuburbLocationData, IndiaLocationData
+from locations.spatial import nearest_pincode
+from utility.geocoding import opencage_geocode
+from utility.quota import QuotaExhausted, get_opencage_limiter
+
+from .local_places import get_pincode_places, get_service_schema
 
-import hashlib
 
 
 
@@ -42,71 +47,22 @@ class GetLocalPlacesView(View):
     def get(self, request, *args, **kwargs):
         pincode = self.kwargs.get("pincode")
 
-        places = Place.objects.filter(pincode = pincode).distinct().order_by("name")
-        list_places = list(places.values("name", "slug"))
+        payload = get_pincode_places(pincode)
 
         data = {
-            "success": True, "places": list_places, "pincode": pincode
+            "success": True, "places": payload["places"], "pincode": pincode
         }
 
-        first_location = places.first() if places else None
-
-        if first_location:
-            place = first_location.name
-            district = first_location.district.name
-            state = first_location.state.name
-            latitude = first_location.latitude
-            longitude = first_location.longitude
+        location = payload["location"]
 
+        if location:
             data.update({
-                "place": place,
-                "district": district,
-                "state": state
+                "place": location["place"],
+                "district": location["district"],
+                "state": location["state"]
             })
 
-            services = Service.objects.all().order_by("?")
-
-            service_schema = {
-                "@context": "http://schema.org",
-                "@type": "ItemList",
-                "itemListElement": [
-                    {
-                    "@type": "ListItem",
-                    "position": f"{index + 1}",
-                    "item": {
-                        "@type": "Service",
-                        "provider": {
-                        "@type": "Organization",
-                        "name": f"{service.company.name}",
-                        "url": f"https://www.bzindia.in/company/{service.company.slug}",
-                        "logo": f"https://www.bzindia.in{service.company.logo.url if service.company.logo else '/#'}",
-                        "address": {
-                            "@type": "PostalAddress",
-                            "streetAddress": f"{place}",
-                            "addressLocality": f"{district}",
-                            "addressRegion": f"{state}",
-                            "postalCode": f"{pincode}",
-                            "addressCountry": "IN"
-                        },
-                        "location": {
-                            "@type": "Place",
-                            "geo": {
-                            "@type": "GeoCoordinates",
-                            "latitude": f"{latitude}",
-                            "longitude": f"{longitude}"
-                            }
-                        }
-                        },
-                        "name": f"{service.name}",
-                        "description": f"{service.description}",
-                        "image": f"https://www.bzindia.in/{service.image.url if service.image else '#'}",
-                        "url": f"https://www.bzindia.in/service/{service.slug}"
-                    }
-                    } for index, service in enumerate(services)
-                ]
-            }
-
-            data["service_schema"] = service_schema
+            data["service_schema"] = get_service_schema(pincode, location)
 
         return JsonResponse(data)
 
@@ -120,27 +76,41 @@ class GetPincodeView(View):
             latitude = self.kwargs.get("latitude")
             longitude = self.kwargs.get("longitude")
 
-            opencage_api = os.getenv('OPENCAGE_API_KEY_1') 
-
-            if not latitude or not longitude or not opencage_api:
+            try:
+                latitude = float(latitude)
+                longitude = float(longitude)
+            except (TypeError, ValueError):
                 return JsonResponse({"failed": True, "message": "Bad Request"}, status=400)
 
-            url = f'https://api.opencagedata.com/geocode/v1/json?q={latitude}+{longitude}&key={opencage_api}'
+            pincode = nearest_pincode(latitude, longitude, settings.REVERSE_GEOCODE_MAX_KM)
 
-            response = requests.get(url)
-            data = response.json()
+            if not pincode and settings.REVERSE_GEOCODE_OPENCAGE_FALLBACK:
+                pincode = self.get_opencage_pincode(latitude, longitude)
 
-            if not data['results'] or not data['results'][0]['components']['postcode']:
+            if not pincode:
                 return JsonResponse({"failed": True, "message": "Not Found"}, status=404)
 
-            pincode = data['results'][0]['components']['postcode']
-
             return redirect(reverse_lazy('base:get_places', kwargs = {'pincode': pincode}))
         
         except Exception as e:
             logger.exception(f"Error in get function of GetPincodeView of base app: {e}")
             return JsonResponse({"failed": True, "message": "An unexpected error occured"}, status=500)
 
+    def get_opencage_pincode(self, latitude, longitude):
+        opencage_api, limiter = get_opencage_limiter('OPENCAGE_API_KEY_1')
+        if not opencage_api:
+            return None
+
+        try:
+            data, _ = opencage_geocode(f'{latitude}+{longitude}', opencage_api, limiter=limiter)
+        except QuotaExhausted:
+            return None
+
+        if not data['results']:
+            return None
+
+        return data['results'][0]['components'].get('postcode')
+
 
 from product.models import (
     Product, Category as ProductCategory, SubCategory as ProductSubCategory,
@@ -442,103 +412,10 @@ def update_slugs():
 
 
 def populate_indian_locations(batch_size=5000):
-    
-    queryset = IndiaLocationData.objects.filter(json_data__isnull=False).order_by("id")
-    total = queryset.count()
-    print(f"Processing {total} records...")
-
-    for start in range(0, total, batch_size):
-        batch = list(queryset[start:start + batch_size])
-        if not batch:
-            continue
-
-        # Preload existing IndianLocation by source_id
-        existing_ids = set(IndianLocation.objects.filter(
-            source_id__in=[item.id for item in batch]
-        ).values_list('source_id', flat=True))
-
-        creates, updates = [], []
-        data_updates = []
+    from locations.utils.normalize import populate_indian_locations as normalize_indian_locations
 
-        for item in batch:
-            json_data = item.json_data
-            if not json_data:
-                continue
-
-            # Compute JSON hash
-            json_string = str(json_data).encode('utf-8')
-            json_hash = hashlib.sha256(json_string).hexdigest()
-
-            # Skip if already processed same JSON
-            if item.json_hash == json_hash:
-                continue
-
-            results = json_data.get("results", [])
-            if not results:
-                continue
-
-            components = results[0].get("components", {})
-            geometry = results[0].get("geometry", {})
-
-            # Prepare IndianLocation data
-            loc_data = {
-                "source_id": item.id,
-                "country": components.get("country"),
-                "country_code": components.get("country_code"),
-                "state": components.get("state"),
-                "state_code": components.get("state_code"),
-                "district": components.get("state_district"),
-                "county": components.get("county"),
-                "city": components.get("city"),
-                "town": components.get("town"),
-                "village": components.get("village"),
-                "suburb": components.get("suburb"),
-                "city_district": components.get("city_district"),
-                "postcode": components.get("postcode"),
-                "place_type": components.get("_type"),
-                "latitude": geometry.get("lat"),
-                "longitude": geometry.get("lng"),
-                "iso_codes": {
-                    "alpha2": components.get("ISO_3166-1_alpha-2"),
-                    "alpha3": components.get("ISO_3166-1_alpha-3"),
-                    "iso_2": components.get("ISO_3166-2"),
-                },
-                "formatted": results[0].get("formatted"),
-                "confidence": results[0].get("confidence"),
-                "json_hash": json_hash,
-            }
-
-            if item.id in existing_ids:
-                # Existing row → update
-                loc = IndianLocation(source_id=item.id, **loc_data)
-                updates.append(loc)
-            else:
-                # New row → create
-                loc = IndianLocation(**loc_data)
-                creates.append(loc)
-
-            # Schedule IndiaLocationData hash update
-            item.json_hash = json_hash
-            data_updates.append(item)
-
-        with transaction.atomic():
-            if creates:
-                IndianLocation.objects.bulk_create(creates, batch_size=batch_size)
-            if updates:
-                IndianLocation.objects.bulk_update(
-                    updates,
-                    [
-                        "country", "country_code", "state", "state_code", "district",
-                        "city", "town", "village", "suburb", "city_district", "postcode",
-                        "place_type", "latitude", "longitude",
-                        "iso_codes", "formatted", "confidence", "json_hash",
-                    ],
-                    batch_size=batch_size
-                )
-            if data_updates:
-                IndiaLocationData.objects.bulk_update(data_updates, ["json_hash"])
-
-        print(f"✅ Processed {min(start + batch_size, total)} / {total} records")
+    processed, changed = normalize_indian_locations(batch_size=batch_size)
+    print(f"✅ Processed {processed} records, {changed} changed")
 
 
 def get_suburb_locations():
@@ -546,8 +423,7 @@ def get_suburb_locations():
 
     logger = logging.getLogger(__name__)
 
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
-    api_key = os.getenv('OPENCAGE_API_KEY_1')
+    api_key, limiter = get_opencage_limiter('OPENCAGE_API_KEY_1')
 
     if not api_key:
         logger.error("Missing OPENCAGE_API_KEY_1 in environment variables.")
@@ -569,13 +445,7 @@ def get_suburb_locations():
             if SuburbLocationData.objects.filter(requested_place=suburb).exists():
                 continue
 
-            response = requests.get(base_url, params={
-                "q": suburb,
-                "key": api_key
-            }, timeout=10)
-
-            response.raise_for_status()
-            data = response.json()
+            data, cached = opencage_geocode(suburb, api_key, limiter=limiter, timeout=10)
 
             if "results" in data and data["results"]:
                 first_result = data["results"][0]
@@ -595,14 +465,17 @@ def get_suburb_locations():
                         )
 
                     logger.info(f"[{index}/{total}] ✅ Created: {address}")
-                    time.sleep(0.5)
 
                 else:
                     logger.warning(f"⚠️ Skipped '{suburb}' — country={country}")
 
+        except QuotaExhausted:
+            logger.info("You have used up your daily API call limit.")
+            return
+
         except requests.exceptions.RequestException as e:
             logger.error(f"Network/API error for '{suburb}': {e}")
-            time.sleep(2)
+            limiter.pause(2)
 
         except Exception as e:
             logger.exception(f"Unexpected error for '{suburb}': {e}")
@@ -610,61 +483,8 @@ def get_suburb_locations():
             continue
 
 
-def update_suburb_of_indian_locations(batch_size=100):
-    # queryset = SuburbLocationData.objects.filter(json_data__isnull=False).order_by("id")[:batch_size]
-    queryset = SuburbLocationData.objects.all().order_by("id")[:batch_size]
-    total = queryset.count()
-    print(f"Processing {total} records...")
-
-    for index, item in enumerate(queryset, start=1):
-        
-        updating_objs = IndianLocation.objects.filter(suburb=item.requested_place)
-        if not updating_objs.exists():
-            print(f"⚠️ No IndianLocation found for suburb '{item.requested_place}'")
-            continue
-
-        json_data = item.json_data
-        if not json_data:
-            continue
+def update_suburb_of_indian_locations(batch_size=1000):
+    from locations.utils.normalize import update_suburb_districts
 
-        
-        json_string = str(json_data).encode("utf-8")
-        json_hash = hashlib.sha256(json_string).hexdigest()
-
-        
-        # if item.json_hash == json_hash:
-        #     continue
-
-        results = json_data.get("results")
-        if not results:
-            continue  
-
-        districts = set()  
-
-        for result in results:
-            components = result.get("components", {})
-            suburb = components.get("suburb")
-            state_district = components.get("state_district")
-
-            if suburb == "R/S Ward":
-                print(components)
-            
-            # if not suburb or not state_district:
-            #     continue
-            # if suburb.strip().lower() != item.requested_place.strip().lower():
-            #     continue
-
-            # districts.add(state_district)
-
-        
-        # if len(districts) == 1:
-        #     district_value = list(districts)[0]
-        #     updated_count = updating_objs.update(
-        #         district=district_value,
-        #         json_hash=json_hash
-        #     )
-        #     print(f"✅ Updated {updated_count} rows for suburb '{item.requested_place}' → district '{district_value}'")
-        # else:
-        #     print(f"⚠️ Skipped '{item.requested_place}' (found {len(districts)} districts: {districts})")
-
-        # print(f"Processed {index}/{total}")
\ No newline at end of file
+    processed, changed = update_suburb_districts(batch_size=batch_size)
+    print(f"✅ Processed {processed} suburb records, {changed} changed")
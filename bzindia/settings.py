@@ -286,4 +286,36 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
 }
 
-GEOIP_PATH = os.path.join(BASE_DIR, 'geoip')
\ No newline at end of file
+GEOIP_PATH = os.path.join(BASE_DIR, 'geoip')
+
+# Prebuilt location suffix tries (manage.py build_location_tries)
+LOCATION_TRIE_DIR = os.path.join(BASE_DIR, 'trie_data')
+
+# Reverse geocoding of browser coordinates to a pincode (base.views.GetPincodeView).
+# Only points within REVERSE_GEOCODE_MAX_KM count as a match; OpenCage is
+# queried for misses only when REVERSE_GEOCODE_OPENCAGE_FALLBACK is enabled.
+REVERSE_GEOCODE_MAX_KM = 10
+REVERSE_GEOCODE_OPENCAGE_FALLBACK = os.getenv('REVERSE_GEOCODE_OPENCAGE_FALLBACK') == 'True'
+
+# Persistent store of geocoding API responses (utility.geocoding)
+GEOCODE_CACHE_DIR = os.path.join(BASE_DIR, 'geocode_cache')
+GEOCODE_CACHE_TTL = 60 * 60 * 24 * 90
+GEOCODE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Daily request budget and requests per second of each OpenCage key, by environment variable name (utility.quota).
+# The budgets are the per-key caps the fetchers enforced before the shared quota: 10000 on every key
+# (locations.tasks), 20000 on key 3 (home.views.fetch_coordinates); now one budget covers every caller of a key
+OPENCAGE_KEY_LIMITS = {
+    'OPENCAGE_API_KEY_1': {'daily': 10000, 'per_second': 4},
+    'OPENCAGE_API_KEY_2': {'daily': 10000, 'per_second': 4},
+    'OPENCAGE_API_KEY_3': {'daily': 20000, 'per_second': 4},
+}
+
+# How the *LocationData tables keep API responses: "compressed" (zlib in raw_response) or "json" (locations.models.GeocodedResponse)
+GEOCODING_RESPONSE_STORAGE = os.getenv('GEOCODING_RESPONSE_STORAGE', 'compressed')
+
+# Generated sitemaps (base.management.commands.generate_sitemaps), served by sitemap.views.serve_sitemap
+SITEMAP_ROOT = BASE_DIR / 'static' / 'sitemaps'
+# Also write .xml.br next to the .xml.gz sitemaps (needs the brotli package)
+SITEMAP_BROTLI = os.getenv('SITEMAP_BROTLI') == 'True'
+SITEMAP_CACHE_SECONDS = 3600
\ No newline at end of file
@@ -14,17 +14,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-import os
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.sitemaps.views import sitemap
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
-from django.views.static import serve
 from django.urls import re_path
-from django.views.static import serve
 from django.views.generic.base import RedirectView
+from sitemap.views import serve_sitemap
 
 from company.feeds import (
     CompanyFeed, ContactFeed, CompanyFaqFeed, CompanyBlogFeed,
@@ -116,74 +114,19 @@ urlpatterns = [
 urlpatterns += [    
 
     # ✅ Serve the static sitemap index (generated by management command) at /sitemap.xml
-    re_path(
-        r'^sitemap_index\.xml$',
-        serve,
-        {
-            'path': 'sitemaps/sitemap_index.xml',
-            'document_root': os.path.join(settings.BASE_DIR, 'static'),
-        },
-        name='sitemap-index'
-    ),
+    re_path(r'^(?P<name>sitemap_index\.xml)$', serve_sitemap, name='sitemap-index'),
 
     re_path(
         r'^sitemap\.xml$',
         RedirectView.as_view(url='/sitemap_index.xml', permanent=True)
     ),
 
-    re_path(
-        r'^(?P<path>sitemap-bzindia(-\d+)?\.xml)$',
-        serve,
-        {
-            'document_root': os.path.join(settings.BASE_DIR, 'static', 'sitemaps'),
-        },
-        name='bzindia-sitemap'
-    ),
-
-    re_path(
-        r'^(?P<path>sitemap-products(-\d+)?\.xml)$',
-        serve,
-        {
-            'document_root': os.path.join(settings.BASE_DIR, 'static', 'sitemaps'),
-        },
-        name='product-sitemap'
-    ),
-
-    re_path(
-        r'^(?P<path>sitemap-registrations(-\d+)?\.xml)$',
-        serve,
-        {
-            'document_root': os.path.join(settings.BASE_DIR, 'static', 'sitemaps'),
-        },
-        name='registration-sitemap'
-    ),
-
-    re_path(
-        r'^(?P<path>sitemap-courses(-\d+)?\.xml)$',
-        serve,
-        {
-            'document_root': os.path.join(settings.BASE_DIR, 'static', 'sitemaps'),
-        },
-        name='course-sitemap'
-    ),
-
-    re_path(
-        r'^(?P<path>sitemap-services(-\d+)?\.xml)$',
-        serve,
-        {
-            'document_root': os.path.join(settings.BASE_DIR, 'static', 'sitemaps'),
-        },
-        name='service-sitemap'
-    ),
-
-    re_path(
-        r'^(?P<path>sitemap-india(-\d+)?\.xml)$',
-        serve,
-        {
-            'document_root': os.path.join(settings.BASE_DIR, 'static', 'sitemaps'),
-        },
-        name='india-sitemap'
-    ),
+    re_path(r'^(?P<name>sitemap-bzindia(-[a-z0-9-]+)?\.xml)$', serve_sitemap, name='bzindia-sitemap'),
+    re_path(r'^(?P<name>sitemap-products(-[a-z0-9-]+)?\.xml)$', serve_sitemap, name='product-sitemap'),
+    re_path(r'^(?P<name>sitemap-registrations(-[a-z0-9-]+)?\.xml)$', serve_sitemap, name='registration-sitemap'),
+    re_path(r'^(?P<name>sitemap-courses(-[a-z0-9-]+)?\.xml)$', serve_sitemap, name='course-sitemap'),
+    re_path(r'^(?P<name>sitemap-services(-[a-z0-9-]+)?\.xml)$', serve_sitemap, name='service-sitemap'),
+    re_path(r'^(?P<name>sitemap-india(-[a-z0-9-]+)?\.xml)$', serve_sitemap, name='india-sitemap'),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) + static(settings.STATIC_URL, document_root=settings.STATICFILES_DIRS[0])
@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.text import slugify
+from utility.slugs import allocate_slug
 from ckeditor.fields import RichTextField
 from django.db.models import Avg
 from django.db import transaction
@@ -18,13 +19,7 @@ class CompanyType(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 1
-            while CompanyType.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(CompanyType, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -106,13 +101,7 @@ class Company(models.Model):
 
         if not self.slug:
             base_slug = slugify(self.sub_type)
-            slug = base_slug
-            count = 1
-            while CompanyType.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(CompanyType, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -289,14 +278,7 @@ class ClientSlider(models.Model):
             if not self.slug:
                 base_slug = slugify(self.heading)
 
-                slug = base_slug
-                count = 1
-
-                while ClientSlider.objects.filter(slug = slug).exists():
-                    slug = f"{base_slug}{count}"
-                    count += 1
-
-                self.slug = slug
+                self.slug = allocate_slug(ClientSlider, base_slug)
 
             ClientSlider.objects.filter(company=self.company).exclude(pk=self.pk).delete()
 
@@ -332,14 +314,7 @@ class Client(models.Model):
         if not self.slug:
             base_slug = slugify(self.name)
 
-            slug = base_slug
-            count = 1
-
-            while Client.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Client, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -374,14 +349,7 @@ class Testimonial(models.Model):
         if not self.slug:
             base_slug = slugify(f"{self.name}-{self.client_company}-{self.place.name}")
 
-            slug = base_slug
-            count = 1
-
-            while Testimonial.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Testimonial, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -416,14 +384,7 @@ class ContactEnquiry(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.email)
-            slug = base_slug
-
-            count = 1
-            while ContactEnquiry.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(ContactEnquiry, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.text import slugify
+from utility.slugs import allocate_slug
 
 from locations.models import UniqueState
 
@@ -21,14 +22,7 @@ class Enquiry(models.Model):
         if not self.slug:
             base_slug = slugify(f"{self.email}")
 
-            slug = base_slug
-            count = 1
-
-            while Enquiry.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Enquiry, base_slug)
 
         super().save(*args, **kwargs)
 
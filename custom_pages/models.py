@@ -3,6 +3,7 @@ from company.models import Company
 from django.utils.timezone import now
 
 from django.utils.text import slugify
+from utility.slugs import allocate_slug
 from ckeditor.fields import RichTextField
 
 from locations.models import UniquePlace, UniqueDistrict, UniqueState
@@ -24,14 +25,7 @@ class AboutUs(models.Model):
             if self.company:
                 base_slug = slugify(self.company.name)
 
-            slug = base_slug
-
-            count = 1
-            while AboutUs.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(AboutUs, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -72,14 +66,7 @@ class ContactUs(models.Model):
             base_slug = slugify("BZIndia")
             if self.company:
                 base_slug = slugify(self.company.name)            
-            slug = base_slug
-
-            count = 1
-            while ContactUs.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(ContactUs, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -109,14 +96,7 @@ class FAQ(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.question)
-            slug = base_slug
-
-            count = 1
-            while FAQ.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(FAQ, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -147,14 +127,7 @@ class PrivacyPolicy(models.Model):
             base_slug = slugify("BZIndia")
             if self.company:
                 base_slug = slugify(self.company.name)            
-            slug = base_slug
-
-            count = 1
-            while FAQ.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(FAQ, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -182,14 +155,7 @@ class TermsAndCondition(models.Model):
             base_slug = slugify("BZIndia")
             if self.company:
                 base_slug = slugify(self.company.name)            
-            slug = base_slug
-
-            count = 1
-            while TermsAndCondition.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(TermsAndCondition, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -218,14 +184,7 @@ class ShippingAndDeliveryPolicy(models.Model):
             base_slug = slugify("BZIndia")
             if self.company:
                 base_slug = slugify(self.company.name)            
-            slug = base_slug
-
-            count = 1
-            while ShippingAndDeliveryPolicy.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(ShippingAndDeliveryPolicy, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -249,14 +208,7 @@ class CancellationAndRefundPolicy(models.Model):
             base_slug = slugify("BZIndia")
             if self.company:
                 base_slug = slugify(self.company.name)            
-            slug = base_slug
-
-            count = 1
-            while CancellationAndRefundPolicy.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(CancellationAndRefundPolicy, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -0,0 +1,74 @@
+import base64
+from collections import OrderedDict
+
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from directory.nearby import get_nearest_destinations
+
+
+class DestinationDistancePagination(BasePagination):
+    """
+    Cursor pagination over destinations ordered by distance from (lat, lon).
+    The cursor is the (distance, id) of the last destination of the page, so
+    every page is a bounded nearest-destination query.
+
+    Opt-in: only requests with a `page_size` or `cursor` parameter are
+    paginated, so clients of the plain list keep getting one.
+    """
+    page_size = 12
+    max_page_size = 50
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    next_cursor = None
+
+    def is_requested(self, request):
+        return self.page_size_query_param in request.query_params or self.cursor_query_param in request.query_params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            distance, pk = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii").split(":")
+            return float(distance), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            return None
+
+    def encode_cursor(self, distance, pk):
+        return base64.urlsafe_b64encode(f"{distance!r}:{pk}".encode("ascii")).decode("ascii")
+
+    def paginate_nearest(self, lat, lon, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        destinations = get_nearest_destinations(lat, lon, page_size + 1, after=self.decode_cursor(request))
+
+        self.next_cursor = None
+        if len(destinations) > page_size:
+            destinations = destinations[:page_size]
+            last = destinations[-1]
+            self.next_cursor = self.encode_cursor(last.distance, last.pk)
+
+        return destinations
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("results", data),
+        ]))
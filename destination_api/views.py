@@ -1,31 +1,43 @@
 from rest_framework import viewsets
-from django.db.models import F, FloatField, ExpressionWrapper, Value
-from django.db.models.functions import Sqrt
+from rest_framework.response import Response
 
 from .serializers import DestinationSerializer
+from .paginations import DestinationDistancePagination
 from directory.models import Destination
+from directory.nearby import get_nearest_destinations
+
+
+def get_coordinates(request):
+    try:
+        return float(request.query_params.get('lat')), float(request.query_params.get('lon'))
+    except (TypeError, ValueError):
+        return None
+
 
 class DestinationApiViewset(viewsets.ReadOnlyModelViewSet):
     serializer_class = DestinationSerializer
+    pagination_class = DestinationDistancePagination
 
     def get_queryset(self):
-        lat = self.request.query_params.get('lat')
-        lon = self.request.query_params.get('lon')
+        return Destination.objects.filter(latitude__isnull=False, longitude__isnull=False)
 
-        try:
-            lat = float(lat)
-            lon = float(lon)
-        except (TypeError, ValueError):
-            return Destination.objects.none()
+    def list(self, request, *args, **kwargs):
+        coordinates = get_coordinates(request)
+        paginated = self.paginator.is_requested(request)
 
-        distance_expr = Sqrt(
-            (F('latitude') - Value(lat)) ** 2 +
-            (F('longitude') - Value(lon)) ** 2
-        )
+        if not coordinates:
+            return self.get_paginated_response([]) if paginated else Response([])
 
-        return Destination.objects.annotate(
-            distance=ExpressionWrapper(distance_expr, output_field=FloatField())
-        ).filter(latitude__isnull=False, longitude__isnull=False).order_by('distance')
+        lat, lon = coordinates
+        if not paginated:
+            # The plain list of every destination within reach, nearest first
+            serializer = self.get_serializer(get_nearest_destinations(lat, lon), many=True)
+            return Response(serializer.data)
+
+        destinations = self.paginator.paginate_nearest(lat, lon, request)
+
+        serializer = self.get_serializer(destinations, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -37,26 +49,14 @@ class SliderDestinationApiViewset(viewsets.ReadOnlyModelViewSet):
     serializer_class = DestinationSerializer
 
     def get_queryset(self):
-        lat = self.request.query_params.get('lat')
-        lon = self.request.query_params.get('lon')
-
-        try:
-            lat = float(lat)
-            lon = float(lon)
-        except (TypeError, ValueError):
+        coordinates = get_coordinates(self.request)
+        if not coordinates:
             return Destination.objects.none()
 
-        distance_expr = Sqrt(
-            (F('latitude') - Value(lat)) ** 2 +
-            (F('longitude') - Value(lon)) ** 2
-        )
-
-        return Destination.objects.annotate(
-            distance=ExpressionWrapper(distance_expr, output_field=FloatField())
-        ).filter(latitude__isnull=False, longitude__isnull=False).order_by('distance')[:12]
+        lat, lon = coordinates
+        return get_nearest_destinations(lat, lon, 12)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
-    
\ No newline at end of file
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+
+from directory.models import CscCenter, csc_grid_cell, place_match_key
+from locations.models import UniquePlace
+
+
+class Command(BaseCommand):
+    help = "Link CSC centers to the UniquePlace with the same names and fill their grid cells."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        # Ids are read newest first, so the oldest place wins a name clash, as in CscCenter.save()
+        place_ids = {
+            place_match_key(name, district_name, state_name): pk
+            for pk, name, district_name, state_name in UniquePlace.objects.order_by("-id").values_list(
+                "id", "name", "district__name", "state__name"
+            ).iterator()
+        }
+        self.stdout.write(f"Loaded {len(place_ids)} places.")
+
+        queryset = CscCenter.objects.order_by("id").only(
+            "id", "place_name", "district_name", "state_name",
+            "decimal_latitude", "decimal_longitude", "place", "grid_cell",
+        )
+
+        last_id = 0
+        linked = 0
+        updated = 0
+
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+
+            changed = []
+            for center in batch:
+                place_key = place_match_key(center.place_name, center.district_name, center.state_name)
+                # Centers whose names match no UniquePlace keep the place they have
+                place_id = (place_ids.get(place_key) if place_key[0] else None) or center.place_id
+                cell = csc_grid_cell(center.decimal_latitude, center.decimal_longitude)
+
+                if center.place_id != place_id or center.grid_cell != cell:
+                    center.place_id = place_id
+                    center.grid_cell = cell
+                    changed.append(center)
+
+                if place_id:
+                    linked += 1
+
+            if changed:
+                CscCenter.objects.bulk_update(changed, ["place", "grid_cell"])
+                updated += len(changed)
+
+            last_id = batch[-1].id
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {updated} CSC centers; {linked} are linked to a place."
+        ))
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+from locations.spatial import grid_cell
+
+DESTINATION_CELL_SIZE = 0.1
+BATCH_SIZE = 2000
+
+
+def backfill_grid_cells(apps, schema_editor):
+    Destination = apps.get_model("directory", "Destination")
+
+    queryset = Destination.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).order_by("id").only("id", "latitude", "longitude")
+
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+
+        for destination in batch:
+            destination.grid_cell = grid_cell(destination.latitude, destination.longitude, DESTINATION_CELL_SIZE)
+
+        Destination.objects.bulk_update(batch, ["grid_cell"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directory', '0060_csccenter_decimal_latitude_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='grid_cell',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_grid_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directory', '0061_destination_grid_cell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csccenter',
+            name='grid_cell',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
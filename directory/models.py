@@ -1,8 +1,10 @@
 from django.db import models
 from django.utils.text import slugify
+from utility.slugs import allocate_slug
 import uuid
 
 from locations.models import UniquePlace, UniqueDistrict, UniqueState
+from locations.spatial import grid_cell
 from registration.models import RegistrationSubType
 
 class PostOffice(models.Model):
@@ -23,6 +25,17 @@ class PostOffice(models.Model):
 
     def __str__(self):
         return f"{self.pincode}"
+
+    @staticmethod
+    def parse_coordinate(value):
+        # Coordinates are imported as text, some with stray spaces and minus signs
+        if not value:
+            return value
+
+        try:
+            return float(str(value).strip().strip("-"))
+        except ValueError:
+            return None
     
     class Meta:
         db_table = "post_offices"
@@ -102,13 +115,7 @@ class Bank(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:   
             base_slug = slugify(f"{self.name}-{self.ifsc}")
-            slug = base_slug
-            count = 1
-            while Bank.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-            
-            self.slug = slug
+            self.slug = allocate_slug(Bank, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -236,14 +243,7 @@ class TouristAttraction(models.Model):
             if self.name:
                 base_slug = slugify(self.name)
 
-                slug = base_slug
-                count = 1
-
-                while TouristAttraction.objects.filter(slug = slug).exists():
-                    slug = f"{base_slug}{count}"
-                    count += 1
-
-                self.slug = slug
+                self.slug = allocate_slug(TouristAttraction, base_slug)
 
             else:
                 self.slug = uuid.uuid4()
@@ -293,6 +293,14 @@ class TouristAttraction(models.Model):
         return f'https://bzindia/destinations/{self.slug}'
     
 
+DESTINATION_CELL_SIZE = 0.1
+
+def destination_grid_cell(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    return grid_cell(latitude, longitude, DESTINATION_CELL_SIZE)
+
+
 class Destination(models.Model):
     image = models.ImageField(upload_to="destinations/", null=True, blank=True)
 
@@ -390,6 +398,9 @@ class Destination(models.Model):
     latitude = models.DecimalField(max_digits=10, decimal_places=7, blank=True, null=True)
     longitude = models.DecimalField(max_digits=10, decimal_places=7, blank=True, null=True)
 
+    # DESTINATION_CELL_SIZE° grid cell of the coordinates, for nearest-destination lookups
+    grid_cell = models.BigIntegerField(blank=True, null=True, db_index=True)
+
     slug = models.SlugField(blank=True, null=True, max_length=500, db_index=True)
 
     created = models.DateTimeField(auto_now_add=True)
@@ -430,18 +441,13 @@ class Destination(models.Model):
             if base_name and slugify(base_name) != "":
                 base_slug = slugify(base_name)
 
-                slug = base_slug
-                count = 1
-
-                while Destination.objects.filter(slug = slug).exists():
-                    slug = f"{base_slug}{count}"
-                    count += 1
-
-                self.slug = slug
+                self.slug = allocate_slug(Destination, base_slug)
 
             else:
                 self.slug = uuid.uuid4()        
 
+        self.grid_cell = destination_grid_cell(self.latitude, self.longitude)
+
         super().save(*args, **kwargs)
 
 
@@ -507,6 +513,30 @@ class Court(models.Model):
         db_table="courts"
 
 
+CSC_CELL_SIZE = 0.1
+
+def csc_grid_cell(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    return grid_cell(latitude, longitude, CSC_CELL_SIZE)
+
+
+def place_match_key(place_name, district_name, state_name):
+    """Names of a place as compared when matching CSC centers to a UniquePlace: stripped and casefolded."""
+    return tuple((name or "").strip().casefold() for name in (place_name, district_name, state_name))
+
+
+def match_csc_place(place_key):
+    """The UniquePlace (the oldest, when several) with the names of `place_key`, or None."""
+    place_name, district_name, state_name = place_key
+    if not place_name:
+        return None
+
+    return UniquePlace.objects.filter(
+        name__iexact=place_name, district__name__iexact=district_name, state__name__iexact=state_name
+    ).order_by("id").first()
+
+
 class CscCenter(models.Model):
     csc_id = models.CharField(max_length = 50, null=True, blank=True)
 
@@ -546,9 +576,15 @@ class CscCenter(models.Model):
     decimal_latitude = models.FloatField(blank=True, null=True, db_index =True)
     decimal_longitude = models.FloatField(blank=True, null=True, db_index =True)
 
+    # CSC_CELL_SIZE° grid cell of the decimal coordinates
+    grid_cell = models.BigIntegerField(blank=True, null=True, db_index=True)
+
     created = models.DateTimeField(auto_now_add=True, blank=True, null=True)
     updated = models.DateTimeField(auto_now=True, blank=True, null=True)
 
+    # place_match_key() of the names as loaded from the database
+    _place_key = None
+
     def save(self, *args, **kwargs):
         if len(self.latitude) > 10:
             self.latitude = None
@@ -556,18 +592,30 @@ class CscCenter(models.Model):
         if len(self.longitude) > 10:
             self.longitude = None
 
+        self.grid_cell = csc_grid_cell(self.decimal_latitude, self.decimal_longitude)
+
+        # place is matched by name when the place, district or state names change (manage.py link_csc_centers
+        # fills the rest), so saving a center with unchanged names never queries UniquePlace
+        place_key = place_match_key(self.place_name, self.district_name, self.state_name)
+        if place_key != self._place_key:
+            self.place = match_csc_place(place_key) or self.place
+
         if not self.slug:
             base_slug = slugify(f"{self.name}-{self.place.name}-{self.district.name}-{self.state.name}")
 
-            slug = base_slug
-            count = 2
-            while CscCenter.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(CscCenter, base_slug, start=2)
 
         super().save(*args, **kwargs)
+        self._place_key = place_key
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The names as loaded, so save() can tell when they change
+        instance._place_key = place_match_key(*(
+            instance.__dict__.get(name) for name in ("place_name", "district_name", "state_name")
+        ))
+        return instance
 
     class Meta:
         db_table = "csc_centers"
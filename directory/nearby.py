@@ -0,0 +1,191 @@
+import math
+
+import numpy as np
+
+from locations.spatial import KM_PER_DEGREE, haversine_km, cells_in_box, get_place_index
+from utility.location import NEARBY_RADIUS_KM
+
+from .models import Destination, DESTINATION_CELL_SIZE, CscCenter, CSC_CELL_SIZE
+
+# Ring radii (in cells) searched; destinations beyond the last ring are never returned
+RING_STEPS = (0, 1, 2, 4, 8, 16)
+
+COLUMNS = int(round(360 / DESTINATION_CELL_SIZE))
+ROWS = int(round(180 / DESTINATION_CELL_SIZE))
+
+
+def _cells_between(row, column, inner, outer):
+    """Grid cells whose ring distance from (row, column) is in (inner, outer]."""
+    cells = []
+    for cell_row in range(max(row - outer, 0), min(row + outer, ROWS - 1) + 1):
+        for cell_column in range(column - outer, column + outer + 1):
+            if inner >= 0 and abs(cell_row - row) <= inner and abs(cell_column - column) <= inner:
+                continue
+            cells.append(cell_row * COLUMNS + cell_column % COLUMNS)
+    return cells
+
+
+def _covered_km(lat, rings):
+    """Distance from the query point guaranteed to be inside the searched rings."""
+    if rings == 0:
+        return 0.0
+
+    lat_km = rings * DESTINATION_CELL_SIZE * KM_PER_DEGREE
+    widest_lat = min(abs(lat) + (rings + 1) * DESTINATION_CELL_SIZE, 90)
+    lon_km = lat_km * math.cos(math.radians(widest_lat))
+
+    # Small margin for the curvature of the longitude edges
+    return min(lat_km, lon_km) * 0.99
+
+
+def nearest_destinations(lat, lon, k=None, after=None):
+    """
+    The k destinations nearest to (lat, lon) as (distance_km, id) pairs,
+    ordered by distance then id, or all of them within reach when k is None.
+    `after` is a (distance_km, id) cursor: only destinations ordered after
+    it are returned.
+
+    Rings of grid cells around the query point are fetched through the
+    indexed grid_cell column until k candidates lie within the radius the
+    rings fully cover, so only the neighbourhood of the point is read. The
+    search stops at the last of RING_STEPS: fewer than k pairs means there
+    are no more destinations within reach.
+    """
+    row = math.floor((lat + 90) / DESTINATION_CELL_SIZE)
+    column = math.floor((lon + 180) / DESTINATION_CELL_SIZE) % COLUMNS
+
+    candidate_ids = []
+    candidate_lats = []
+    candidate_lons = []
+
+    def take(rows):
+        for pk, latitude, longitude in rows:
+            candidate_ids.append(pk)
+            candidate_lats.append(float(latitude))
+            candidate_lons.append(float(longitude))
+
+    def ranked(limit_km=None):
+        if not candidate_ids:
+            return []
+
+        distances = haversine_km(lat, lon, np.array(candidate_lats), np.array(candidate_lons))
+        pairs = sorted(zip(distances.tolist(), candidate_ids))
+
+        if after is not None:
+            pairs = [pair for pair in pairs if pair > tuple(after)]
+        if limit_km is not None:
+            pairs = [pair for pair in pairs if pair[0] <= limit_km]
+        return pairs
+
+    previous = -1
+    for rings in RING_STEPS:
+        cells = _cells_between(row, column, previous, rings)
+        take(
+            Destination.objects.filter(grid_cell__in=cells).values_list("id", "latitude", "longitude")
+        )
+        previous = rings
+
+        covered = ranked(_covered_km(lat, rings))
+        if k is not None and len(covered) >= k:
+            return covered[:k]
+
+    # Sparse neighbourhood or a deep page: the end of the results, never a scan of the whole table
+    return covered[:k]
+
+
+def get_nearest_destinations(lat, lon, k=None, after=None):
+    """Destination objects for nearest_destinations(), each with a `distance` (km) attribute."""
+    pairs = nearest_destinations(lat, lon, k, after=after)
+    destinations = Destination.objects.in_bulk([pk for _, pk in pairs])
+
+    nearest = []
+    for distance, pk in pairs:
+        destination = destinations.get(pk)
+        if destination:
+            destination.distance = distance
+            nearest.append(destination)
+
+    return nearest
+
+
+# Half-width of the box around the query point in which every CSC center is included
+CSC_BOX_DEGREES = 0.55
+
+
+class RankedObjects:
+    """
+    Objects of `model` in a precomputed (distance, pk) order. Slicing loads
+    only the requested rows, so paginating costs one query per page.
+    """
+
+    def __init__(self, model, ranked):
+        self.model = model
+        self.ranked = ranked
+
+    def __len__(self):
+        return len(self.ranked)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0] if index >= 0 else self[len(self) + index]
+
+        pairs = self.ranked[index]
+        objects = self.model.objects.in_bulk([pk for _, pk in pairs])
+
+        page = []
+        for distance, pk in pairs:
+            obj = objects.get(pk)
+            if obj is not None:
+                obj.distance = distance
+                page.append(obj)
+        return page
+
+    def __iter__(self):
+        for start in range(0, len(self), 500):
+            yield from self[start:start + 500]
+
+
+def nearby_csc_centers(lat, lon):
+    """
+    CSC centers linked to a place near (lat, lon), plus every center inside
+    the ±CSC_BOX_DEGREES box, ranked by haversine distance. Centers without
+    coordinates come first, as NULL distances sort first in the database.
+    """
+    coordinates = {}
+
+    place_ids = get_place_index().nearby_ids(lat, lon, NEARBY_RADIUS_KM)
+    if place_ids:
+        for pk, latitude, longitude in CscCenter.objects.filter(
+            place_id__in=place_ids
+        ).values_list("id", "decimal_latitude", "decimal_longitude"):
+            coordinates[pk] = (latitude, longitude)
+
+    min_lat, max_lat = lat - CSC_BOX_DEGREES, lat + CSC_BOX_DEGREES
+    min_lon, max_lon = lon - CSC_BOX_DEGREES, lon + CSC_BOX_DEGREES
+
+    for pk, latitude, longitude in CscCenter.objects.filter(
+        grid_cell__in=cells_in_box(min_lat, max_lat, min_lon, max_lon, CSC_CELL_SIZE),
+        decimal_latitude__range=(min_lat, max_lat),
+        decimal_longitude__range=(min_lon, max_lon),
+    ).values_list("id", "decimal_latitude", "decimal_longitude"):
+        coordinates[pk] = (latitude, longitude)
+
+    located = []
+    unlocated = []
+    for pk, (latitude, longitude) in coordinates.items():
+        if latitude is None or longitude is None:
+            unlocated.append(pk)
+        else:
+            located.append(pk)
+
+    ranked = [(None, pk) for pk in sorted(unlocated)]
+
+    if located:
+        distances = haversine_km(
+            lat, lon,
+            np.array([coordinates[pk][0] for pk in located]),
+            np.array([coordinates[pk][1] for pk in located]),
+        )
+        ranked.extend(sorted(zip(distances.tolist(), located)))
+
+    return RankedObjects(CscCenter, ranked)
@@ -12,7 +12,10 @@ from django.db.models import Q
 import logging
 from django.db import transaction
 
-from .models import PostOffice, PoliceStation, Bank, Destination, Court
+from utility.geocoding import opencage_geocode
+from utility.quota import QuotaExhausted, get_opencage_limiter
+
+from .models import PostOffice, PoliceStation, Bank, Destination, Court, destination_grid_cell
 
 logger = logging.getLogger(__name__)
 
@@ -287,6 +290,7 @@ def import_attractions():
                     name=name,
                     latitude=latitude,
                     longitude=longitude,
+                    grid_cell=destination_grid_cell(latitude, longitude),
                     
                     old_name = element['tags'].get('old_name', None),
 
@@ -473,8 +477,7 @@ def import_courts_data():
 
 
 def fetch_destination_locations(batch_size=100, buffer_size=10):
-    api_key = os.getenv("OPENCAGE_API_KEY_1")
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
+    api_key, limiter = get_opencage_limiter("OPENCAGE_API_KEY_1")
 
     destinations_qs = Destination.objects.filter(
         Q(place__isnull=True) |
@@ -490,6 +493,7 @@ def fetch_destination_locations(batch_size=100, buffer_size=10):
 
     paginator = Paginator(destinations_qs, batch_size)
     counting = 0
+    out_of_budget = False
 
     for page_number in paginator.page_range:
         page = paginator.page(page_number)
@@ -502,14 +506,7 @@ def fetch_destination_locations(batch_size=100, buffer_size=10):
             longitude = destination.longitude
 
             try:
-                response = requests.get(
-                    base_url,
-                    params={'q': f'{latitude}+{longitude}', 'key': api_key},
-                    timeout=10
-                )
-                response.raise_for_status()
-
-                data = response.json()
+                data, cached = opencage_geocode(f'{latitude}+{longitude}', api_key, limiter=limiter, timeout=10)
 
                 if data.get("results"):
                     components = data["results"][0].get("components", {})
@@ -553,19 +550,21 @@ def fetch_destination_locations(batch_size=100, buffer_size=10):
                                 logger.info(f"Buffered update: {buffer_size} destinations updated")
                                 updating_destinations.clear()  # reset buffer
 
-                time.sleep(0.25)  # Respect API rate limit
-
             except requests.exceptions.RequestException as e:
                 logger.error(f"API request error for ({latitude}, {longitude}): {e}")
-                if response.status_code == 429:
-                    retry_after = int(response.headers.get("Retry-After", 60))
-                    logger.warning(f"Rate limit exceeded. Sleeping for {retry_after} seconds...")
-                    time.sleep(retry_after)
+                if e.response is not None and e.response.status_code == 429:
+                    # opencage_geocode already paused the key for the Retry-After period
+                    logger.warning("Rate limit exceeded. Pausing requests of this key...")
                 else:
                     logger.warning("Retrying after 5 seconds...")
-                    time.sleep(5)
+                    limiter.pause(5)
                 continue
 
+            except QuotaExhausted:
+                logger.info("You have used up your daily API call limit.")
+                out_of_budget = True
+                break
+
             except Exception as e:
                 logger.error(f"Unexpected error: {e}")
                 time.sleep(5)
@@ -580,11 +579,13 @@ def fetch_destination_locations(batch_size=100, buffer_size=10):
             logger.info(f"Final buffered update: {len(updating_destinations)} destinations updated for batch {page_number}")
             updating_destinations.clear()
 
+        if out_of_budget:
+            return
+
     logger.info("Location fetching completed for all destinations!")
 
 def fetch_police_locations(batch_size=100, buffer_size=10):
-    api_key = os.getenv("OPENCAGE_API_KEY_2")
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
+    api_key, limiter = get_opencage_limiter("OPENCAGE_API_KEY_2")
 
     police_stations_qs = PoliceStation.objects.filter(
         Q(city__isnull=True) |
@@ -600,6 +601,7 @@ def fetch_police_locations(batch_size=100, buffer_size=10):
 
     paginator = Paginator(police_stations_qs, batch_size)
     counting = 0
+    out_of_budget = False
 
     for page_number in paginator.page_range:
         page = paginator.page(page_number)
@@ -612,14 +614,7 @@ def fetch_police_locations(batch_size=100, buffer_size=10):
             longitude = police_station.longitude
 
             try:
-                response = requests.get(
-                    base_url,
-                    params={'q': f'{latitude}+{longitude}', 'key': api_key},
-                    timeout=10
-                )
-                response.raise_for_status()
-
-                data = response.json()
+                data, cached = opencage_geocode(f'{latitude}+{longitude}', api_key, limiter=limiter, timeout=10)
 
                 if data.get("results"):
                     components = data["results"][0].get("components", {})
@@ -661,19 +656,21 @@ def fetch_police_locations(batch_size=100, buffer_size=10):
                                 logger.info(f"Buffered update: {buffer_size} police stations updated")
                                 updating_police_stations.clear()  # reset buffer
 
-                time.sleep(0.25)  # Respect API rate limit
-
             except requests.exceptions.RequestException as e:
                 logger.error(f"API request error for ({latitude}, {longitude}): {e}")
-                if response.status_code == 429:
-                    retry_after = int(response.headers.get("Retry-After", 60))
-                    logger.warning(f"Rate limit exceeded. Sleeping for {retry_after} seconds...")
-                    time.sleep(retry_after)
+                if e.response is not None and e.response.status_code == 429:
+                    # opencage_geocode already paused the key for the Retry-After period
+                    logger.warning("Rate limit exceeded. Pausing requests of this key...")
                 else:
                     logger.warning("Retrying after 5 seconds...")
-                    time.sleep(5)
+                    limiter.pause(5)
                 continue
 
+            except QuotaExhausted:
+                logger.info("You have used up your daily API call limit.")
+                out_of_budget = True
+                break
+
             except Exception as e:
                 logger.error(f"Unexpected error: {e}")
                 time.sleep(5)
@@ -688,11 +685,13 @@ def fetch_police_locations(batch_size=100, buffer_size=10):
             logger.info(f"Final buffered update: {len(updating_police_stations)} police stations updated for batch {page_number}")
             updating_police_stations.clear()
 
+        if out_of_budget:
+            return
+
     logger.info("Location fetching completed for all police stations!")
 
 def fetch_court_locations(batch_size=100, buffer_size=10):
-    api_key = os.getenv("OPENCAGE_API_KEY_3")
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
+    api_key, limiter = get_opencage_limiter("OPENCAGE_API_KEY_3")
 
     courts_qs = Court.objects.filter(
         Q(city__isnull=True) |
@@ -708,6 +707,7 @@ def fetch_court_locations(batch_size=100, buffer_size=10):
 
     paginator = Paginator(courts_qs, batch_size)
     counting = 0
+    out_of_budget = False
 
     for page_number in paginator.page_range:
         page = paginator.page(page_number)
@@ -720,14 +720,7 @@ def fetch_court_locations(batch_size=100, buffer_size=10):
             longitude = court.longitude
 
             try:
-                response = requests.get(
-                    base_url,
-                    params={'q': f'{latitude}+{longitude}', 'key': api_key},
-                    timeout=10
-                )
-                response.raise_for_status()
-
-                data = response.json()
+                data, cached = opencage_geocode(f'{latitude}+{longitude}', api_key, limiter=limiter, timeout=10)
 
                 if data.get("results"):
                     components = data["results"][0].get("components", {})
@@ -771,19 +764,21 @@ def fetch_court_locations(batch_size=100, buffer_size=10):
                                 logger.info(f"Buffered update: {buffer_size} courts updated")
                                 updating_courts.clear()  # reset buffer
 
-                time.sleep(0.25)  # Respect API rate limit
-
             except requests.exceptions.RequestException as e:
                 logger.error(f"API request error for ({latitude}, {longitude}): {e}")
-                if response.status_code == 429:
-                    retry_after = int(response.headers.get("Retry-After", 60))
-                    logger.warning(f"Rate limit exceeded. Sleeping for {retry_after} seconds...")
-                    time.sleep(retry_after)
+                if e.response is not None and e.response.status_code == 429:
+                    # opencage_geocode already paused the key for the Retry-After period
+                    logger.warning("Rate limit exceeded. Pausing requests of this key...")
                 else:
                     logger.warning("Retrying after 5 seconds...")
-                    time.sleep(5)
+                    limiter.pause(5)
                 continue
 
+            except QuotaExhausted:
+                logger.info("You have used up your daily API call limit.")
+                out_of_budget = True
+                break
+
             except Exception as e:
                 logger.error(f"Unexpected error: {e}")
                 time.sleep(5)
@@ -798,6 +793,9 @@ def fetch_court_locations(batch_size=100, buffer_size=10):
             logger.info(f"Final buffered update: {len(updating_courts)} courts updated for batch {page_number}")
             updating_courts.clear()
 
+        if out_of_budget:
+            return
+
     logger.info("Location fetching completed for all courts!")
 
 import pandas as pd
@@ -1,14 +1,12 @@
 from .serializers import MinimalCscCenterSerializer, CscSerializer
 from directory.models import CscCenter
 from rest_framework.viewsets import ReadOnlyModelViewSet
-from django.db.models import F, FloatField, Q
-from django.db.models.expressions import ExpressionWrapper
-from django.db.models.functions import ACos, Cos, Radians, Sin
+from rest_framework.generics import get_object_or_404
 from registration.models import RegistrationSubType
 from registration_api.serializers import SubTypeSerializer
 
 from .paginations import CscPagination
-from utility.location import get_nearby_locations
+from directory.nearby import nearby_csc_centers
 
 class NearbyCscCenterViewSet(ReadOnlyModelViewSet):
     model = CscCenter
@@ -28,49 +26,15 @@ class NearbyCscCenterViewSet(ReadOnlyModelViewSet):
         except (TypeError, ValueError):
             return self.queryset
         
-        locations = get_nearby_locations(lat, lon)
+        return nearby_csc_centers(lat, lon)
 
-        locations_data = list(locations.values_list("name", "district__name", "state__name"))
+    def get_object(self):
+        # get_queryset() ranks nearby centers into a list, which can't be filtered to one
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = get_object_or_404(self.model.objects.all(), **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
 
-        query = Q()
-        for name, district_name, state_name in locations_data:
-            query |= Q(
-                place_name=name,
-                district_name=district_name,
-                state_name=state_name,
-            )
-        
-        difference = 0.55
-
-        start_lat = lat - difference
-        start_lon = lon - difference
-
-        end_lat = lat + difference
-        end_lon = lon + difference
-
-        starting_point = [start_lat, start_lon]
-        ending_point = [end_lat, end_lon]
-        
-        centers = CscCenter.objects.filter(
-            query |
-            Q (decimal_latitude__range=(starting_point[0], ending_point[0]),
-            decimal_longitude__range=(starting_point[1], ending_point[1]))
-        )
-
-        distance_expr = ExpressionWrapper(
-            6371
-            * ACos(
-                Cos(Radians(lat))
-                * Cos(Radians(F("decimal_latitude")))
-                * Cos(Radians(F("decimal_longitude")) - Radians(lon))
-                + Sin(Radians(lat)) * Sin(Radians(F("decimal_latitude")))
-            ),
-            output_field=FloatField(),
-        )
-
-        centers = centers.annotate(distance=distance_expr).order_by("distance")
-
-        return centers
+        self.check_object_permissions(self.request, obj)
+        return obj
     
 
 class CscRegistrationViewSet(ReadOnlyModelViewSet):
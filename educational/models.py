@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.text import slugify
+from utility.slugs import allocate_slug
 from ckeditor.fields import RichTextField
 from django.db.models import Avg
 from django.utils import timezone
@@ -23,14 +24,7 @@ class Program(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 1
-
-            while Program.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Program, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -65,14 +59,7 @@ class SpecializationFaq(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.specialization_slug}")
-            slug = base_slug
-
-            count = 1
-            while SpecializationFaq.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(SpecializationFaq, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -154,14 +141,7 @@ class Course(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 1
-
-            while Specialization.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Specialization, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -440,14 +420,7 @@ class CourseDetail(models.Model):
 
         if not self.slug:
             base_slug = slugify(self.course.name)
-            slug = base_slug
-            count = 1
-
-            while CourseDetail.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(CourseDetail, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -555,14 +528,7 @@ class Enquiry(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.course.name}-{self.email}")
-            slug = base_slug
-
-            count = 1
-            while Enquiry.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Enquiry, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -591,14 +557,7 @@ class Faq(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.question}")
-            slug = base_slug
-
-            count = 1
-            while Faq.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Faq, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -633,14 +592,7 @@ class Testimonial(models.Model):
         if not self.slug:
             base_slug = slugify(f"{self.name}-{self.course.name}-{self.place.name}")
 
-            slug = base_slug
-            count = 1
-
-            while Testimonial.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Testimonial, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -842,14 +794,7 @@ class TextEditor(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.text_editor_title}")
-            slug = base_slug
-
-            count = 1
-            while TextEditor.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(TextEditor, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -883,14 +828,7 @@ class MultiPageFaq(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.title)
-            slug = base_slug
-
-            count = 1
-            while MultiPageFaq.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(MultiPageFaq, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -0,0 +1,182 @@
+import logging
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.utils.text import slugify
+
+from directory.models import PostOffice
+from locations.models import IndianLocation, UniquePlace, PlaceCoordinate, PlacePincode
+from utility.location import normalize_place_name
+from utility.slugs import SlugAllocator
+
+from .models import Coordinates, Pincode
+
+logger = logging.getLogger(__name__)
+
+# Points further apart than this under one name are different places
+MAX_SPREAD_KM = 5
+
+# Branch, sub, head and general post office suffixes of office names
+POST_OFFICE_SUFFIX = re.compile(r"\s+(?:[BSH]\.?\s*O\.?|G\.?\s*P\.?\s*O\.?)\s*$", re.IGNORECASE)
+
+
+# District and state names repeat on every row
+_normalize = lru_cache(maxsize=100000)(normalize_place_name)
+
+
+def place_key(name, district, state):
+    return _normalize(name), _normalize(district), _normalize(state)
+
+
+def _distance_km(first, second):
+    # Equirectangular approximation, plenty for a few kilometres
+    x = math.radians(second[1] - first[1]) * math.cos(math.radians((first[0] + second[0]) / 2))
+    y = math.radians(second[0] - first[0])
+    return 6371 * math.hypot(x, y)
+
+
+class LocationIndex:
+    """
+    Coordinates of one source by normalized (name, district, state). A key
+    whose points spread over more than MAX_SPREAD_KM names several places,
+    so it is dropped rather than guessed.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.entries = {}
+        self.ambiguous = set()
+
+    def add(self, name, district, state, latitude, longitude, postcode=None):
+        if latitude is None or longitude is None:
+            return
+
+        key = place_key(name, district, state)
+        if not all(key) or key in self.ambiguous:
+            return
+
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = (latitude, longitude, postcode)
+        elif _distance_km(entry, (latitude, longitude)) > MAX_SPREAD_KM:
+            del self.entries[key]
+            self.ambiguous.add(key)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def build_indian_location_index(state_name):
+    index = LocationIndex("indian_location")
+
+    for village, town, suburb, district, state, latitude, longitude, postcode in IndianLocation.objects.filter(
+        state__iexact = state_name
+    ).values_list("village", "town", "suburb", "district", "state", "latitude", "longitude", "postcode").iterator():
+        for name in (village, town, suburb):
+            if name:
+                index.add(name, district, state, latitude, longitude, postcode)
+
+    return index
+
+
+def build_place_index(state_name):
+    index = LocationIndex("unique_place")
+
+    # The lowest id coordinate and pincode of each place, like .first() on its rows
+    coordinates = {}
+    for place_id, latitude, longitude in PlaceCoordinate.objects.filter(
+        place__state__name__iexact = state_name
+    ).order_by("-id").values_list("place_id", "latitude", "longitude").iterator():
+        coordinates[place_id] = (latitude, longitude)
+
+    pincodes = dict(
+        PlacePincode.objects.filter(place__state__name__iexact = state_name).order_by("-id").values_list(
+            "place_id", "pincode"
+        ).iterator()
+    )
+
+    for place_id, name, district, state in UniquePlace.objects.filter(
+        state__name__iexact = state_name
+    ).values_list("id", "name", "district__name", "state__name").iterator():
+        if place_id in coordinates:
+            index.add(name, district, state, *coordinates[place_id], pincodes.get(place_id))
+
+    return index
+
+
+def build_post_office_index(state_name):
+    index = LocationIndex("post_office")
+
+    for office_name, district, state, latitude, longitude, pincode in PostOffice.objects.filter(
+        state_name__iexact = state_name
+    ).values_list("office_name", "district", "state_name", "latitude", "longitude", "pincode").iterator():
+        if not office_name:
+            continue
+
+        index.add(
+            POST_OFFICE_SUFFIX.sub("", office_name), district, state,
+            PostOffice.parse_coordinate(latitude), PostOffice.parse_coordinate(longitude), pincode
+        )
+
+    return index
+
+
+def match_villages(villages, state_name, batch_size=1000):
+    """
+    Store Coordinates for the villages found in the local location data
+    of `state_name`, without any API call. Sources are tried from the
+    geocoded locations to the post offices. Returns the villages left
+    unmatched.
+    """
+    indexes = [
+        build_indian_location_index(state_name),
+        build_place_index(state_name),
+        build_post_office_index(state_name),
+    ]
+    for index in indexes:
+        logger.info(f"Indexed {len(index)} {index.source} names of {state_name}")
+
+    # Coordinates.save() checks its slugs against Pincode
+    slugs = SlugAllocator(Pincode)
+
+    keys = [place_key(village.name, village.district_name, village.state_name) for village in villages]
+    # Villages sharing a name within a district can't be told apart by name
+    shared = {key for key, count in Counter(keys).items() if count > 1}
+
+    matched = []
+    unmatched = []
+
+    for village, key in zip(villages, keys):
+        found = None
+        if key not in shared:
+            found = next(((index.source, entry) for index in indexes if (entry := index.get(key))), None)
+
+        if found is None:
+            unmatched.append(village)
+            continue
+
+        source, (latitude, longitude, postcode) = found
+        matched.append(Coordinates(
+            source = source,
+
+            village_code = village.code, village_name = village.name,
+            sub_district_code = village.sub_district_code, sub_district_name = village.sub_district_name,
+            district_code = village.district_code, district_name = village.district_name,
+            state_code = village.state_code, state_name = village.state_name,
+
+            country = "India", state = (village.state_name or "")[:100] or None,
+            district = (village.district_name or "")[:100] or None, village = village.name[:100],
+            postcode = str(postcode) if postcode else None, latitude = latitude, longitude = longitude,
+
+            slug = slugs.allocate(slugify(f"{village.name}-{village.district_name}-{village.state_name}")),
+        ))
+
+    Coordinates.objects.bulk_create(matched, batch_size=batch_size, ignore_conflicts=True)
+
+    logger.info(f"Matched {len(matched)} villages of {state_name} offline, {len(unmatched)} left for geocoding")
+    return unmatched
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0040_coordinates_geocoded_response_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coordinates',
+            name='source',
+            field=models.CharField(default='opencage', max_length=20),
+        ),
+    ]
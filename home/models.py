@@ -1,5 +1,8 @@
 from django.db import models
 from django.utils.text import slugify
+from utility.slugs import allocate_slug
+
+from locations.models import GeocodedResponse
 from ckeditor.fields import RichTextField
 
 
@@ -35,14 +38,7 @@ class State(models.Model):
         if not self.slug:
             base_slug = slugify(self.name)
 
-            slug = base_slug
-            count = 1
-
-            while State.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(State, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -72,14 +68,7 @@ class District(models.Model):
         if not self.slug:
             base_slug = slugify(self.name)
 
-            slug = base_slug
-            count = 1
-
-            while District.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(District, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -113,14 +102,7 @@ class SubDistrict(models.Model):
         if not self.slug:
             base_slug = slugify(self.name)
 
-            slug = base_slug
-            count = 1
-
-            while SubDistrict.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(SubDistrict, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -161,14 +143,7 @@ class Village(models.Model):
         if not self.slug:
             base_slug = slugify(self.name)
 
-            slug = base_slug
-            count = 1
-
-            while Village.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Village, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -208,14 +183,7 @@ class Pincode(models.Model):
         if not self.slug:
             base_slug = slugify(f"{self.village_name}-{self.district_name}-{self.state_name}")
 
-            slug = base_slug
-            count = 1
-
-            while Pincode.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Pincode, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -227,9 +195,10 @@ class Pincode(models.Model):
         return f"{self.village_name}, {self.district_name}, {self.state_name}"
     
 
-class Coordinates(models.Model):
-    json_data = models.JSONField()
-    
+class Coordinates(GeocodedResponse):
+    # "opencage" for geocoded villages, else the local data they were matched in (home.matching)
+    source = models.CharField(max_length=20, default="opencage")
+
     village_code = models.CharField(max_length=10, unique=True)    
     village_name = models.CharField(max_length=150)
 
@@ -251,14 +220,7 @@ class Coordinates(models.Model):
         if not self.slug:
             base_slug = slugify(f"{self.village_name}-{self.district_name}-{self.state_name}")
 
-            slug = base_slug
-            count = 1
-
-            while Pincode.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Pincode, base_slug)
 
         super().save(*args, **kwargs)
 
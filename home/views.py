@@ -36,92 +36,72 @@ class HomeView(BaseView, TemplateView):
 
 from .models import Village, Coordinates
 from locations.models import UniquePlace
-from django.core.cache import cache
-import requests, os, time
+import requests
 
-def fetch_coordinates():
-
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
-    api_key = os.getenv('OPENCAGE_API_KEY_3')
-    cache_key = f"opencage_requested_{time.strftime('%Y%m%d')}"
-    request_count = cache.get(cache_key)
-    if request_count is None:
-        request_count = 0
-        cache.set(cache_key, 0, timeout=60*60*24)
-
-    state_name = "Tamil Nadu"
+from utility.geocoding import opencage_geocode
+from utility.quota import QuotaExhausted, get_opencage_limiter
 
-    villages = Village.objects.filter(state_name = state_name)
+from .matching import match_villages
 
-    for village in villages:
-        # if UniquePlace.objects.filter(
-        #     name=village.name,
-        #     district__name=village.district_name,
-        #     state__name=village.state_name
-        # ).exists():
-        #     continue    
-
-        if Coordinates.objects.filter(village_code=village.code).exists():
-            continue
-
-        if request_count < 20000:
-            try:
-                # logger.info(f"Querying Place: ({village.name}, {village.district_name}, {village.state_name})")
-                print(f"Querying Place: ({village.name}, {village.district_name}, {village.state_name})")
+def fetch_coordinates():
 
-                response = requests.get(base_url, params={
-                    "q": f"{village.name}, {village.district_name}, {village.state_name}, India",
-                    "key": api_key
-                })
+    api_key, limiter = get_opencage_limiter('OPENCAGE_API_KEY_3')
 
-                response.raise_for_status()
+    state_name = "Tamil Nadu"
 
-                request_count += 1
-                cache.set(cache_key, request_count, timeout=60*60*24)
-                data = response.json()
+    fetched_codes = set(Coordinates.objects.values_list("village_code", flat=True).iterator())
+    villages = [
+        village for village in Village.objects.filter(state_name = state_name).iterator()
+        if village.code not in fetched_codes
+    ]
 
-                # logger.info(f"Request number: {request_count}")
-                print(f"Request number: {request_count}")
+    # Villages already in the local location data need no API call
+    villages = match_villages(villages, state_name)
 
-                if "results" in data and data["results"]:
-                    first_result = data["results"][0]
-                    components = first_result.get("components", {})
+    for village in villages:
+        try:
+            # logger.info(f"Querying Place: ({village.name}, {village.district_name}, {village.state_name})")
+            print(f"Querying Place: ({village.name}, {village.district_name}, {village.state_name})")
 
-                    country = components.get("country")                    
+            data, cached = opencage_geocode(
+                f"{village.name}, {village.district_name}, {village.state_name}, India", api_key, limiter=limiter
+            )
 
-                    if str(country).lower() in {"india"}:
+            if "results" in data and data["results"]:
+                first_result = data["results"][0]
+                components = first_result.get("components", {})
 
-                        Coordinates.objects.create(                                        
-                            json_data = data, 
+                country = components.get("country")                    
 
-                            village_code = village.code, village_name = village.name,
-                            sub_district_code = village.sub_district_code, sub_district_name = village.sub_district_name,
-                            district_code = village.district_code, district_name = village.district_name,
-                            state_code = village.state_code, state_name = village.state_name
-                        )
+                if str(country).lower() in {"india"}:
 
-                        # logger.info(f"Coordinates fetched for: '{village.name}, {village.district_name}, {village.state_name}'\n")
-                        print(f"Coordinates fetched for: '{village.name}, {village.district_name}, {village.state_name}'\n")
-                
+                    Coordinates.objects.create(                                        
+                        json_data = data, 
 
-            except requests.exceptions.RequestException as e:
-                # logger.info(f"Error during API request: {e}")
-                print(f"Error during API request: {e}")
-                time.sleep(0.4)
-                continue
+                        village_code = village.code, village_name = village.name,
+                        sub_district_code = village.sub_district_code, sub_district_name = village.sub_district_name,
+                        district_code = village.district_code, district_name = village.district_name,
+                        state_code = village.state_code, state_name = village.state_name
+                    )
 
-            except Exception as e:
-                # logger.exception(f"An Unexpected Error occured: {e}")
-                print(f"An Unexpected Error occured: {e}")
-                time.sleep(0.4)
-                continue
-    
-            time.sleep(0.4)
+                    # logger.info(f"Coordinates fetched for: '{village.name}, {village.district_name}, {village.state_name}'\n")
+                    print(f"Coordinates fetched for: '{village.name}, {village.district_name}, {village.state_name}'\n")
 
-        else:
+        except QuotaExhausted:
             # logger.info("You have used up your daily API call limit.")
             print("You have used up your daily API call limit.")
-            return       
+            return
+
+        except requests.exceptions.RequestException as e:
+            # logger.info(f"Error during API request: {e}")
+            print(f"Error during API request: {e}")
+            limiter.pause(0.4)
+            continue
+
+        except Exception as e:
+            # logger.exception(f"An Unexpected Error occured: {e}")
+            print(f"An Unexpected Error occured: {e}")
+            continue
 
 
 # def import_coordinates(batch_size=500):
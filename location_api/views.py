@@ -3,11 +3,10 @@ from rest_framework.viewsets import ReadOnlyModelViewSet
 from rest_framework.response import  Response
 from rest_framework.decorators import action
 
-from django.db.models import F, FloatField, ExpressionWrapper, OuterRef, Subquery
-from django.db.models.functions import Sqrt
+from django.db.models import OuterRef, Subquery
 from django.shortcuts import get_object_or_404
 
-from locations.trie_cache import get_place_trie, get_district_trie, get_state_trie
+from locations.trie_cache import get_location_resolver
 
 from .serializers import (
     PlaceSerializer, StateSerializer, DistrictSerializer, SimplePlaceSerializer, 
@@ -36,6 +35,7 @@ from registration_api.paginations import RegistrationMultipagePagination
 from rest_framework.decorators import action
 
 from utility.location import get_nearby_locations
+from locations.spatial import get_place_index
 
 import logging
 
@@ -74,14 +74,16 @@ class GetNearestLocationViewSet(ReadOnlyModelViewSet):
         except (TypeError, ValueError):
             return Response({"place": "Provided values are not coordinates"}, status=status.HTTP_400_BAD_REQUEST)
             
-        nearest_place = PlaceCoordinate.objects.annotate(
-            distance=ExpressionWrapper(
-                Sqrt((F('latitude') - lat) ** 2 + (F('longitude') - lon) ** 2),
-                output_field=FloatField()
-                )
-            ).order_by('distance').first()
-        
-        place = nearest_place.place
+        place_index = get_place_index()
+        indexes, _ = place_index.nearest(lat, lon)
+        if not len(indexes):
+            return Response({"place": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        place_id = int(place_index.ids[indexes[0]])
+        place = UniquePlace.objects.select_related("state", "district").filter(pk=place_id).first()
+
+        if not place:
+            return Response({"place": "Not found"}, status=status.HTTP_404_NOT_FOUND)
         
         serializer = self.get_serializer(place)
 
@@ -95,7 +97,7 @@ class MinimalStateViewset(ReadOnlyModelViewSet):
 
 
 class StateViewset(ReadOnlyModelViewSet):
-    queryset = UniqueState.objects.all().order_by("name")
+    queryset = UniqueState.objects.select_related("summary").order_by("name")
     serializer_class = MiniStateSerializer
     lookup_field = "slug"
 
@@ -105,6 +107,15 @@ class StateViewset(ReadOnlyModelViewSet):
         if not state:
             return Response({"center": "Bad Request"}, status=status.HTTP_400_BAD_REQUEST)
 
+        summary = state.get_summary()
+        if summary:
+            if summary.median_latitude is None:
+                return Response({"center": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+            return Response({
+                "latitude": summary.median_latitude, "longitude": summary.median_longitude
+            }, status=status.HTTP_200_OK)
+
         qs = PlaceCoordinate.objects.filter(place__state=state).order_by("id").only("id", "latitude", "longitude")
         count = qs.count()
 
@@ -125,6 +136,15 @@ class StateViewset(ReadOnlyModelViewSet):
         if not state:
             return Response({"pincode": "Bad Request"}, status=status.HTTP_400_BAD_REQUEST)
 
+        summary = state.get_summary()
+        if summary:
+            if summary.median_latitude is None:
+                return Response({"pincode": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+            if summary.median_pincode is None:
+                return Response({"center": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+            return Response({"pincode": summary.median_pincode}, status=status.HTTP_200_OK)
+
         qs = PlaceCoordinate.objects.filter(place__state=state).order_by("id")
 
         count = qs.count()
@@ -162,7 +182,7 @@ class StateViewset(ReadOnlyModelViewSet):
 
 
 class DistrictViewset(ReadOnlyModelViewSet):
-    queryset = UniqueDistrict.objects.all().order_by("name")
+    queryset = UniqueDistrict.objects.select_related("summary").order_by("name")
     serializer_class = DistrictSerializer
     lookup_field = "slug"
 
@@ -173,6 +193,15 @@ class DistrictViewset(ReadOnlyModelViewSet):
         if not district:
             return Response({"center": "Bad Request"}, status=status.HTTP_400_BAD_REQUEST)
 
+        summary = district.get_summary()
+        if summary:
+            if summary.median_latitude is None:
+                return Response({"center": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+            return Response({
+                "latitude": summary.median_latitude, "longitude": summary.median_longitude
+            }, status=status.HTTP_200_OK)
+
         # Count coordinates first (cheap query)
         total = PlaceCoordinate.objects.filter(place__district=district).count()
         if total == 0:
@@ -201,6 +230,13 @@ class DistrictViewset(ReadOnlyModelViewSet):
         if not district:
             return Response({"pincode": "Bad Request"}, status=status.HTTP_400_BAD_REQUEST)
 
+        summary = district.get_summary()
+        if summary:
+            if summary.median_pincode is None:
+                return Response({"pincode": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+            return Response({"pincode": summary.median_pincode}, status=status.HTTP_200_OK)
+
         # Try direct match
         pincode_obj = (
             PlacePincode.objects.select_related("place")
@@ -560,11 +596,11 @@ class StateProductMultiPageViewSet(ReadOnlyModelViewSet):
 
 #         return Response({"match_type": None, "matched_slug": None})
 
-MATCH_ORDER = [
-    ("state", get_state_trie, UniqueState, MiniStateSerializer),
-    ("district", get_district_trie, UniqueDistrict, DistrictMiniSerializer),
-    ("place", get_place_trie, UniquePlace, PlaceMiniSerializer),
-]
+MATCH_MODELS = {
+    "state": (UniqueState, MiniStateSerializer),
+    "district": (UniqueDistrict, DistrictMiniSerializer),
+    "place": (UniquePlace, PlaceMiniSerializer),
+}
 
 class LocationMatchViewSet(ReadOnlyModelViewSet):
     queryset = UniquePlace.objects.none()
@@ -574,56 +610,39 @@ class LocationMatchViewSet(ReadOnlyModelViewSet):
         slug = self.kwargs.get("slug")
         location_type = self.kwargs.get("location_type")
 
-        best_match = {
-            "model_type": None,
-            "matched_slug": None,
-            "match_length": 0,
-            "serializer_class": None,
-        }
+        if not location_type or location_type == "undefined":
+            location_type = None
 
-        for model_type, get_trie_fn, model, serializer_class in MATCH_ORDER:            
-            if location_type and location_type != "undefined" and model_type != location_type:
-                continue
+        match = None
+        if location_type is None or location_type in MATCH_MODELS:
+            match = get_location_resolver().resolve(slug, location_type)
 
-            matched_slug = get_trie_fn().match_suffix(slug)
-            if not matched_slug:
-                continue
+        if not match:
+            return Response({
+                "match_type": None,
+                "matched_slug": None,
+                "warning": "No match found."
+            })
 
-            match_length = len(matched_slug)
-            current_index = next((i for i, (t, *_r) in enumerate(MATCH_ORDER) if t == model_type), -1)
-            best_index = next((i for i, (t, *_r) in enumerate(MATCH_ORDER) if t == best_match["model_type"]), -1)
+        data = match.payload
 
-            is_better = (
-                match_length > best_match["match_length"]
-                or (match_length == best_match["match_length"] and current_index > best_index)
-            )
+        # Locations added since the resolver was built carry no payload yet
+        if data is None:
+            model, serializer_class = MATCH_MODELS[match.location_type]
+            instance = model.objects.filter(pk=match.id).first()
 
-            if is_better:
-                best_match.update({
-                    "model_type": model_type,
-                    "matched_slug": matched_slug,
-                    "match_length": match_length,
-                    "serializer_class": serializer_class,
+            if not instance:
+                return Response({
+                    "match_type": match.location_type,
+                    "matched_slug": match.slug,
+                    "warning": "Matched in trie but not found in DB."
                 })
 
-        # Get the instance only for the final best match
-        final_instance = None
-        if best_match["matched_slug"]:
-            model = next((m for t, _, m, _ in MATCH_ORDER if t == best_match["model_type"]), None)
-            if model:
-                final_instance = model.objects.filter(slug=best_match["matched_slug"]).first()
-
-        if final_instance:
-            serializer = best_match["serializer_class"](final_instance)
-            return Response({
-                "match_type": best_match["model_type"],
-                "data": serializer.data,
-            })
+            data = serializer_class(instance).data
 
         return Response({
-            "match_type": best_match["model_type"],
-            "matched_slug": best_match["matched_slug"],
-            "warning": "Matched in trie but not found in DB." if best_match["matched_slug"] else "No match found."
+            "match_type": match.location_type,
+            "data": data,
         })
 
 
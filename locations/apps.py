@@ -5,6 +5,5 @@ class LocationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'locations'
 
-    # def ready(self):
-    #     from .trie_loader import load_location_data
-    #     load_location_data()
\ No newline at end of file
+    def ready(self):
+        from . import signals  # noqa: F401
\ No newline at end of file
@@ -0,0 +1,307 @@
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from django.db import transaction
+from django.utils.text import slugify
+from django.utils import timezone
+
+from utility.geocoding import OPENCAGE_URL, opencage_geocode
+from utility.quota import QuotaExhausted, get_opencage_limiter
+from utility.slugs import SlugAllocator
+
+from .models import (
+    State, District, Place, RetestedCoordinates,
+    IndiaCoordinates, IndiaLocationData, UaeCoordinates, UaeLocationData,
+    KsaCoordinates, KsaLocationData, KuwaitCoordinates, KuwaitLocationData,
+    BahrainCoordinates, BahrainLocationData, QatarCoordinates, QatarLocationData,
+    OmanCoordinates, OmanLocationData,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds the limiter holds every worker back after a failed request
+ERROR_BACKOFF = 2
+
+
+class GridCrawler:
+    """
+    Reverse geocodes every `step`° grid point of a bounding box and stores
+    the results of the points that fall inside `countries`.
+
+    Cells are generated lazily, row by row from the top left corner, and
+    the ones already recorded in `coordinates_model` are skipped using a set
+    loaded with one query. Requests run on a thread pool (one pooled HTTP
+    session per thread) under the shared quota of the OpenCage key named
+    `key_name`; results are written in batches together with the cells they
+    came from.
+    """
+
+    def __init__(
+        self, coordinates_model, data_model, countries, step, key_name,
+        base_url=OPENCAGE_URL, workers=4, batch_size=100, max_retries=3,
+    ):
+        self.coordinates_model = coordinates_model
+        self.data_model = data_model
+        self.countries = countries
+        self.step = step
+
+        self.api_key, self.limiter = get_opencage_limiter(key_name)
+        self.base_url = base_url
+
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+
+        self._local = threading.local()
+
+    def cells(self, top_left, bottom_right):
+        latitude = top_left[0]
+
+        while latitude >= bottom_right[0]:
+            longitude = top_left[1]
+
+            while longitude <= bottom_right[1]:
+                yield latitude, longitude
+
+                longitude = round(longitude + self.step, 2)
+
+            latitude = round(latitude - self.step, 2)
+
+    def tested_cells(self, top_left, bottom_right):
+        return {
+            (round(latitude, 2), round(longitude, 2))
+            for latitude, longitude in self.coordinates_model.objects.filter(
+                latitude__lte=top_left[0], latitude__gte=bottom_right[0],
+                longitude__gte=top_left[1], longitude__lte=bottom_right[1],
+            ).values_list("latitude", "longitude").iterator()
+        }
+
+    def existing_keys(self):
+        return set(self.data_model.objects.values_list("address", flat=True).iterator())
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def fetch(self, cell):
+        """Runs on a worker thread. Returns (data, cached)."""
+        latitude, longitude = cell
+        logger.info(f"Querying Coordinates: ({latitude}, {longitude})")
+
+        return opencage_geocode(
+            f"{latitude},{longitude}", self.api_key,
+            session=self._session(), limiter=self.limiter, base_url=self.base_url
+        )
+
+    def parse(self, data, latitude, longitude):
+        """(dedupe key, unsaved record) for a response, or None when nothing is to be stored."""
+        if not data.get("results"):
+            return None
+
+        first_result = data["results"][0]
+        components = first_result.get("components", {})
+        formatted = first_result.get("formatted")
+
+        if str(components.get("country")).lower() not in self.countries or not formatted:
+            return None
+
+        road = components.get("road")
+        address = formatted.replace(f"{road},", "").strip() if road else formatted
+
+        record = self.data_model(address = address, requested_latitude = latitude, requested_longitude = longitude)
+        # bulk_create skips save(), which extracts the columns and compresses the response
+        record.store_response(data)
+
+        return address, record
+
+    def flush(self, tested, records):
+        with transaction.atomic():
+            self.data_model.objects.bulk_create(records)
+            self.coordinates_model.objects.bulk_create([
+                self.coordinates_model(latitude=latitude, longitude=longitude) for latitude, longitude in tested
+            ])
+
+        for record in records:
+            logger.info(f"Place created: '{record.address}'\n")
+
+    def run(self, top_left, bottom_right):
+        tested = self.tested_cells(top_left, bottom_right)
+        seen = self.existing_keys()
+
+        cells = (cell for cell in self.cells(top_left, bottom_right) if cell not in tested)
+        retries = []
+        attempts = {}
+
+        pending_cells = []
+        pending_records = []
+
+        def next_cell():
+            if retries:
+                return retries.pop()
+            return next(cells, None)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = {}
+            exhausted = False
+            out_of_budget = False
+
+            while True:
+                while not exhausted and not out_of_budget and len(in_flight) < self.workers * 2:
+                    cell = next_cell()
+                    if cell is None:
+                        exhausted = True
+                        break
+
+                    in_flight[executor.submit(self.fetch, cell)] = cell
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    cell = in_flight.pop(future)
+
+                    try:
+                        data, cached = future.result()
+                    except QuotaExhausted:
+                        if not out_of_budget:
+                            logger.info("You have used up your daily API call limit.")
+                        out_of_budget = True
+                        continue
+                    except Exception as e:
+                        logger.info(f"Error during API request for {cell}: {e}")
+                        self.limiter.pause(ERROR_BACKOFF)
+
+                        attempts[cell] = attempts.get(cell, 0) + 1
+                        if attempts[cell] < self.max_retries:
+                            retries.append(cell)
+                            exhausted = False
+                        continue
+
+                    try:
+                        parsed = self.parse(data, *cell)
+                    except Exception as e:
+                        logger.exception(f"An Unexpected Error occured: {e}")
+                        continue
+
+                    if parsed and parsed[0] not in seen:
+                        seen.add(parsed[0])
+                        pending_records.append(parsed[1])
+
+                    pending_cells.append(cell)
+
+                if len(pending_cells) >= self.batch_size:
+                    self.flush(pending_cells, pending_records)
+                    pending_cells, pending_records = [], []
+
+        if pending_cells:
+            self.flush(pending_cells, pending_records)
+
+
+class PlaceGridCrawler(GridCrawler):
+    """Stores Indian results directly as State, District and Place rows."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.states = {}
+        self.districts = {}
+        self.slugs = None
+
+    def existing_keys(self):
+        return set(
+            Place.objects.values_list("name", "district_id", "state_id", "pincode").iterator()
+        )
+
+    def parse(self, data, latitude, longitude):
+        if not data.get("results"):
+            return None
+
+        components = data["results"][0].get("components", {})
+        if components.get("country") != "India":
+            return None
+
+        place = components.get("village") or components.get("town") or components.get("city") or components.get("county")
+        state_name = components.get("state")
+        district_name = components.get("state_district")
+        pincode = components.get("postcode")
+
+        if not (place and state_name and district_name):
+            return None
+
+        if state_name not in self.states:
+            self.states[state_name], _ = State.objects.get_or_create(name=state_name)
+        state = self.states[state_name]
+
+        if (district_name, state.pk) not in self.districts:
+            self.districts[(district_name, state.pk)], _ = District.objects.get_or_create(name=district_name, state=state)
+        district = self.districts[(district_name, state.pk)]
+
+        # Same value the PositiveIntegerField holds once saved
+        pincode = int(pincode) if pincode and str(pincode).isdigit() else pincode
+
+        return (place, district.pk, state.pk, pincode), Place(
+            name = place,
+            district=district,
+            state=state,
+            pincode=pincode,
+            latitude=data["results"][0]["geometry"]["lat"],
+            longitude=data["results"][0]["geometry"]["lng"]
+        )
+
+    def flush(self, tested, records):
+        # Slugs are allocated and timestamps set here, as Place.save() would, so places can be bulk created
+        if self.slugs is None:
+            self.slugs = SlugAllocator(Place)
+
+        now = timezone.now()
+        for record in records:
+            record.slug = self.slugs.allocate(slugify(record.name))
+            record.updated = now
+
+        with transaction.atomic():
+            Place.objects.bulk_create(records)
+            self.coordinates_model.objects.bulk_create([
+                self.coordinates_model(latitude=latitude, longitude=longitude) for latitude, longitude in tested
+            ])
+
+        # bulk_create sends no post_save, so the cached places of the pincodes are cleared here
+        from base.local_places import invalidate_pincode_places
+
+        invalidate_pincode_places(*{record.pincode for record in records})
+
+        for record in records:
+            logger.info(f"Place created for {record.name}, {record.district.name}, {record.state.name}")
+
+
+CountryGrid = namedtuple("CountryGrid", ["crawler_class", "coordinates_model", "data_model", "countries", "step"])
+
+COUNTRY_GRIDS = {
+    "india_places": CountryGrid(PlaceGridCrawler, RetestedCoordinates, Place, {"india"}, 0.02),
+    "india": CountryGrid(GridCrawler, IndiaCoordinates, IndiaLocationData, {"india"}, 0.03),
+    "uae": CountryGrid(GridCrawler, UaeCoordinates, UaeLocationData, {"united arab emirates", "uae"}, 0.01),
+    "ksa": CountryGrid(GridCrawler, KsaCoordinates, KsaLocationData, {"kingdom of saudi arabia", "saudi arabia", "ksa"}, 0.02),
+    "kuwait": CountryGrid(GridCrawler, KuwaitCoordinates, KuwaitLocationData, {"kuwait"}, 0.02),
+    "bahrain": CountryGrid(GridCrawler, BahrainCoordinates, BahrainLocationData, {"bahrain"}, 0.02),
+    "qatar": CountryGrid(GridCrawler, QatarCoordinates, QatarLocationData, {"qatar"}, 0.02),
+    "oman": CountryGrid(GridCrawler, OmanCoordinates, OmanLocationData, {"oman"}, 0.02),
+}
+
+
+def crawl_country(country, top_left, bottom_right, key_name, **options):
+    """
+    Geocode the grid of `country` (a COUNTRY_GRIDS key) between the two
+    corners with the OpenCage key in the `key_name` environment variable.
+    `options` are passed to the crawler, e.g. base_url or workers.
+    """
+    grid = COUNTRY_GRIDS[country]
+
+    crawler = grid.crawler_class(
+        grid.coordinates_model, grid.data_model, grid.countries, grid.step, key_name, **options
+    )
+    crawler.run(top_left, bottom_right)
@@ -0,0 +1,150 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework import serializers
+
+from locations.models import UniqueState, UniqueDistrict, UniquePlace
+from locations.resolver import LocationResolver
+from locations.spatial import (
+    build_place_index_from_db, get_place_index_path, build_pincode_index_from_db, get_pincode_index_path
+)
+from locations.trie import CompactSuffixTrie
+from locations.trie_cache import get_trie_path, get_resolver_paths, get_trie_version, mark_tries_rebuilt
+
+TRIE_MODELS = [
+    ("state", UniqueState),
+    ("district", UniqueDistrict),
+    ("place", UniquePlace),
+]
+
+
+def _as_char(value):
+    # Same output as the serializers' CharField(source=...) columns
+    return None if value is None else str(value)
+
+
+def generate_state_payloads():
+    from location_api.serializers import MiniStateSerializer
+
+    for state in UniqueState.objects.select_related("summary").iterator():
+        yield "state", state.slug, state.pk, dict(MiniStateSerializer(state).data)
+
+
+def generate_district_payloads():
+    from location_api.serializers import DistrictMiniSerializer
+
+    for district in UniqueDistrict.objects.select_related("state", "summary").iterator():
+        try:
+            payload = dict(DistrictMiniSerializer(district).data)
+        except AttributeError:
+            # District without places: leave it to the request-time fallback
+            payload = None
+        yield "district", district.slug, district.pk, payload
+
+
+def generate_place_payloads():
+    """
+    PlaceMiniSerializer output for every place, computed with three bulk
+    queries instead of three per place. `.first()` on the pincodes and
+    coordinates managers picks the lowest related id, so do the same here.
+    """
+    first_pincodes = {}
+    for place_id, pincode in UniquePlace.pincodes.through.objects.order_by(
+        "-placepincode_id"
+    ).values_list("uniqueplace_id", "placepincode__pincode").iterator():
+        first_pincodes[place_id] = pincode
+
+    first_coordinates = {}
+    for place_id, latitude, longitude in UniquePlace.coordinates.through.objects.order_by(
+        "-placecoordinate_id"
+    ).values_list("uniqueplace_id", "placecoordinate__latitude", "placecoordinate__longitude").iterator():
+        first_coordinates[place_id] = (latitude, longitude)
+
+    datetime_field = serializers.DateTimeField()
+
+    for place in UniquePlace.objects.values(
+        "id", "name", "slug", "updated", "district__name", "district__slug",
+        "state__name", "state__slug",
+    ).iterator():
+        latitude, longitude = first_coordinates.get(place["id"], (None, None))
+
+        yield "place", place["slug"], place["id"], {
+            "name": place["name"],
+            "slug": place["slug"],
+            "updated": datetime_field.to_representation(place["updated"]),
+            "district_name": place["district__name"],
+            "district_slug": place["district__slug"],
+            "state_name": place["state__name"],
+            "state_slug": place["state__slug"],
+            "pincode": _as_char(first_pincodes.get(place["id"])),
+            "latitude": _as_char(latitude),
+            "longitude": _as_char(longitude),
+        }
+
+
+def generate_resolver_entries():
+    yield from generate_state_payloads()
+    yield from generate_district_payloads()
+    yield from generate_place_payloads()
+
+
+class Command(BaseCommand):
+    help = "Build the compact location suffix tries and resolver that workers memory-map at startup."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--type", choices=[location_type for location_type, _ in TRIE_MODELS] + ["resolver", "spatial"],
+            action="append", dest="types",
+            help="Only rebuild the given structure (can be repeated)."
+        )
+
+    def handle(self, *args, **options):
+        os.makedirs(settings.LOCATION_TRIE_DIR, exist_ok=True)
+        selected_types = options.get("types")
+
+        # Read before the snapshot: workers replay every later change on top
+        version = get_trie_version()
+
+        for location_type, model in TRIE_MODELS:
+            if selected_types and location_type not in selected_types:
+                continue
+
+            items = (
+                (slug, pk) for pk, slug in model.objects.order_by("id").values_list("id", "slug").iterator()
+            )
+            trie = CompactSuffixTrie.build(items)
+
+            path = get_trie_path(location_type)
+            trie.save(path)
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {location_type} trie ({len(trie)} nodes) to {path}"
+            ))
+
+        if not selected_types or "resolver" in selected_types:
+            resolver = LocationResolver.build(generate_resolver_entries())
+            resolver.save(*get_resolver_paths())
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote location resolver ({len(resolver.groups)} slugs) to {settings.LOCATION_TRIE_DIR}"
+            ))
+
+        if not selected_types or "spatial" in selected_types:
+            index = build_place_index_from_db()
+            index.save(get_place_index_path())
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote place spatial index ({len(index)} points) to {get_place_index_path()}"
+            ))
+
+            index = build_pincode_index_from_db()
+            index.save(get_pincode_index_path())
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote pincode spatial index ({len(index)} points) to {get_pincode_index_path()}"
+            ))
+
+        # A partial rebuild leaves the other files older than `version`
+        if not selected_types:
+            mark_tries_rebuilt(version)
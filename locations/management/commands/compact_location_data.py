@@ -0,0 +1,87 @@
+import json
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import TextField
+from django.db.models.functions import Cast
+
+from utility.geocoding import compress_response
+
+# Models that keep geocoding responses (locations.models.GeocodedResponse)
+RESPONSE_MODELS = [
+    "locations.IndiaLocationData",
+    "locations.UaeLocationData",
+    "locations.KsaLocationData",
+    "locations.KuwaitLocationData",
+    "locations.BahrainLocationData",
+    "locations.QatarLocationData",
+    "locations.OmanLocationData",
+    "locations.SuburbLocationData",
+    "home.Coordinates",
+]
+
+EXTRACTED_FIELDS = [
+    "formatted", "country", "state", "district", "city", "town", "village",
+    "suburb", "postcode", "latitude", "longitude", "confidence",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract the columns of the stored geocoding responses and move the "
+        "responses from json_data into compressed raw_response, in chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--models", nargs="+", default=RESPONSE_MODELS, help="app_label.Model to compact")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--keep-json", action="store_true",
+            help="Only fill the extracted columns and leave the responses in json_data"
+        )
+
+    def handle(self, *args, **options):
+        for label in options["models"]:
+            model = apps.get_model(label)
+            count = self.compact(model, options["batch_size"], options["keep_json"])
+            self.stdout.write(self.style.SUCCESS(f"{label}: {count} rows compacted"))
+
+    def compact(self, model, batch_size, keep_json):
+        fields = EXTRACTED_FIELDS if keep_json else EXTRACTED_FIELDS + ["raw_response", "json_data"]
+
+        # Rows still holding their response as JSON, read as text to skip Django's decoding
+        queryset = model.objects.filter(json_data__isnull=False).annotate(
+            raw_json=Cast("json_data", TextField())
+        ).order_by("pk")
+        if keep_json:
+            queryset = queryset.filter(formatted__isnull=True)
+
+        after = 0
+        count = 0
+
+        while True:
+            batch = list(queryset.filter(pk__gt=after).values_list("pk", "raw_json")[:batch_size])
+            if not batch:
+                break
+
+            updating = []
+            for pk, raw_json in batch:
+                data = json.loads(raw_json)
+
+                instance = model(pk=pk)
+                instance.store_response(data)
+                if not keep_json:
+                    instance.raw_response = compress_response(data)
+                    instance.json_data = None
+
+                updating.append(instance)
+
+            with transaction.atomic():
+                model.objects.bulk_update(updating, fields, batch_size=batch_size)
+
+            after = batch[-1][0]
+            count += len(batch)
+            self.stdout.write(f"{model._meta.label}: {count} rows compacted")
+
+        return count
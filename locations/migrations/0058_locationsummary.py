@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0057_uniqueplace_unique_plac_slug_7955ae_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('place_count', models.PositiveIntegerField(default=0)),
+                ('centroid_latitude', models.FloatField(blank=True, null=True)),
+                ('centroid_longitude', models.FloatField(blank=True, null=True)),
+                ('median_latitude', models.FloatField(blank=True, null=True)),
+                ('median_longitude', models.FloatField(blank=True, null=True)),
+                ('median_pincode', models.PositiveIntegerField(blank=True, null=True)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('pincode', models.PositiveIntegerField(blank=True, null=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('district', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='locations.uniquedistrict')),
+                ('state', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='locations.uniquestate')),
+            ],
+            options={
+                'db_table': 'location_summaries',
+            },
+        ),
+    ]
@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.db import models
 from django.utils.text import slugify
+from utility.geocoding import compress_response, decompress_response, extract_response_fields
+from utility.slugs import allocate_slug, first_free_slug
 
 class State(models.Model):
     name = models.CharField(max_length=150)    
@@ -11,13 +14,7 @@ class State(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 1
-            while State.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(State, base_slug)
         
         super().save(*args, **kwargs)
 
@@ -40,13 +37,7 @@ class District(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 1
-            while District.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(District, base_slug)
         
         super().save(*args, **kwargs)
 
@@ -73,13 +64,7 @@ class Place(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 1
-            while Place.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Place, base_slug)
         
         super().save(*args, **kwargs)
 
@@ -136,13 +121,7 @@ class UniqueState(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 1
-            while UniqueState.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(UniqueState, base_slug)
         
         super().save(*args, **kwargs)
 
@@ -153,8 +132,18 @@ class UniqueState(models.Model):
         db_table = "unique_states"
         ordering = ["name"]
 
+    def get_summary(self):
+        try:
+            return self.summary
+        except LocationSummary.DoesNotExist:
+            return None
+
     @property 
     def get_latitude(self):        
+        summary = self.get_summary()
+        if summary:
+            return summary.latitude
+
         qs = PlaceCoordinate.objects.filter(place__state=self).order_by("id")
         count = qs.count()
         if not count:
@@ -166,6 +155,10 @@ class UniqueState(models.Model):
     
     @property 
     def get_longitude(self):        
+        summary = self.get_summary()
+        if summary:
+            return summary.longitude
+
         qs = PlaceCoordinate.objects.filter(place__state=self).order_by("id")
         count = qs.count()
         if not count:
@@ -177,6 +170,10 @@ class UniqueState(models.Model):
     
     @property
     def get_pincode(self):
+        summary = self.get_summary()
+        if summary:
+            return summary.pincode
+
         pincode_obj = (
             PlacePincode.objects.filter(place__state=self)
             .order_by("id")
@@ -208,13 +205,7 @@ class UniqueDistrict(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 2
-            while UniqueDistrict.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(UniqueDistrict, base_slug, start=2)
         
         super().save(*args, **kwargs)
 
@@ -225,8 +216,18 @@ class UniqueDistrict(models.Model):
         db_table = "unique_districts"
         ordering = ["name"]
 
+    def get_summary(self):
+        try:
+            return self.summary
+        except LocationSummary.DoesNotExist:
+            return None
+
     @property
     def get_pincode(self):
+        summary = self.get_summary()
+        if summary:
+            return summary.pincode
+
         district_name = (self.name.replace("District", "")).strip()
         place = self.places.filter(
             name = district_name
@@ -249,6 +250,10 @@ class UniqueDistrict(models.Model):
     
     @property
     def get_latitude(self):
+        summary = self.get_summary()
+        if summary:
+            return summary.latitude
+
         district_name = (self.name.replace("District", "")).strip()
         place = self.places.filter(
             name = district_name
@@ -271,6 +276,10 @@ class UniqueDistrict(models.Model):
     
     @property
     def get_longitude(self):
+        summary = self.get_summary()
+        if summary:
+            return summary.longitude
+
         district_name = (self.name.replace("District", "")).strip()
         place = self.places.filter(
             name = district_name
@@ -319,21 +328,18 @@ class UniquePlace(models.Model):
     created = models.DateTimeField(auto_now_add=True, db_index=True)
     updated = models.DateTimeField(auto_now=True)
 
+    def get_slug_candidates(self):
+        # The place name, then qualified by its district, then by its state too
+        base_slug = slugify(self.name)
+        return [
+            base_slug,
+            slugify(f"{base_slug}-{self.district.name}"),
+            slugify(f"{base_slug}-{self.district.name}-{self.state.name}"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.slug:
-            base_slug = slugify(self.name)
-            slug = base_slug
-
-            while UniquePlace.objects.filter(slug=slug).exists():
-                place_district_slug = slugify(f"{base_slug}-{self.district.name}")
-
-                if slug != place_district_slug:
-                    slug = place_district_slug
-                else:
-                    slug = slugify(f"{base_slug}-{self.district.name}-{self.state.name}")
-                    break
-
-            self.slug = slug
+            self.slug = first_free_slug(UniquePlace, self.get_slug_candidates())
 
         super().save(*args, **kwargs)
 
@@ -370,6 +376,40 @@ class UniquePlace(models.Model):
         return coordinate.longitude if coordinate else None    
 
 
+class LocationSummary(models.Model):
+    """
+    Precomputed coordinates and pincodes of a state or a district, rebuilt in
+    bulk by the `rebuild_location_summaries` task.
+
+    latitude, longitude and pincode are the values the mini serializers show;
+    median_* are the centre coordinate and its pincode served by the
+    get_center and get_pincode actions.
+    """
+    state = models.OneToOneField(UniqueState, on_delete=models.CASCADE, blank=True, null=True, related_name="summary")
+    district = models.OneToOneField(UniqueDistrict, on_delete=models.CASCADE, blank=True, null=True, related_name="summary")
+
+    place_count = models.PositiveIntegerField(default=0)
+
+    centroid_latitude = models.FloatField(blank=True, null=True)
+    centroid_longitude = models.FloatField(blank=True, null=True)
+
+    median_latitude = models.FloatField(blank=True, null=True)
+    median_longitude = models.FloatField(blank=True, null=True)
+    median_pincode = models.PositiveIntegerField(blank=True, null=True)
+
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    pincode = models.PositiveIntegerField(blank=True, null=True)
+
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "location_summaries"
+
+    def __str__(self):
+        return str(self.district or self.state)
+
+
 class UaeCoordinates(models.Model):
     latitude = models.FloatField()
     longitude = models.FloatField()
@@ -440,9 +480,63 @@ class BahrainCoordinates(models.Model):
         return f"Bahrain ({self.latitude}-{self.longitude})"
     
 
-class UaeLocationData(models.Model):
-    json_data = models.JSONField()
+class GeocodedResponse(models.Model):
+    """
+    A stored geocoding API response. The fields consumers read are kept in
+    their own columns on every save; with settings.GEOCODING_RESPONSE_STORAGE
+    set to "compressed" the response itself is kept zlib-compressed in
+    raw_response and json_data is left empty. Read it through `response`.
+    """
+    json_data = models.JSONField(blank=True, null=True)
+    raw_response = models.BinaryField(blank=True, null=True)
 
+    formatted = models.CharField(max_length=500, blank=True, null=True)
+    country = models.CharField(max_length=100, blank=True, null=True)
+    state = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    district = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    city = models.CharField(max_length=100, blank=True, null=True)
+    town = models.CharField(max_length=100, blank=True, null=True)
+    village = models.CharField(max_length=100, blank=True, null=True)
+    suburb = models.CharField(max_length=100, blank=True, null=True)
+    postcode = models.CharField(max_length=20, blank=True, null=True, db_index=True)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    confidence = models.IntegerField(blank=True, null=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def response(self):
+        if self.json_data is not None:
+            return self.json_data
+        if self.raw_response:
+            return decompress_response(self.raw_response)
+        return None
+
+    def store_response(self, data):
+        """Fill the extracted columns from `data` and keep it the way the storage setting says."""
+        for name, value in extract_response_fields(data).items():
+            max_length = self._meta.get_field(name).max_length
+            if max_length and isinstance(value, str):
+                value = value[:max_length]
+            setattr(self, name, value)
+
+        if settings.GEOCODING_RESPONSE_STORAGE == "compressed":
+            self.raw_response = compress_response(data)
+            self.json_data = None
+        else:
+            self.json_data = data
+            self.raw_response = None
+
+    def save(self, *args, **kwargs):
+        if self.json_data is not None:
+            self.store_response(self.json_data)
+
+        super().save(*args, **kwargs)
+
+
+class UaeLocationData(GeocodedResponse):
     address = models.CharField(max_length=500)
 
     requested_latitude = models.FloatField()
@@ -455,9 +549,7 @@ class UaeLocationData(models.Model):
         ordering = ["created"]
 
 
-class KsaLocationData(models.Model):
-    json_data = models.JSONField()
-
+class KsaLocationData(GeocodedResponse):
     address = models.CharField(max_length=500)
 
     requested_latitude = models.FloatField()
@@ -470,9 +562,7 @@ class KsaLocationData(models.Model):
         ordering = ["created"]
 
     
-class KuwaitLocationData(models.Model):
-    json_data = models.JSONField()
-
+class KuwaitLocationData(GeocodedResponse):
     address = models.CharField(max_length=500)
 
     requested_latitude = models.FloatField()
@@ -485,9 +575,7 @@ class KuwaitLocationData(models.Model):
         ordering = ["created"]
 
 
-class QatarLocationData(models.Model):
-    json_data = models.JSONField()
-
+class QatarLocationData(GeocodedResponse):
     address = models.CharField(max_length=500)
 
     requested_latitude = models.FloatField()
@@ -500,9 +588,7 @@ class QatarLocationData(models.Model):
         ordering = ["created"]
 
 
-class OmanLocationData(models.Model):
-    json_data = models.JSONField()
-
+class OmanLocationData(GeocodedResponse):
     address = models.CharField(max_length=500)
 
     requested_latitude = models.FloatField()
@@ -515,9 +601,7 @@ class OmanLocationData(models.Model):
         ordering = ["created"]
 
 
-class IndiaLocationData(models.Model):
-    json_data = models.JSONField()
-
+class IndiaLocationData(GeocodedResponse):
     address = models.CharField(max_length=500)
 
     requested_latitude = models.FloatField()
@@ -532,9 +616,7 @@ class IndiaLocationData(models.Model):
         ordering = ["created"]
 
 
-class BahrainLocationData(models.Model):
-    json_data = models.JSONField()
-
+class BahrainLocationData(GeocodedResponse):
     address = models.CharField(max_length=500)
 
     requested_latitude = models.FloatField()
@@ -567,14 +649,7 @@ class PincodeAndCoordinate(models.Model):
         if not self.slug:
             base_slug = slugify(f"{self.pincode}-{self.place.name}-{self.place.district.name}-{self.place.state.name}")
 
-            slug = base_slug
-            count = 1
-
-            while PincodeAndCoordinate.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(PincodeAndCoordinate, base_slug)
         
         super().save(*args, **kwargs)
 
@@ -638,9 +713,7 @@ class IndianLocation(models.Model):
         return f"{self.suburb or self.town or self.village} ({self.state or ''})"
 
 
-class SuburbLocationData(models.Model):
-    json_data = models.JSONField()
-
+class SuburbLocationData(GeocodedResponse):
     address = models.CharField(max_length=500)
 
     requested_place = models.CharField(max_length=150)
@@ -0,0 +1,175 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections import namedtuple
+
+from .trie import CompactSuffixTrie
+
+# Least to most specific. On equal match length the more specific type wins.
+LOCATION_TYPES = ("state", "district", "place")
+
+ResolvedLocation = namedtuple("ResolvedLocation", ["location_type", "slug", "id", "payload"])
+
+
+class PayloadStore:
+    """
+    Immutable list of JSON documents in one memory-mapped file: an offsets
+    table followed by the concatenated UTF-8 encoded documents.
+    """
+
+    MAGIC = b"LOCPAYL1"
+    HEADER = struct.Struct("<8sQ")
+
+    def __init__(self, offsets, blob, buffer=None):
+        self.offsets = offsets
+        self.blob = blob
+        self._buffer = buffer
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return json.loads(bytes(self.blob[self.offsets[index]:self.offsets[index + 1]]))
+
+    @classmethod
+    def build(cls, documents):
+        offsets = array("Q", [0])
+        blob = bytearray()
+        for document in documents:
+            blob += json.dumps(document, separators=(",", ":")).encode("utf-8")
+            offsets.append(len(blob))
+        return cls(offsets, blob)
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, len(self)))
+            f.write(bytes(memoryview(self.offsets).cast("B")))
+            f.write(self.blob)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = cls.HEADER.unpack_from(buffer, 0)
+        if magic != cls.MAGIC:
+            raise ValueError(f"{path} is not a location payload file")
+
+        view = memoryview(buffer)
+        start = cls.HEADER.size
+        end = start + (count + 1) * 8
+        offsets = view[start:end].cast("Q")
+        return cls(offsets, view[end:], buffer=buffer)
+
+
+class LocationResolver:
+    """
+    One suffix trie over the slugs of every state, district and place.
+    Each terminal node's value indexes a group in the payload store holding,
+    per location type, the row id and a precomputed serializer payload:
+
+        {"place": [id, {...}], "district": [id, {...}]}
+
+    Live changes are kept in a small overlay, the same way OverlayTrie does
+    for the per-type tries. Entries added or refreshed through the overlay
+    carry no payload; callers load those from the database until the next
+    build_location_tries.
+    """
+
+    def __init__(self, trie, groups):
+        self.trie = trie
+        self.groups = groups
+        self.added = {}
+        self.deleted = set()
+
+    @classmethod
+    def build(cls, entries):
+        """
+        Build from (location_type, slug, id, payload) tuples. Payload may be
+        None when it is to be loaded on demand.
+        """
+        grouped = {}
+        for location_type, slug, pk, payload in entries:
+            if slug:
+                grouped.setdefault(slug, {})[location_type] = [pk, payload]
+
+        slugs = list(grouped)
+        trie = CompactSuffixTrie.build((slug, index) for index, slug in enumerate(slugs))
+        groups = PayloadStore.build(grouped[slug] for slug in slugs)
+        return cls(trie, groups)
+
+    def save(self, trie_path, payload_path):
+        self.trie.save(trie_path)
+        self.groups.save(payload_path)
+
+    @classmethod
+    def load(cls, trie_path, payload_path):
+        return cls(CompactSuffixTrie.load(trie_path), PayloadStore.load(payload_path))
+
+    def copy(self):
+        resolver = LocationResolver(self.trie, self.groups)
+        resolver.added = {slug: dict(group) for slug, group in self.added.items()}
+        resolver.deleted = set(self.deleted)
+        return resolver
+
+    def insert(self, location_type, slug, pk):
+        if not slug:
+            return
+        self.deleted.discard((slug, location_type))
+        self.added.setdefault(slug, {})[location_type] = [pk, None]
+
+    def refresh(self, location_type, slug, pk):
+        """Drop the prebuilt payload of an edited location."""
+        self.insert(location_type, slug, pk)
+
+    def delete(self, location_type, slug):
+        if not slug:
+            return
+        group = self.added.get(slug)
+        if group:
+            group.pop(location_type, None)
+            if not group:
+                del self.added[slug]
+        self.deleted.add((slug, location_type))
+
+    def _candidates(self, slug, base_group):
+        group = {}
+        if base_group:
+            for location_type, value in base_group.items():
+                if (slug, location_type) not in self.deleted:
+                    group[location_type] = value
+        group.update(self.added.get(slug, {}))
+        return group
+
+    def resolve(self, input_slug, location_type=None):
+        """
+        Longest slug that is a suffix of input_slug; when several location
+        types share that slug, the most specific one. `location_type`
+        restricts the match to a single type.
+        """
+        if not input_slug:
+            return None
+
+        allowed = (location_type,) if location_type else LOCATION_TYPES
+        base_matches = dict(self.trie.suffix_matches(input_slug))
+
+        # Longest candidate first
+        for start in range(len(input_slug)):
+            candidate = input_slug[start:]
+            if candidate not in base_matches and candidate not in self.added:
+                continue
+
+            base_index = base_matches.get(candidate)
+            base_group = self.groups[base_index] if base_index is not None else None
+            group = self._candidates(candidate, base_group)
+
+            for matched_type in reversed(LOCATION_TYPES):
+                if matched_type in allowed and matched_type in group:
+                    pk, payload = group[matched_type]
+                    return ResolvedLocation(matched_type, candidate, pk, payload)
+
+        return None
@@ -0,0 +1,62 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import UniqueState, UniqueDistrict, UniquePlace
+from .trie_cache import publish_trie_change
+
+TRIE_SENDERS = {
+    UniqueState: "state",
+    UniqueDistrict: "district",
+    UniquePlace: "place",
+}
+
+# Columns of each model that go into its resolver payload (see build_location_tries).
+# updated is left out: it changes on every save and is refreshed by the next build.
+PAYLOAD_FIELDS = {
+    UniqueState: ("name",),
+    UniqueDistrict: ("name", "state_id"),
+    UniquePlace: ("name", "district_id", "state_id"),
+}
+
+
+def payload_snapshot(sender, instance):
+    return tuple(instance.__dict__.get(field) for field in PAYLOAD_FIELDS[sender])
+
+
+@receiver(post_init, sender=UniqueState)
+@receiver(post_init, sender=UniqueDistrict)
+@receiver(post_init, sender=UniquePlace)
+def remember_trie_slug(sender, instance, **kwargs):
+    # The slug as loaded, so a re-slug can remove the old trie entry
+    instance._trie_slug = instance.__dict__.get("slug")
+    # and the payload columns, so only edits to those refresh the resolver
+    instance._trie_payload = payload_snapshot(sender, instance)
+
+
+@receiver(post_save, sender=UniqueState)
+@receiver(post_save, sender=UniqueDistrict)
+@receiver(post_save, sender=UniquePlace)
+def update_trie_on_save(sender, instance, **kwargs):
+    location_type = TRIE_SENDERS[sender]
+    old_slug = getattr(instance, "_trie_slug", None)
+    old_payload = getattr(instance, "_trie_payload", None)
+    instance._trie_payload = payload_snapshot(sender, instance)
+
+    if old_slug == instance.slug:
+        if old_payload != instance._trie_payload:
+            # Same trie entry, but the resolver's prebuilt payload is out of date
+            publish_trie_change(location_type, "refresh", instance.slug, instance.pk)
+        return
+
+    if old_slug:
+        publish_trie_change(location_type, "delete", old_slug)
+
+    publish_trie_change(location_type, "insert", instance.slug, instance.pk)
+    instance._trie_slug = instance.slug
+
+
+@receiver(post_delete, sender=UniqueState)
+@receiver(post_delete, sender=UniqueDistrict)
+@receiver(post_delete, sender=UniquePlace)
+def update_trie_on_delete(sender, instance, **kwargs):
+    publish_trie_change(TRIE_SENDERS[sender], "delete", instance.slug)
@@ -0,0 +1,330 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from (lat, lon) to arrays of points, all in degrees."""
+    lat1 = math.radians(lat)
+    lats2 = np.radians(lats)
+    dlat = lats2 - lat1
+    dlon = np.radians(lons) - math.radians(lon)
+
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lats2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def grid_cell(lat, lon, cell_size):
+    """Id of the cell_size° grid cell containing (lat, lon); rows run south to north."""
+    columns = int(round(360 / cell_size))
+    row = math.floor((float(lat) + 90) / cell_size)
+    column = math.floor((float(lon) + 180) / cell_size) % columns
+    return row * columns + column
+
+
+def cells_in_box(min_lat, max_lat, min_lon, max_lon, cell_size):
+    """Ids of the cell_size° grid cells overlapping a lat/lon box."""
+    columns = int(round(360 / cell_size))
+    first_row = math.floor((max(min_lat, -90) + 90) / cell_size)
+    last_row = math.floor((min(max_lat, 90) + 90) / cell_size)
+    first_column = math.floor((min_lon + 180) / cell_size)
+    last_column = math.floor((max_lon + 180) / cell_size)
+
+    return [
+        row * columns + column % columns
+        for row in range(first_row, last_row + 1)
+        for column in range(first_column, last_column + 1)
+    ]
+
+
+def name_key(name):
+    """Stable 63 bit key of a place name, used to dedupe results by name."""
+    digest = hashlib.blake2b((name or "").encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") >> 1
+
+
+class SpatialIndex:
+    """
+    Grid index over points held in NumPy arrays.
+
+    Points are sorted by the id of the CELL_SIZE° grid cell they fall in, so
+    one row of cells spanning several columns is a contiguous slice found with
+    two binary searches. Radius queries gather the slices of the rows covering
+    the query's bounding box and filter them by haversine distance; k-nearest
+    queries widen the radius until k points are inside it.
+    """
+
+    CELL_SIZE = 0.05
+    COLUMNS = int(round(360 / CELL_SIZE))
+
+    DTYPE = np.dtype([
+        ("cell", "<i8"),
+        ("lat", "<f8"),
+        ("lon", "<f8"),
+        ("id", "<i8"),
+        ("name_key", "<i8"),
+    ])
+
+    def __init__(self, points):
+        self.points = points
+        self.cells = points["cell"]
+        self.lats = points["lat"]
+        self.lons = points["lon"]
+        self.ids = points["id"]
+        self.name_keys = points["name_key"]
+
+    def __len__(self):
+        return len(self.points)
+
+    @classmethod
+    def _row(cls, lat):
+        return np.floor((np.asarray(lat) + 90) / cls.CELL_SIZE).astype("i8")
+
+    @classmethod
+    def _column(cls, lon):
+        return np.floor((np.asarray(lon) + 180) / cls.CELL_SIZE).astype("i8") % cls.COLUMNS
+
+    @classmethod
+    def build(cls, rows):
+        """Build from (id, latitude, longitude, name) tuples; rows without coordinates are skipped."""
+        records = [
+            (0, lat, lon, pk, name_key(name))
+            for pk, lat, lon, name in rows
+            if lat is not None and lon is not None
+        ]
+        points = np.array(records, dtype=cls.DTYPE)
+        if len(points):
+            points["cell"] = cls._row(points["lat"]) * cls.COLUMNS + cls._column(points["lon"])
+            points = points[np.argsort(points["cell"], kind="stable")]
+        return cls(points)
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp.npy"
+        np.save(tmp_path, self.points, allow_pickle=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        return cls(np.load(path, mmap_mode="r", allow_pickle=False))
+
+    def _candidates(self, lat, lon, radius_km):
+        """Indexes of the points in the grid cells covering the radius' bounding box."""
+        dlat = radius_km / KM_PER_DEGREE
+        first_row = int(self._row(max(lat - dlat, -90)))
+        last_row = int(self._row(min(lat + dlat, 90)))
+
+        cos_lat = min(math.cos(math.radians(lat - dlat)), math.cos(math.radians(min(lat + dlat, 90))))
+        if cos_lat <= 0 or dlat / cos_lat >= 180:
+            column_ranges = [(0, self.COLUMNS - 1)]
+        else:
+            dlon = dlat / cos_lat
+            first_column = int(self._column(lon - dlon))
+            last_column = int(self._column(lon + dlon))
+            if first_column <= last_column:
+                column_ranges = [(first_column, last_column)]
+            else:  # crosses the antimeridian
+                column_ranges = [(first_column, self.COLUMNS - 1), (0, last_column)]
+
+        starts = []
+        ends = []
+        for row in range(first_row, last_row + 1):
+            for first_column, last_column in column_ranges:
+                starts.append(row * self.COLUMNS + first_column)
+                ends.append(row * self.COLUMNS + last_column)
+
+        lo = np.searchsorted(self.cells, starts, side="left")
+        hi = np.searchsorted(self.cells, ends, side="right")
+
+        slices = [np.arange(start, end) for start, end in zip(lo, hi) if end > start]
+        if not slices:
+            return np.empty(0, dtype="i8")
+        return np.concatenate(slices)
+
+    def within(self, lat, lon, radius_km):
+        """(indexes, distances_km) of points within radius_km, nearest first."""
+        indexes = self._candidates(lat, lon, radius_km)
+        if not len(indexes):
+            return indexes, np.empty(0)
+
+        distances = haversine_km(lat, lon, self.lats[indexes], self.lons[indexes])
+        mask = distances <= radius_km
+        indexes = indexes[mask]
+        distances = distances[mask]
+
+        order = np.argsort(distances, kind="stable")
+        return indexes[order], distances[order]
+
+    def nearest(self, lat, lon, k=1):
+        """(indexes, distances_km) of the k nearest points, nearest first."""
+        if not len(self.points):
+            return np.empty(0, dtype="i8"), np.empty(0)
+
+        radius_km = self.CELL_SIZE * KM_PER_DEGREE
+        while True:
+            indexes, distances = self.within(lat, lon, radius_km)
+            # Anything outside the radius is farther than everything inside it
+            if len(indexes) >= k or radius_km >= math.pi * EARTH_RADIUS_KM:
+                return indexes[:k], distances[:k]
+            radius_km *= 2
+
+    def nearby_ids(self, lat, lon, radius_km):
+        """Ids within radius_km, keeping only the nearest point of each name."""
+        indexes, _ = self.within(lat, lon, radius_km)
+        _, first = np.unique(self.name_keys[indexes], return_index=True)
+        return [int(pk) for pk in self.ids[indexes[np.sort(first)]]]
+
+
+# How often (seconds) a worker looks at the modification time of an index file
+INDEX_CHECK_INTERVAL = 1.0
+
+# name -> (index, file mtime_ns or None, monotonic time of the last check)
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _get_index(name, build_from_db):
+    """
+    Memory-map `<LOCATION_TRIE_DIR>/<name>` written by `manage.py
+    build_location_tries`, and map it again once the file has been replaced,
+    which is looked for at most every INDEX_CHECK_INTERVAL seconds. Until the
+    file exists the index is built once per process with `build_from_db`.
+    """
+    now = time.monotonic()
+    entry = _indexes.get(name)
+    if entry is not None and now - entry[2] < INDEX_CHECK_INTERVAL:
+        return entry[0]
+
+    with _indexes_lock:
+        entry = _indexes.get(name)
+        if entry is not None and now - entry[2] < INDEX_CHECK_INTERVAL:
+            return entry[0]
+
+        path = get_index_path(name)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if entry is not None and entry[1] == mtime:
+            index = entry[0]
+        elif mtime is None:
+            logger.warning(
+                f"{path} has not been built, building it from the database. "
+                "Run manage.py build_location_tries --type spatial"
+            )
+            index = build_from_db()
+        else:
+            try:
+                index = SpatialIndex.load(path)
+            except (OSError, ValueError) as e:
+                if entry is not None:
+                    logger.warning(f"Could not load {path}: {e}")
+                    index, mtime = entry[0], entry[1]
+                else:
+                    logger.warning(f"Could not load {path}: {e}, building it from the database.")
+                    index, mtime = build_from_db(), None
+
+        _indexes[name] = (index, mtime, now)
+
+    return index
+
+
+def get_index_path(name):
+    from django.conf import settings
+
+    return os.path.join(settings.LOCATION_TRIE_DIR, name)
+
+
+PLACE_INDEX_FILE = "place_coordinates.npy"
+PINCODE_INDEX_FILE = "pincode_coordinates.npy"
+
+
+def get_place_index_path():
+    return get_index_path(PLACE_INDEX_FILE)
+
+
+def get_pincode_index_path():
+    return get_index_path(PINCODE_INDEX_FILE)
+
+
+def build_place_index_from_db():
+    from .models import PlaceCoordinate
+
+    return SpatialIndex.build(
+        PlaceCoordinate.objects.values_list(
+            "place_id", "latitude", "longitude", "place__name"
+        ).iterator()
+    )
+
+
+def _as_pincode(value):
+    value = str(value or "").replace(" ", "")
+    return int(value) if len(value) == 6 and value.isdigit() else None
+
+
+def generate_pincode_points():
+    """(pincode, latitude, longitude, name) of every known point with a pincode."""
+    from .models import Place, PlaceCoordinate, PlacePincode, IndianLocation
+
+    for pincode, latitude, longitude in Place.objects.filter(
+        pincode__isnull=False
+    ).values_list("pincode", "latitude", "longitude").iterator():
+        yield pincode, latitude, longitude, ""
+
+    first_pincodes = {}
+    for place_id, pincode in PlacePincode.objects.filter(
+        pincode__isnull=False
+    ).order_by("-id").values_list("place_id", "pincode").iterator():
+        first_pincodes[place_id] = pincode
+
+    for place_id, latitude, longitude in PlaceCoordinate.objects.values_list(
+        "place_id", "latitude", "longitude"
+    ).iterator():
+        pincode = first_pincodes.get(place_id)
+        if pincode:
+            yield pincode, latitude, longitude, ""
+
+    for postcode, latitude, longitude in IndianLocation.objects.filter(
+        postcode__isnull=False
+    ).values_list("postcode", "latitude", "longitude").iterator():
+        pincode = _as_pincode(postcode)
+        if pincode:
+            yield pincode, latitude, longitude, ""
+
+
+def build_pincode_index_from_db():
+    return SpatialIndex.build(generate_pincode_points())
+
+
+def get_place_index():
+    """Spatial index of PlaceCoordinate rows keyed by place id."""
+    return _get_index(PLACE_INDEX_FILE, build_place_index_from_db)
+
+
+def get_pincode_index():
+    """Spatial index of Place, PlaceCoordinate and IndianLocation points keyed by pincode."""
+    return _get_index(PINCODE_INDEX_FILE, build_pincode_index_from_db)
+
+
+def nearest_pincode(lat, lon, max_km):
+    """Pincode of the known point nearest to (lat, lon), or None when none is within max_km."""
+    index = get_pincode_index()
+
+    # Bounded search: never scans beyond the cutoff
+    indexes, _ = index.within(lat, lon, max_km)
+    if not len(indexes):
+        return None
+
+    return int(index.ids[indexes[0]])
@@ -0,0 +1,156 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import UniqueState, UniqueDistrict, UniquePlace, PlaceCoordinate, PlacePincode, LocationSummary
+
+
+def _sort_name(name):
+    # MySQL compares names case-insensitively
+    return (name or "").lower()
+
+
+def _first_related(through, related_field, *fields):
+    """{place_id: values of its lowest id related row}, what `.first()` on the M2M manager returns."""
+    first = {}
+    for row in through.objects.order_by(f"-{related_field}_id").values_list(
+        "uniqueplace_id", *[f"{related_field}__{field}" for field in fields]
+    ).iterator():
+        first[row[0]] = row[1:]
+    return first
+
+
+def _centroid(coordinates):
+    if not coordinates:
+        return None, None
+    return (
+        sum(latitude for _, _, latitude, _ in coordinates) / len(coordinates),
+        sum(longitude for _, _, _, longitude in coordinates) / len(coordinates),
+    )
+
+
+def build_location_summaries():
+    """
+    LocationSummary rows for every state and district, computed from a
+    handful of full-table reads instead of several queries per location.
+    Each value reproduces what the per-object queries it replaces returned.
+    """
+    places = {}
+    state_places = defaultdict(list)
+    district_places = defaultdict(list)
+    for pk, name, district_id, state_id in UniquePlace.objects.order_by().values_list(
+        "id", "name", "district_id", "state_id"
+    ).iterator():
+        places[pk] = (name, district_id, state_id)
+        state_places[state_id].append(pk)
+        district_places[district_id].append(pk)
+
+    # Coordinates and pincodes linked through the place foreign key, by id
+    state_coordinates = defaultdict(list)
+    district_coordinates = defaultdict(list)
+    for pk, place_id, latitude, longitude in PlaceCoordinate.objects.order_by("id").values_list(
+        "id", "place_id", "latitude", "longitude"
+    ).iterator():
+        place = places.get(place_id)
+        if place:
+            coordinate = (pk, place_id, latitude, longitude)
+            state_coordinates[place[2]].append(coordinate)
+            district_coordinates[place[1]].append(coordinate)
+
+    first_pincodes = {}
+    for pk, place_id, pincode in PlacePincode.objects.order_by("-id").values_list(
+        "id", "place_id", "pincode"
+    ).iterator():
+        first_pincodes[place_id] = (pk, pincode)
+
+    name_pincodes = {}
+    for place_id, (pk, pincode) in first_pincodes.items():
+        place = places.get(place_id)
+        if place:
+            key = _sort_name(place[0])
+            if key not in name_pincodes or pk < name_pincodes[key][0]:
+                name_pincodes[key] = (pk, pincode)
+
+    # Coordinates and pincodes linked through the many-to-many fields
+    m2m_pincodes = _first_related(UniquePlace.pincodes.through, "placepincode", "pincode")
+    m2m_coordinates = _first_related(
+        UniquePlace.coordinates.through, "placecoordinate", "latitude", "longitude"
+    )
+
+    def by_name(place_ids):
+        return sorted(place_ids, key=lambda pk: (_sort_name(places[pk][0]), pk))
+
+    def median_pincode(median):
+        pincode = first_pincodes.get(median[1])
+        return pincode[1] if pincode else None
+
+    summaries = []
+
+    for state_id in UniqueState.objects.order_by().values_list("id", flat=True):
+        place_ids = state_places.get(state_id, [])
+        coordinates = state_coordinates.get(state_id, [])
+        median = coordinates[len(coordinates) // 2] if coordinates else None
+
+        state_pincodes = [first_pincodes[pk] for pk in place_ids if pk in first_pincodes]
+        if state_pincodes:
+            pincode = min(state_pincodes)[1]
+        elif not place_ids:
+            pincode = None
+        else:
+            pincode = m2m_pincodes.get(by_name(place_ids)[0], (None,))[0]
+
+        centroid_latitude, centroid_longitude = _centroid(coordinates)
+        summaries.append(LocationSummary(
+            state_id=state_id,
+            place_count=len(place_ids),
+            centroid_latitude=centroid_latitude,
+            centroid_longitude=centroid_longitude,
+            median_latitude=median[2] if median else None,
+            median_longitude=median[3] if median else None,
+            median_pincode=median_pincode(median) if median else None,
+            latitude=median[2] if median else None,
+            longitude=median[3] if median else None,
+            pincode=pincode,
+        ))
+
+    for district_id, district_name in UniqueDistrict.objects.order_by().values_list("id", "name"):
+        place_ids = district_places.get(district_id, [])
+        coordinates = sorted(district_coordinates.get(district_id, []), key=lambda row: (row[2], row[3], row[0]))
+        median = coordinates[len(coordinates) // 2] if coordinates else None
+
+        # get_pincode action: any place named like the district, else the centre's place
+        named = name_pincodes.get(_sort_name(district_name))
+        if named:
+            center_pincode = named[1]
+        else:
+            center_pincode = median_pincode(median) if median else None
+
+        # Place the mini serializer takes the pincode and coordinate from
+        short_name = _sort_name(district_name.replace("District", "").strip())
+        ordered = by_name(place_ids)
+        place_id = (
+            next((pk for pk in ordered if _sort_name(places[pk][0]) == short_name), None)
+            or next((pk for pk in ordered if short_name in _sort_name(places[pk][0])), None)
+            or (ordered[0] if ordered else None)
+        )
+        latitude, longitude = m2m_coordinates.get(place_id, (None, None))
+
+        centroid_latitude, centroid_longitude = _centroid(coordinates)
+        summaries.append(LocationSummary(
+            district_id=district_id,
+            place_count=len(place_ids),
+            centroid_latitude=centroid_latitude,
+            centroid_longitude=centroid_longitude,
+            median_latitude=median[2] if median else None,
+            median_longitude=median[3] if median else None,
+            median_pincode=center_pincode,
+            latitude=latitude,
+            longitude=longitude,
+            pincode=m2m_pincodes.get(place_id, (None,))[0],
+        ))
+
+    with transaction.atomic():
+        LocationSummary.objects.all().delete()
+        LocationSummary.objects.bulk_create(summaries, batch_size=1000)
+
+    return len(summaries)
@@ -3,7 +3,7 @@ from locations.views import get_india_locations
 from celery import shared_task
 import os
 
-from locations.models import PincodeAndCoordinate, IndiaLocationData, UniquePlace
+from locations.models import PincodeAndCoordinate, IndiaLocationDataOld, UniquePlace
 from directory.views import fetch_destination_locations, logger, fetch_police_locations, fetch_court_locations
 
 def configure_logger(log_filename):
@@ -28,10 +28,7 @@ def run1():
 
     top_left = (30.89, 68.1)
 
-    api_key = os.getenv('OPENCAGE_API_KEY_1')
-    opencage_cache = "opencage_requested_1"
-
-    get_india_locations(top_left, bottom_right, api_key, opencage_cache)
+    get_india_locations(top_left, bottom_right, 'OPENCAGE_API_KEY_1')
 
 @shared_task(queue="worker2_queue")
 def run2():
@@ -44,10 +41,7 @@ def run2():
 
     top_left = (23.32, 68.1)
 
-    api_key = os.getenv('OPENCAGE_API_KEY_2')
-    opencage_cache = "opencage_requested_2"
-
-    get_india_locations(top_left, bottom_right, api_key, opencage_cache)
+    get_india_locations(top_left, bottom_right, 'OPENCAGE_API_KEY_2')
 
 @shared_task(queue="worker3_queue")
 def run3():
@@ -60,10 +54,7 @@ def run3():
 
     top_left = (12.6, 68.1)
 
-    api_key = os.getenv('OPENCAGE_API_KEY_3')
-    opencage_cache = "opencage_requested_3"
-
-    get_india_locations(top_left, bottom_right, api_key, opencage_cache)
+    get_india_locations(top_left, bottom_right, 'OPENCAGE_API_KEY_3')
 
 @shared_task(bind=True, queue="worker1_queue", autoretry_for=(Exception,), retry_backoff=10, max_retries=5)
 def fetch_locations_1(self):    
@@ -98,79 +89,17 @@ def fetch_locations_3(self):
 
 @shared_task(queue="worker5_queue")
 def update_places(selected_state):
-    from collections import defaultdict
-    from django.db import transaction
-
-    from locations.models import UniquePlace, PlaceCoordinate, PlacePincode, Place
-
-    # Step 1: Index all Place records in memory
-    logger.info(f"Loading all Place of {selected_state} into memory...")
-    place_index = defaultdict(lambda: {"pincodes": set(), "coordinates": set()})
-    for pl in Place.objects.filter(state__name = selected_state).select_related("district", "state").values(
-        "name", "district__name", "state__name", "pincode", "latitude", "longitude"
-    ):
-        key = (pl["name"], pl["district__name"], pl["state__name"])
-        place_index[key]["pincodes"].add(pl["pincode"])
-        place_index[key]["coordinates"].add((pl["latitude"], pl["longitude"]))
-
-    logger.info(f"Indexed {len(place_index)} place groups.")
-
-    # Step 2: Process UniquePlaces with minimal DB hits
-    unique_places = UniquePlace.objects.select_related("district", "state").prefetch_related("pincodes", "coordinates")
-
-    new_pincodes = []
-    new_coordinates = []
-    place_pincode_map = defaultdict(list)
-    place_coordinate_map = defaultdict(list)
-
-    logger.info("Processing UniquePlaces...")
-    for place in unique_places:
-        key = (place.name, place.district.name, place.state.name)
-        data = place_index.get(key)
-        if not data:
-            continue
-
-        for pincode in data["pincodes"]:
-            new_pincodes.append(PlacePincode(place=place, pincode=pincode))
-            place_pincode_map[place].append(pincode)
-
-        for lat, lng in data["coordinates"]:
-            new_coordinates.append(PlaceCoordinate(place=place, latitude=lat, longitude=lng))
-            place_coordinate_map[place].append((lat, lng))
-
-    logger.info("Bulk creating PlacePincode and PlaceCoordinate objects...")
-
-    # Step 3: Bulk create (ignore duplicates)
-    with transaction.atomic():
-        PlacePincode.objects.bulk_create(new_pincodes, ignore_conflicts=True)
-        PlaceCoordinate.objects.bulk_create(new_coordinates, ignore_conflicts=True)
+    from .utils.places import update_places as merge_places
 
-    logger.info("Re-fetching created pincode and coordinate objects...")
-
-    # Step 4: Re-fetch related objects to set M2M
-    pincode_objs = PlacePincode.objects.filter(place__in=unique_places)
-    coordinate_objs = PlaceCoordinate.objects.filter(place__in=unique_places)
-
-    pincode_lookup = defaultdict(list)
-    for pp in pincode_objs:
-        pincode_lookup[pp.place_id].append(pp)
-
-    coordinate_lookup = defaultdict(list)
-    for pc in coordinate_objs:
-        coordinate_lookup[pc.place_id].append(pc)
-
-    logger.info("Updating M2M relations in bulk...")
-    for place in unique_places:
-        place.pincodes.set(pincode_lookup[place.id])
-        place.coordinates.set(coordinate_lookup[place.id])
-
-    logger.info("Update complete.")
+    merge_places(selected_state)
+    rebuild_location_summaries.delay(rebuild_tries=True)
 
 
 @shared_task(queue="worker4_queue")
 def fetch_pincode_and_coordinate():
     from directory.models import PostOffice
     from .models import UniquePlace, PincodeAndCoordinate
+    from .utils.post_office import match_post_offices
     from django.db.models import Count
 
     logger.info("Program Started.")
@@ -180,156 +109,137 @@ def fetch_pincode_and_coordinate():
             pincode_count=Count("pincodes")
         ).filter(
             pincode_count__gt=1            
-        )
+        ).values_list("id", "name", "district__name", "state__name")
     )
 
-    places_length = len(places)
-
     logger.info(f"Found {len(places)} places having more than a single pincode.")
 
-    creating_items = []
-    progress = 0
+    post_offices = PostOffice.objects.order_by("pincode", "id").values_list(
+        "id", "office_name", "pincode", "latitude", "longitude", "district", "state_name"
+    ).iterator(chunk_size=5000)
+    existing = PincodeAndCoordinate.objects.values_list("place_id", "pincode").iterator(chunk_size=5000)
 
     logger.info("Checking for matching post offices...")
 
-    for index, place in enumerate(places):
-        current_progress = int((index + 1) * 100 / places_length)
+    matches = match_post_offices(places, post_offices, existing)
 
-        if current_progress > progress:
-            progress = current_progress
-            logger.info(f"{current_progress}% Completed")
-
-        try:
-            post_offices = PostOffice.objects.filter(
-                office_name__icontains=place.name,
-                district=place.district.name,
-                state_name=place.state.name
-            )
-
-            for post_office in post_offices:
-                if PincodeAndCoordinate.objects.filter(place = place, pincode = post_office.pincode).exists():
-                    continue
-                
-                latitude = post_office.latitude
-                longitude = post_office.longitude
-
-                if latitude:
-                    latitude=float(str(post_office.latitude).strip().strip("-"))
-
-                if longitude:
-                    longitude=float(str(post_office.longitude).strip().strip("-"))
-
-                creating_items.append(PincodeAndCoordinate(
-                    place = place,
-                    post_office_id=post_office.id,
-                    pincode=post_office.pincode,
-                    latitude=latitude,
-                    longitude=longitude
-                ))
-
-        except PostOffice.DoesNotExist:
-            pass
+    creating_items = [
+        PincodeAndCoordinate(
+            place_id = place_id,
+            post_office_id=post_office_id,
+            pincode=pincode,
+            latitude=PostOffice.parse_coordinate(latitude),
+            longitude=PostOffice.parse_coordinate(longitude)
+        ) for place_id, (post_office_id, _, pincode, latitude, longitude) in matches
+    ]
 
     logger.info(f"\nFound {len(creating_items)} matching post offices.")
     logger.info("Running bulk creation...")
 
-    PincodeAndCoordinate.objects.bulk_create(creating_items, ignore_conflicts=True)
+    PincodeAndCoordinate.objects.bulk_create(creating_items, batch_size=1000, ignore_conflicts=True)
 
     logger.info("Program Completed.")
 
 
-def get_indian_locations(places_ids, api_key, opencage_cache):
-    from django.db import transaction
-    from django.core.cache import cache
-    import time
-    import requests
-
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
-    request_count = cache.get(opencage_cache, 0)
-
-    places = UniquePlace.objects.filter(id__in = places_ids)
+# Work queue of the place ids run_place_fetching hands out to the key workers
+PLACE_FETCHING_QUEUE = "india_place_locations"
+PLACE_FETCHING_CHUNK_SIZE = 50
 
-    for place in places:
-        if request_count <= 10000:
-            with transaction.atomic():
-                try:
-                    logger.info(f"Querying place: {place.name},{place.district.name},{place.state.name},India")
 
-                    response = requests.get(base_url, params={
-                        "q": f"{place.name},{place.district.name},{place.state.name},India",
-                        "key": api_key
-                    })
-
-                    response.raise_for_status()
-
-                    request_count += 1
-                    cache.set(opencage_cache, request_count, timeout=60*60*24)
-                    data = response.json()
-
-                    logger.info(f"Request number: {request_count}")
-
-                    if "results" in data and data["results"]:
-                        first_result = data["results"][0]
-                        components = first_result.get("components", {})
-                        formatted = first_result.get("formatted", "")
+def get_indian_locations(key_name):
+    """
+    Geocode the places of the PLACE_FETCHING_QUEUE work queue with the
+    OpenCage key in the `key_name` environment variable. Chunks are leased
+    until the queue is empty or the key's daily budget is spent; unfinished
+    places are put back for the other keys.
+    """
+    from django.db import transaction
+    import requests
 
-                        country = components.get("country")                    
+    from utility.geocoding import opencage_geocode
+    from utility.quota import QuotaExhausted, WorkQueue, get_opencage_limiter, get_opencage_quota
 
-                        if str(country).lower() in {"india"}:
-                            road = components.get("road")
-                            address = formatted.replace(f"{road},", "").strip() if road else formatted
+    api_key, limiter = get_opencage_limiter(key_name)
+    work = WorkQueue(get_opencage_quota().redis, PLACE_FETCHING_QUEUE)
 
-                            IndiaLocationData.objects.create(                                        
-                                address = address, json_data = data, place = place                                            
-                            )
+    while True:
+        places_ids = work.lease()
+        if places_ids is None:
+            break
 
-                            logger.info(f"Location fetched for: '{address}'\n")
-                    
+        places = list(UniquePlace.objects.filter(id__in = places_ids).select_related("district", "state"))
 
-                except requests.exceptions.RequestException as e:
-                    logger.info(f"Error during API request: {e}")
-                    time.sleep(2)
-                    continue
+        # Places are put back unless geocoded or failed, however the chunk ends
+        finished = 0
+        failed = []
 
-                except Exception as e:
-                    logger.exception(f"An Unexpected Error occured: {e}")
-                    time.sleep(2)
-                    continue
-        
-                time.sleep(0.2)
-
-        else:
-            logger.info("You have used up your daily API call limit.")
-            return
+        try:
+            for place in places:
+                with transaction.atomic():
+                    try:
+                        logger.info(f"Querying place: {place.name},{place.district.name},{place.state.name},India")
+
+                        data, cached = opencage_geocode(
+                            f"{place.name},{place.district.name},{place.state.name},India", api_key, limiter=limiter
+                        )
+
+                        if "results" in data and data["results"]:
+                            first_result = data["results"][0]
+                            components = first_result.get("components", {})
+                            formatted = first_result.get("formatted", "")
+
+                            country = components.get("country")                    
+
+                            if str(country).lower() in {"india"}:
+                                road = components.get("road")
+                                address = formatted.replace(f"{road},", "").strip() if road else formatted
+
+                                IndiaLocationDataOld.objects.create(
+                                    address = address, json_data = data, place = place
+                                )
+
+                                logger.info(f"Location fetched for: '{address}'\n")
+
+                    except QuotaExhausted:
+                        logger.info("You have used up your daily API call limit.")
+                        return
+
+                    except requests.exceptions.RequestException as e:
+                        logger.info(f"Error during API request: {e}")
+                        limiter.pause(2)
+                        failed.append(place.id)
+
+                    except Exception as e:
+                        logger.exception(f"An Unexpected Error occured: {e}")
+                        failed.append(place.id)
+
+                finished += 1
+        finally:
+            # Failed places go to the dead-letter set; run_place_fetching queues them again
+            work.fail(failed)
+            work.release([place.id for place in places[finished:]])
     
     logger.info("Fetching Completed")
 
 @shared_task(queue="worker1_queue")
-def run_india1(place_ids): 
-    api_key = os.getenv('OPENCAGE_API_KEY_1')
-    opencage_cache = "opencage_requested_1"
-    
-    get_indian_locations(place_ids, api_key, opencage_cache)
+def run_india1(): 
+    get_indian_locations("OPENCAGE_API_KEY_1")
 
 @shared_task(queue="worker2_queue")
-def run_india2(place_ids):    
-    api_key = os.getenv('OPENCAGE_API_KEY_2')
-    opencage_cache = "opencage_requested_2"
-    
-    get_indian_locations(place_ids, api_key, opencage_cache)
+def run_india2():    
+    get_indian_locations("OPENCAGE_API_KEY_2")
 
 @shared_task(queue="worker3_queue")
-def run_india3(place_ids):    
-    api_key = os.getenv('OPENCAGE_API_KEY_3')
-    opencage_cache = "opencage_requested_3"
-    
-    get_indian_locations(place_ids, api_key, opencage_cache)
+def run_india3():    
+    get_indian_locations("OPENCAGE_API_KEY_3")
 
 def run_place_fetching():    
     from django.db.models import Count    
 
+    from utility.quota import WorkQueue, get_opencage_quota
+
     po_places_ids = list(PincodeAndCoordinate.objects.values_list("place__id", flat=True))
-    json_place_ids = list(IndiaLocationData.objects.values_list("place__id", flat=True))
+    json_place_ids = list(IndiaLocationDataOld.objects.values_list("place__id", flat=True))
 
     excluding_places_ids = set(po_places_ids + json_place_ids)
 
@@ -342,16 +252,13 @@ def run_place_fetching():
         ).values_list("id", flat=True)
     )
     
-    places_count = len(places)
-    limit = int(places_count/3)
+    # Every key worker leases chunks until the queue is empty or its budget
+    # is spent, so no key sits idle while another still has places left
+    WorkQueue(get_opencage_quota().redis, PLACE_FETCHING_QUEUE).fill(places, PLACE_FETCHING_CHUNK_SIZE)
 
-    place_ids_1 = places[:limit]
-    place_ids_2 = places[limit:2*limit]
-    place_ids_3 = places[2*limit:]
-
-    run_india1.delay(place_ids_1)
-    run_india2.delay(place_ids_2)
-    run_india3.delay(place_ids_3)
+    run_india1.delay()
+    run_india2.delay()
+    run_india3.delay()
 
 
 @shared_task(queue="worker5_queue")
@@ -432,90 +339,45 @@ def save_locations():
 
 
 #########################################3
-from .models import IndiaLocationData, PincodeAndCoordinate, UniquePlace
-
-def get_opencage_pincode_and_coordiante(json_item):
-    results = json_item.get("results")
-    if not results:
-        return {"pincode": None, "latitude": None, "longitude": None}
-
-    result = results[0]
-    components = result.get("components", {})
-    coordinate = result.get("geometry", {})
-
-    pincode = components.get("postcode")
-    latitude = coordinate.get("lat")
-    longitude = coordinate.get("lng")
-
-    return {
-        "pincode": pincode,
-        "latitude": latitude,
-        "longitude": longitude
-    }
-
-
 @shared_task(queue="worker5_queue")
 def update_pincodes():
-    import logging
-    from .models import PlacePincode, PlaceCoordinate
+    from .utils.pincode import update_pincodes as consolidate_pincodes
 
-    logger = logging.getLogger(__name__)
+    consolidate_pincodes()
+    rebuild_location_summaries.delay(rebuild_tries=True)
 
-    opencage_collection = IndiaLocationData.objects.all()
-    post_office_collection = PincodeAndCoordinate.objects.all()
 
-    opencage_place_slugs = set(opencage_collection.values_list("place__slug", flat=True))
-    post_office_place_slugs = set(post_office_collection.values_list("place__slug", flat=True))
-
-    updating_place_slugs = opencage_place_slugs | post_office_place_slugs
-    modifying_places = UniquePlace.objects.filter(slug__in=updating_place_slugs)
-
-    places_length = len(modifying_places)
-    progress = 0
+@shared_task(queue="worker5_queue")
+def rebuild_location_summaries(rebuild_tries=False):
+    from .summary import build_location_summaries
 
-    for index, place in enumerate(modifying_places):
-        current_progress = int((index + 1) * 100 / places_length)
+    count = build_location_summaries()
+    logger.info(f"Rebuilt {count} location summaries.")
 
-        if current_progress > progress:
-            progress = current_progress
-            logger.info(f"{current_progress}% Completed")
+    # Resolver payloads carry the summaries, pincodes and coordinates
+    if rebuild_tries:
+        schedule_location_tries_rebuild()
 
-        pincodes = []
-        latitude = None
-        longitude = None
 
-        if place.slug in opencage_place_slugs:
-            for item in opencage_collection.filter(place__slug=place.slug):
-                place_data = get_opencage_pincode_and_coordiante(item.json_data)
-                pincode = place_data.get("pincode")
-                latitude = latitude or place_data.get("latitude")
-                longitude = longitude or place_data.get("longitude")
-                if pincode:
-                    pincodes.append(pincode)
+# One rebuild follows a burst of jobs (e.g. update_places of every state):
+# it is queued this long after the first job asks for it, and later jobs
+# asking while it is pending are folded into it.
+TRIES_REBUILD_DELAY = 60 * 15
+TRIES_REBUILD_PENDING_KEY = "location_trie:rebuild_pending"
 
-        if place.slug in post_office_place_slugs:
-            for item in post_office_collection.filter(place__slug=place.slug):
-                pincode = item.pincode
-                latitude = latitude or item.latitude
-                longitude = longitude or item.longitude
-                if pincode:
-                    pincodes.append(pincode)
 
-        pincodes = set(pincodes)
+def schedule_location_tries_rebuild():
+    from django.core.cache import cache
 
-        if pincodes:
-            PlacePincode.objects.filter(place=place).delete()
-            PlacePincode.objects.bulk_create([
-                PlacePincode(place=place, pincode=p) for p in pincodes
-            ])
+    if cache.add(TRIES_REBUILD_PENDING_KEY, 1, timeout=TRIES_REBUILD_DELAY * 4):
+        rebuild_location_tries.apply_async(countdown=TRIES_REBUILD_DELAY)
 
-        if latitude and longitude:
-            PlaceCoordinate.objects.filter(place=place).delete()
-            PlaceCoordinate.objects.create(
-                place=place, latitude=latitude, longitude=longitude
-            )
 
-        place.pincodes.set(PlacePincode.objects.filter(place=place))
-        place.coordinates.set(PlaceCoordinate.objects.filter(place=place))
+@shared_task(queue="worker5_queue")
+def rebuild_location_tries():
+    from django.core.cache import cache
+    from django.core.management import call_command
 
-    logger.info(f"Completed")
+    # Jobs finishing from here on need a rebuild of their own
+    cache.delete(TRIES_REBUILD_PENDING_KEY)
+    call_command("build_location_tries")
@@ -1,3 +1,221 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import fakeredis
+from django.test import TestCase, override_settings
+
+from utility.geocoding import GeocodeCache
+from utility.quota import ApiQuota
+
+from .crawler import GridCrawler, crawl_country
+from .models import (
+    IndiaLocationDataOld, PincodeAndCoordinate, UaeCoordinates, UaeLocationData,
+    UniqueDistrict, UniquePlace, UniqueState,
+)
+from .utils.pincode import generate_place_targets
+
+# 3 x 3 cells of the 0.01° UAE grid
+TOP_LEFT = (25.02, 55.0)
+BOTTOM_RIGHT = (25.0, 55.02)
+
+
+class StubOpenCage(BaseHTTPRequestHandler):
+    """
+    Answers like the OpenCage API: every point is in the UAE except those
+    in `outside`, and a point in `failures` gets that many 500 responses first.
+    """
+
+    queries = []
+    failures = {}
+    outside = set()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)["q"][0]
+
+        with self.lock:
+            self.queries.append(query)
+            failing = self.failures.get(query, 0) > 0
+            if failing:
+                self.failures[query] -= 1
+
+        if failing:
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        latitude, longitude = map(float, query.split(","))
+        country = "Oman" if query in self.outside else "United Arab Emirates"
+        body = json.dumps({"results": [{
+            "formatted": f"Cell {query}, Dubai, {country}",
+            "components": {"country": country, "state": "Dubai"},
+            "geometry": {"lat": latitude, "lng": longitude},
+        }]}).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(GEOCODING_RESPONSE_STORAGE="compressed")
+class CrawlCountryTests(TestCase):
+    def setUp(self):
+        StubOpenCage.queries = []
+        StubOpenCage.failures = {}
+        StubOpenCage.outside = set()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenCage)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.patch("utility.geocoding._geocode_cache", GeocodeCache(cache_dir.name, 3600, 10 ** 8))
+        self.patch("locations.crawler.ERROR_BACKOFF", 0.01)
+
+        self.set_budget(1000)
+        self.flushes = []
+        original_flush = GridCrawler.flush
+
+        def flush(crawler, tested, records):
+            self.flushes.append(len(tested))
+            original_flush(crawler, tested, records)
+
+        self.patch("locations.crawler.GridCrawler.flush", flush)
+
+    def patch(self, target, new):
+        patcher = mock.patch(target, new)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def set_budget(self, daily):
+        quota = ApiQuota(fakeredis.FakeRedis(), {"TEST_KEY": {"daily": daily, "per_second": 1000}}, prefix="test_quota")
+        self.patch("locations.crawler.get_opencage_limiter", lambda key_name: ("test-key", quota.limiter(key_name)))
+
+    def crawl(self, **options):
+        crawl_country(
+            "uae", TOP_LEFT, BOTTOM_RIGHT, "TEST_KEY",
+            base_url=f"http://127.0.0.1:{self.server.server_port}/geocode/v1/json", workers=2, batch_size=2, **options
+        )
+
+    def test_crawls_every_cell_into_batches(self):
+        StubOpenCage.outside = {"25.0,55.0"}
+
+        self.crawl()
+
+        self.assertEqual(len(StubOpenCage.queries), 9)
+        self.assertEqual(UaeCoordinates.objects.count(), 9)
+        # The point outside the UAE is tested but not stored
+        self.assertEqual(UaeLocationData.objects.count(), 8)
+        self.assertGreater(len(self.flushes), 1)
+        self.assertEqual(sum(self.flushes), 9)
+
+        record = UaeLocationData.objects.get(requested_latitude=25.02, requested_longitude=55.0)
+        self.assertEqual(record.address, "Cell 25.02,55.0, Dubai, United Arab Emirates")
+        self.assertEqual(record.response["results"][0]["components"]["state"], "Dubai")
+
+    def test_skips_cells_already_tested(self):
+        UaeCoordinates.objects.create(latitude=25.02, longitude=55.0)
+        UaeCoordinates.objects.create(latitude=25.01, longitude=55.01)
+
+        self.crawl()
+
+        self.assertEqual(len(StubOpenCage.queries), 7)
+        self.assertNotIn("25.02,55.0", StubOpenCage.queries)
+        self.assertNotIn("25.01,55.01", StubOpenCage.queries)
+        self.assertEqual(UaeCoordinates.objects.count(), 9)
+
+    def test_retries_failed_requests(self):
+        StubOpenCage.failures = {"25.01,55.01": 2, "25.0,55.02": 5}
+
+        self.crawl(max_retries=3)
+
+        # Recovered on the third attempt
+        self.assertEqual(StubOpenCage.queries.count("25.01,55.01"), 3)
+        self.assertTrue(UaeLocationData.objects.filter(requested_latitude=25.01, requested_longitude=55.01).exists())
+
+        # Given up after max_retries, and left untested for the next run
+        self.assertEqual(StubOpenCage.queries.count("25.0,55.02"), 3)
+        self.assertFalse(UaeCoordinates.objects.filter(latitude=25.0, longitude=55.02).exists())
+        self.assertEqual(UaeCoordinates.objects.count(), 8)
+
+    def test_stops_when_the_quota_is_exhausted(self):
+        self.set_budget(4)
+
+        self.crawl()
+
+        self.assertEqual(len(StubOpenCage.queries), 4)
+        self.assertEqual(UaeCoordinates.objects.count(), 4)
+        self.assertEqual(UaeLocationData.objects.count(), 4)
+
+        # The next run carries on from the cells still untested
+        self.set_budget(1000)
+        StubOpenCage.queries = []
+
+        self.crawl()
+
+        self.assertEqual(len(StubOpenCage.queries), 5)
+        self.assertEqual(UaeCoordinates.objects.count(), 9)
+
+
+def opencage_response(postcode, latitude, longitude):
+    return {"results": [{"components": {"postcode": postcode}, "geometry": {"lat": latitude, "lng": longitude}}]}
+
+
+class GeneratePlaceTargetsTests(TestCase):
+    def setUp(self):
+        state = UniqueState.objects.create(name="Kerala")
+        district = UniqueDistrict.objects.create(name="Ernakulam", state=state)
+        self.places = [
+            UniquePlace.objects.create(name=name, district=district, state=state)
+            for name in ["Aluva", "Kakkanad", "Kochi", "Perumbavoor"]
+        ]
+
+    def add_opencage(self, place, postcode, latitude=None, longitude=None):
+        IndiaLocationDataOld.objects.create(
+            address=place.name, place=place, json_data=opencage_response(postcode, latitude, longitude)
+        )
+
+    def add_post_office(self, place, pincode, latitude=None, longitude=None):
+        PincodeAndCoordinate.objects.create(
+            place=place, post_office_id=f"{place.name}-{pincode}", pincode=pincode, latitude=latitude, longitude=longitude
+        )
+
+    def test_merges_both_sources_in_place_order(self):
+        aluva, kakkanad, kochi, perumbavoor = self.places
+
+        # Only OpenCage, with a spaced postcode
+        self.add_opencage(aluva, "683 101", 10.1, 76.35)
+        # Both sources: pincodes united, the OpenCage coordinate first
+        self.add_post_office(kochi, 682001, 9.96, 76.28)
+        self.add_post_office(kochi, 682011)
+        self.add_opencage(kochi, "682001", 9.93, 76.26)
+        # Only post offices, without coordinates
+        self.add_post_office(perumbavoor, 683542)
+        # Nothing usable from OpenCage, a coordinate from the post office
+        self.add_opencage(kakkanad, None)
+        self.add_post_office(kakkanad, 682030, 10.01, 76.34)
+
+        targets = list(generate_place_targets())
+
+        self.assertEqual(targets, [
+            (aluva.pk, {683101}, (10.1, 76.35)),
+            (kakkanad.pk, {682030}, (10.01, 76.34)),
+            (kochi.pk, {682001, 682011}, (9.93, 76.26)),
+            (perumbavoor.pk, {683542}, None),
+        ])
+
+    def test_places_without_data_are_left_out(self):
+        self.add_post_office(self.places[2], 682001)
+
+        self.assertEqual([place_id for place_id, _, _ in generate_place_targets()], [self.places[2].pk])
@@ -1,3 +1,12 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+
 class SuffixTrieNode:
     def __init__(self):
         self.children = {}
@@ -30,3 +39,237 @@ class SuffixTrie:
                 break
 
         return longest_match  # longest valid slug suffix
+
+    def suffix_matches(self, input_slug):
+        """All (slug, value) pairs whose slug is a suffix of input_slug."""
+        node = self.root
+        matches = []
+
+        for char in input_slug[::-1]:
+            if char not in node.children:
+                break
+            node = node.children[char]
+            if node.slug_end:
+                matches.append((node.slug_end, 0))
+
+        return matches
+
+
+class CompactSuffixTrie:
+    """
+    Read-only, array-backed version of SuffixTrie.
+
+    Nodes are numbered breadth first so that the outgoing edges of a node are
+    contiguous and sorted by label. The whole structure is four flat arrays
+    which are written to a single file and memory-mapped at load time, so
+    every worker process shares the same pages of the OS page cache.
+
+    Keys are stored as reversed UTF-8 bytes. A slug is a suffix of an input
+    slug exactly when its bytes are a suffix of the input's bytes, so matching
+    on bytes keeps the semantics of SuffixTrie.match_suffix.
+    """
+
+    MAGIC = b"SFXTRIE1"
+    HEADER = struct.Struct("<8sB3xII")
+    NO_VALUE = -1
+
+    def __init__(self, first_edge, edge_labels, edge_targets, node_values, buffer=None):
+        self.first_edge = first_edge
+        self.edge_labels = edge_labels
+        self.edge_targets = edge_targets
+        self.node_values = node_values
+        self._buffer = buffer
+
+    def __len__(self):
+        return len(self.node_values)
+
+    @classmethod
+    def build(cls, items):
+        """
+        Build from an iterable of slugs or (slug, value) pairs. The value is a
+        non-negative integer stored on the terminal node (usually the row's
+        primary key). When a slug is repeated the last value wins, like
+        SuffixTrie.insert.
+        """
+        entries = {}
+        for item in items:
+            slug, value = (item, 0) if isinstance(item, str) else item
+            if slug:
+                entries[slug.encode("utf-8")[::-1]] = int(value)
+
+        keys = sorted(entries.items())
+
+        first_edge = array("I")
+        edge_labels = array("B")
+        edge_targets = array("I")
+        node_values = array("i")
+
+        next_id = 1
+        queue = deque([(0, len(keys), 0)])
+
+        while queue:
+            lo, hi, depth = queue.popleft()
+
+            value = cls.NO_VALUE
+            if lo < hi and len(keys[lo][0]) == depth:
+                value = keys[lo][1]
+                lo += 1
+
+            node_values.append(value)
+            first_edge.append(len(edge_labels))
+
+            i = lo
+            while i < hi:
+                label = keys[i][0][depth]
+                j = i + 1
+                while j < hi and keys[j][0][depth] == label:
+                    j += 1
+
+                edge_labels.append(label)
+                edge_targets.append(next_id)
+                next_id += 1
+                queue.append((i, j, depth + 1))
+                i = j
+
+        first_edge.append(len(edge_labels))
+
+        return cls(first_edge, edge_labels, edge_targets, node_values)
+
+    def save(self, path):
+        """Write atomically so that workers mapping the old file are unaffected."""
+        tmp_path = f"{path}.tmp"
+        sections = [self.first_edge, self.edge_labels, self.edge_targets, self.node_values]
+
+        with open(tmp_path, "wb") as f:
+            f.write(self.HEADER.pack(
+                self.MAGIC, sys.byteorder == "little", len(self.node_values), len(self.edge_labels)
+            ))
+            for section in sections:
+                data = bytes(memoryview(section).cast("B"))
+                f.write(data)
+                f.write(b"\0" * (-len(data) % 8))
+
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, little_endian, node_count, edge_count = cls.HEADER.unpack_from(buffer, 0)
+        if magic != cls.MAGIC:
+            raise ValueError(f"{path} is not a compact suffix trie file")
+        if bool(little_endian) != (sys.byteorder == "little"):
+            raise ValueError(f"{path} was built on a host with a different byte order")
+
+        view = memoryview(buffer)
+        offset = cls.HEADER.size
+
+        def take(count, itemsize, fmt):
+            nonlocal offset
+            size = count * itemsize
+            section = view[offset:offset + size].cast(fmt)
+            offset += size + (-size % 8)
+            return section
+
+        first_edge = take(node_count + 1, 4, "I")
+        edge_labels = take(edge_count, 1, "B")
+        edge_targets = take(edge_count, 4, "I")
+        node_values = take(node_count, 4, "i")
+
+        return cls(first_edge, edge_labels, edge_targets, node_values, buffer=buffer)
+
+    def _walk(self, input_slug, collect=None):
+        data = input_slug.encode("utf-8")
+        node = 0
+        match_depth = 0
+        match_node = None
+
+        for depth, label in enumerate(reversed(data), start=1):
+            lo = self.first_edge[node]
+            hi = self.first_edge[node + 1]
+            index = bisect_left(self.edge_labels, label, lo, hi)
+            if index == hi or self.edge_labels[index] != label:
+                break
+
+            node = self.edge_targets[index]
+            if self.node_values[node] != self.NO_VALUE:
+                match_depth = depth
+                match_node = node
+                if collect is not None:
+                    collect.append((data[len(data) - depth:].decode("utf-8"), self.node_values[node]))
+
+        if match_node is None:
+            return None, None
+
+        return data[len(data) - match_depth:].decode("utf-8"), match_node
+
+    def match_suffix(self, input_slug):
+        slug, _ = self._walk(input_slug)
+        return slug
+
+    def match(self, input_slug):
+        """Return (slug, value) of the longest matching suffix, or (None, None)."""
+        slug, node = self._walk(input_slug)
+        if slug is None:
+            return None, None
+        return slug, self.node_values[node]
+
+    def suffix_matches(self, input_slug):
+        """All (slug, value) pairs whose slug is a suffix of input_slug."""
+        matches = []
+        self._walk(input_slug, collect=matches)
+        return matches
+
+
+class OverlayTrie:
+    """
+    Applies incremental inserts and deletes on top of an immutable base trie
+    (CompactSuffixTrie or SuffixTrie) while keeping longest-suffix semantics.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.added = {}
+        self.deleted = set()
+
+    def copy(self):
+        overlay = OverlayTrie(self.base)
+        overlay.added = dict(self.added)
+        overlay.deleted = set(self.deleted)
+        return overlay
+
+    def insert(self, slug, value=0):
+        if not slug:
+            return
+        self.deleted.discard(slug)
+        self.added[slug] = value
+
+    def delete(self, slug):
+        if not slug:
+            return
+        self.added.pop(slug, None)
+        self.deleted.add(slug)
+
+    def match(self, input_slug):
+        if not self.added and not self.deleted:
+            if isinstance(self.base, CompactSuffixTrie):
+                return self.base.match(input_slug)
+            slug = self.base.match_suffix(input_slug)
+            return (slug, 0) if slug else (None, None)
+
+        base_matches = dict(self.base.suffix_matches(input_slug))
+
+        # Longest candidate first
+        for start in range(len(input_slug)):
+            candidate = input_slug[start:]
+            if candidate in self.added:
+                return candidate, self.added[candidate]
+            if candidate in base_matches and candidate not in self.deleted:
+                return candidate, base_matches[candidate]
+
+        return None, None
+
+    def match_suffix(self, input_slug):
+        slug, _ = self.match(input_slug)
+        return slug
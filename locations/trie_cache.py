@@ -1,30 +1,340 @@
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
 from .models import UniquePlace, UniqueDistrict, UniqueState
-from .trie import SuffixTrie
+from .trie import SuffixTrie, CompactSuffixTrie, OverlayTrie
+from .resolver import LocationResolver
+
+logger = logging.getLogger(__name__)
+
+TRIE_FILES = {
+    "state": "state_trie.bin",
+    "district": "district_trie.bin",
+    "place": "place_trie.bin",
+}
+
+RESOLVER_FILES = ("resolver_trie.bin", "resolver_payloads.bin")
+
+TRIE_MODELS = {
+    "state": UniqueState,
+    "district": UniqueDistrict,
+    "place": UniquePlace,
+}
+
+# Shared (cache backed) version counter and operation log
+TRIE_VERSION_KEY = "location_trie:version"
+TRIE_BASE_VERSION_KEY = "location_trie:base_version"
+TRIE_OP_KEY = "location_trie:op:{}"
+TRIE_OP_TIMEOUT = 60 * 60 * 24 * 7
+
+# How often (seconds) a worker looks at the shared version key
+TRIE_CHECK_INTERVAL = getattr(settings, "LOCATION_TRIE_CHECK_INTERVAL", 1.0)
+
+# How long a gap in the operation log is waited for before the structures are reloaded
+TRIE_MISSING_OP_GRACE = 30.0
+
+# Operations read from the cache per get_many
+TRIE_OP_CHUNK_SIZE = 500
+
+# A worker further behind than this reloads the structures instead of replaying the log
+TRIE_MAX_CATCH_UP = 2000
+
+# Operations since the last build_location_tries after which a new build is queued,
+# which also bounds the overlays every worker keeps on top of the prebuilt files
+TRIE_REBUILD_AFTER_OPS = 20000
+
+_tries = {}
+_version = 0
+_base_version = None
+_last_check = 0.0
+_missing_since = None
+_lock = threading.Lock()
+
+
+def get_trie_path(location_type):
+    return os.path.join(settings.LOCATION_TRIE_DIR, TRIE_FILES[location_type])
+
+
+def load_prebuilt_trie(location_type):
+    """
+    Memory-map the trie written by `manage.py build_location_tries`.
+    Returns None when the file has not been built yet.
+    """
+    path = get_trie_path(location_type)
+    if not os.path.exists(path):
+        return None
+
+    return CompactSuffixTrie.load(path)
+
+
+def build_trie_from_db(model):
+    trie = SuffixTrie()
+    for slug in model.objects.values_list("slug", flat=True).iterator():
+        if slug:
+            trie.insert(slug)
+    return trie
+
+
+def _read_versions():
+    values = cache.get_many([TRIE_VERSION_KEY, TRIE_BASE_VERSION_KEY])
+    return int(values.get(TRIE_VERSION_KEY) or 0), int(values.get(TRIE_BASE_VERSION_KEY) or 0)
+
+
+def get_resolver_paths():
+    return tuple(os.path.join(settings.LOCATION_TRIE_DIR, name) for name in RESOLVER_FILES)
+
+
+def load_prebuilt_resolver():
+    paths = get_resolver_paths()
+    if not all(os.path.exists(path) for path in paths):
+        return None
+
+    return LocationResolver.load(*paths)
+
+
+def build_resolver_from_db():
+    def entries():
+        for location_type, model in TRIE_MODELS.items():
+            for pk, slug in model.objects.values_list("id", "slug").iterator():
+                yield location_type, slug, pk, None
+
+    return LocationResolver.build(entries())
+
+
+def _load_base(key, current):
+    """
+    Returns (structure, prebuilt). Prebuilt structures reflect the shared base
+    version; database fallbacks reflect the version read before loading.
+    """
+    if key == "resolver":
+        resolver = load_prebuilt_resolver()
+        if resolver is not None:
+            return resolver, True
+        if key in current:
+            return current[key].copy(), False
+        # Only the very first load of a worker falls back to the database
+        return build_resolver_from_db(), False
+
+    base = load_prebuilt_trie(key)
+    if base is not None:
+        return OverlayTrie(base), True
+    if key in current:
+        return current[key].copy(), False
+    return OverlayTrie(build_trie_from_db(TRIE_MODELS[key])), False
+
+
+class MissingOperation(Exception):
+    """A logged operation is gone (expired or evicted), so the log can't be replayed past it."""
+
+
+def _load_from_db(key):
+    if key == "resolver":
+        return build_resolver_from_db()
+    return OverlayTrie(build_trie_from_db(TRIE_MODELS[key]))
+
+
+def _read_operations(start, end):
+    """(version, operation or None) of versions start+1 .. end, read TRIE_OP_CHUNK_SIZE at a time."""
+    for chunk_start in range(start + 1, end + 1, TRIE_OP_CHUNK_SIZE):
+        versions = range(chunk_start, min(chunk_start + TRIE_OP_CHUNK_SIZE, end + 1))
+        operations = cache.get_many([TRIE_OP_KEY.format(version) for version in versions])
+
+        for version in versions:
+            yield version, operations.get(TRIE_OP_KEY.format(version))
+
+
+def _apply_operations(tries, start, end):
+    """
+    Apply logged operations start+1 .. end. Returns the last version that
+    could be applied (a gap means the writer has not stored that op yet).
+    Raises MissingOperation when a gap outlasts TRIE_MISSING_OP_GRACE.
+    """
+    global _missing_since
+
+    if end <= start:
+        return start
+
+    applied = start
+    for version, operation in _read_operations(start, end):
+        if operation is None:
+            now = time.monotonic()
+            if _missing_since is None:
+                _missing_since = now
+            if now - _missing_since < TRIE_MISSING_OP_GRACE:
+                break
+            _missing_since = None
+            raise MissingOperation(f"Location trie operation {version} is missing")
+
+        _missing_since = None
+        location_type, action, slug, value = operation
+
+        trie = tries.get(location_type)
+        resolver = tries.get("resolver")
+
+        if action == "insert":
+            if trie is not None:
+                trie.insert(slug, value)
+            if resolver is not None:
+                resolver.insert(location_type, slug, value)
+        elif action == "delete":
+            if trie is not None:
+                trie.delete(slug)
+            if resolver is not None:
+                resolver.delete(location_type, slug)
+        elif action == "refresh":
+            if resolver is not None:
+                resolver.refresh(location_type, slug, value)
+
+        applied = version
+
+    if applied == end:
+        _missing_since = None
+
+    return applied
+
+
+def _resync(keys, version, base_version):
+    """
+    Structures `keys` at `version` when the log can't bring the loaded ones
+    there: the prebuilt files replayed from their base version when that is
+    close enough and the log still holds it, the database otherwise.
+    Returns (tries, applied version).
+    """
+    tries = {}
+    prebuilt_keys = []
+    for key in keys:
+        tries[key], prebuilt = _load_base(key, {})
+        if prebuilt:
+            prebuilt_keys.append(key)
+
+    if not prebuilt_keys:
+        return tries, version
+
+    if version - base_version <= TRIE_MAX_CATCH_UP:
+        try:
+            return tries, _apply_operations(tries, base_version, version)
+        except MissingOperation as e:
+            logger.warning(f"{e}, loading the location tries from the database.")
+    else:
+        logger.warning(f"Location tries are {version - base_version} operations past their files, loading them from the database.")
+
+    for key in prebuilt_keys:
+        tries[key] = _load_from_db(key)
+    return tries, version
+
+
+def refresh_tries(key, force=False):
+    """
+    Cheap, throttled check of the shared version key. When another process has
+    published changes, the new operations are applied to copies of the loaded
+    structures which are then swapped in, so readers never see a partial
+    update and the request path never rebuilds a trie from the database.
+
+    `key` is a location type or "resolver"; structures load on first use.
+    """
+    global _tries, _version, _base_version, _last_check
+
+    now = time.monotonic()
+    if key in _tries and not force and now - _last_check < TRIE_CHECK_INTERVAL:
+        return _tries[key]
+
+    with _lock:
+        if key in _tries and not force and now - _last_check < TRIE_CHECK_INTERVAL:
+            return _tries[key]
+        _last_check = now
+
+        try:
+            version, base_version = _read_versions()
+        except Exception as e:
+            logger.warning(f"Could not read location trie version: {e}")
+            if key not in _tries:
+                _tries = {**_tries, key: _load_base(key, _tries)[0]}
+            return _tries[key]
+
+        if key in _tries and version == _version and base_version == _base_version:
+            return _tries[key]
+
+        rebase = _base_version is not None and base_version != _base_version
+        loading = set(_tries) | {key} if rebase else {key} - set(_tries)
+
+        tries = {loaded: structure.copy() for loaded, structure in _tries.items()}
+        start = _version if _tries else version
+
+        # Replaying the log in order is idempotent, so starting from the
+        # oldest state any structure may reflect is always safe.
+        for loading_key in loading:
+            tries[loading_key], prebuilt = _load_base(loading_key, _tries)
+            if prebuilt:
+                start = min(start, base_version)
+
+        try:
+            if version - start > TRIE_MAX_CATCH_UP:
+                logger.warning(f"Location tries are {version - start} operations behind, reloading them.")
+                tries, applied = _resync(set(tries), version, base_version)
+            else:
+                applied = _apply_operations(tries, start, version)
+        except MissingOperation as e:
+            logger.warning(f"{e}, reloading the location tries.")
+            tries, applied = _resync(set(tries), version, base_version)
+        except Exception as e:
+            logger.warning(f"Could not apply location trie operations: {e}")
+            applied = start
+
+        _tries = tries
+        _version = applied
+        _base_version = base_version
+
+    return _tries[key]
+
+
+def publish_trie_change(location_type, action, slug, value=0):
+    """
+    Append an insert/delete (or a refresh of an edited location's resolver
+    payload) to the shared operation log and bump the version key. Called
+    after the surrounding transaction commits.
+    """
+    if not slug:
+        return
+
+    def publish():
+        try:
+            cache.add(TRIE_VERSION_KEY, 0, timeout=None)
+            version = cache.incr(TRIE_VERSION_KEY)
+            cache.set(TRIE_OP_KEY.format(version), (location_type, action, slug, value), timeout=TRIE_OP_TIMEOUT)
+
+            if version - int(cache.get(TRIE_BASE_VERSION_KEY) or 0) > TRIE_REBUILD_AFTER_OPS:
+                from .tasks import schedule_location_tries_rebuild
+
+                schedule_location_tries_rebuild()
+        except Exception as e:
+            logger.warning(f"Could not publish location trie change for {slug}: {e}")
+
+    transaction.on_commit(publish)
+
+
+def mark_tries_rebuilt(version):
+    """Record that the prebuilt trie files contain every change up to `version`."""
+    cache.set(TRIE_BASE_VERSION_KEY, version, timeout=None)
+
+
+def get_trie_version():
+    return _read_versions()[0]
 
-_place_trie = None
-_district_trie = None
-_state_trie = None
 
 def get_place_trie():
-    global _place_trie
-    if _place_trie is None:
-        _place_trie = SuffixTrie()
-        for p in UniquePlace.objects.all():
-            _place_trie.insert(p.slug)
-    return _place_trie
+    return refresh_tries("place")
 
 def get_district_trie():
-    global _district_trie
-    if _district_trie is None:
-        _district_trie = SuffixTrie()
-        for d in UniqueDistrict.objects.all():
-            _district_trie.insert(d.slug)
-    return _district_trie
+    return refresh_tries("district")
 
 def get_state_trie():
-    global _state_trie
-    if _state_trie is None:
-        _state_trie = SuffixTrie()
-        for s in UniqueState.objects.all():
-            _state_trie.insert(s.slug)
-    return _state_trie
+    return refresh_tries("state")
+
+def get_location_resolver():
+    return refresh_tries("resolver")
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q, TextField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from utility.geocoding import decompress_response
+
+from ..models import IndianLocation, IndiaLocationData, SuburbLocationData
+from .post_office import can_fork
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEY = "normalization_checkpoint:{}"
+
+STORED_RESPONSE = Q(json_data__isnull=False) | Q(raw_response__isnull=False)
+
+# Rows handed to a pool process at a time
+PARSE_CHUNK_SIZE = 250
+
+INDIAN_LOCATION_FIELDS = [
+    "country", "country_code", "state", "state_code", "district", "county",
+    "city", "town", "village", "suburb", "city_district", "postcode",
+    "place_type", "latitude", "longitude",
+    "iso_codes", "formatted", "confidence", "json_hash",
+    # auto_now is only applied to inserted rows unless it is upserted too
+    "updated",
+]
+
+
+def canonical_hash(data):
+    """SHA-256 of the canonical JSON of `data`, the same for any key order or spacing."""
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def _parse_row(parse, row):
+    """Runs in a pool process. (pk, hash, parsed) of a changed row, or None when its hash is unchanged."""
+    pk, raw, compressed, stored_hash, *extra = row
+
+    if raw is not None:
+        data = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+    else:
+        data = decompress_response(compressed)
+    json_hash = canonical_hash(data)
+    if json_hash == stored_hash:
+        return None
+
+    return pk, json_hash, parse(data, *extra) if data else None
+
+
+class NormalizationPipeline:
+    """
+    Parses the JSON responses stored in `queryset` into structured rows.
+
+    Rows are read in primary key order, a batch at a time, with the JSON
+    fetched as text (or compressed, see GeocodedResponse) so that decoding
+    happens in the pool processes that run `parse`. Rows whose canonical JSON hash matches the stored
+    `json_hash` are skipped. `apply` writes a batch of (pk, hash, parsed)
+    results; the last primary key written is kept in the cache as a
+    checkpoint, so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, name, queryset, parse, apply, fields=(), batch_size=5000, workers=None):
+        self.name = name
+        self.queryset = queryset
+        self.parse = parse
+        self.apply = apply
+        self.fields = fields
+        self.batch_size = batch_size
+        self.workers = workers
+
+    @property
+    def checkpoint_key(self):
+        return CHECKPOINT_KEY.format(self.name)
+
+    def batches(self, after):
+        queryset = self.queryset.annotate(raw_json=Cast("json_data", TextField())).order_by("pk")
+
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=after).values_list("pk", "raw_json", "raw_response", "json_hash", *self.fields)[:self.batch_size]
+            )
+            if not batch:
+                return
+
+            yield batch
+            after = batch[-1][0]
+
+    def run(self, resume=True):
+        after = cache.get(self.checkpoint_key, 0) if resume else 0
+        if after:
+            logger.info(f"Resuming {self.name} after id {after}")
+
+        parse_row = partial(_parse_row, self.parse)
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers != 1 and can_fork() else None
+
+        processed = 0
+        changed = 0
+        try:
+            for batch in self.batches(after):
+                if executor:
+                    results = executor.map(parse_row, batch, chunksize=PARSE_CHUNK_SIZE)
+                else:
+                    results = map(parse_row, batch)
+                results = [result for result in results if result is not None]
+
+                with transaction.atomic():
+                    self.apply(results)
+
+                cache.set(self.checkpoint_key, batch[-1][0], timeout=None)
+
+                processed += len(batch)
+                changed += len(results)
+                logger.info(f"{self.name}: {processed} records processed, {changed} changed")
+        finally:
+            if executor:
+                executor.shutdown()
+
+        cache.delete(self.checkpoint_key)
+        return processed, changed
+
+
+def parse_india_location(data):
+    results = data.get("results") or []
+    if not results:
+        return None
+
+    components = results[0].get("components", {})
+    geometry = results[0].get("geometry", {})
+
+    return {
+        "country": components.get("country"),
+        "country_code": components.get("country_code"),
+        "state": components.get("state"),
+        "state_code": components.get("state_code"),
+        "district": components.get("state_district"),
+        "county": components.get("county"),
+        "city": components.get("city"),
+        "town": components.get("town"),
+        "village": components.get("village"),
+        "suburb": components.get("suburb"),
+        "city_district": components.get("city_district"),
+        "postcode": components.get("postcode"),
+        "place_type": components.get("_type"),
+        "latitude": geometry.get("lat"),
+        "longitude": geometry.get("lng"),
+        "iso_codes": {
+            "alpha2": components.get("ISO_3166-1_alpha-2"),
+            "alpha3": components.get("ISO_3166-1_alpha-3"),
+            "iso_2": components.get("ISO_3166-2"),
+        },
+        "formatted": results[0].get("formatted"),
+        "confidence": results[0].get("confidence"),
+    }
+
+
+def apply_india_locations(results):
+    locations = [
+        IndianLocation(source_id=pk, json_hash=json_hash, **parsed)
+        for pk, json_hash, parsed in results if parsed
+    ]
+
+    # MySQL upserts on any unique key and takes no conflict target
+    unique_fields = ["source"] if connection.features.supports_update_conflicts_with_target else None
+    IndianLocation.objects.bulk_create(
+        locations, batch_size=1000,
+        update_conflicts=True, update_fields=INDIAN_LOCATION_FIELDS, unique_fields=unique_fields
+    )
+
+    IndiaLocationData.objects.bulk_update(
+        [IndiaLocationData(pk=pk, json_hash=json_hash) for pk, json_hash, _ in results], ["json_hash"], batch_size=1000
+    )
+
+
+def parse_suburb_districts(data, requested_place):
+    """(requested place, districts the results give for that suburb)."""
+    requested = requested_place.strip().lower()
+
+    districts = set()
+    for result in data.get("results") or []:
+        components = result.get("components", {})
+        suburb = components.get("suburb")
+        state_district = components.get("state_district")
+
+        if suburb and state_district and suburb.strip().lower() == requested:
+            districts.add(state_district)
+
+    return requested_place, sorted(districts)
+
+
+def apply_suburb_districts(results):
+    suburbs_by_district = defaultdict(list)
+    for _, _, parsed in results:
+        if not parsed:
+            continue
+
+        suburb, districts = parsed
+        if len(districts) == 1:
+            suburbs_by_district[districts[0]].append(suburb)
+        else:
+            logger.info(f"Skipped '{suburb}' (found {len(districts)} districts: {districts})")
+
+    for district, suburbs in suburbs_by_district.items():
+        # update() skips auto_now
+        updated = IndianLocation.objects.filter(suburb__in=suburbs).update(district=district, updated=timezone.now())
+        logger.info(f"Updated {updated} rows of {len(suburbs)} suburbs to district '{district}'")
+
+    SuburbLocationData.objects.bulk_update(
+        [SuburbLocationData(pk=pk, json_hash=json_hash) for pk, json_hash, _ in results], ["json_hash"], batch_size=1000
+    )
+
+
+def populate_indian_locations(batch_size=5000, workers=None, resume=True):
+    """Parse every IndiaLocationData response into its IndianLocation row."""
+    return NormalizationPipeline(
+        "indian_locations",
+        IndiaLocationData.objects.filter(STORED_RESPONSE),
+        parse_india_location,
+        apply_india_locations,
+        batch_size=batch_size,
+        workers=workers,
+    ).run(resume=resume)
+
+
+def update_suburb_districts(batch_size=1000, workers=None, resume=True):
+    """Fill the district of IndianLocations from the suburb lookups that name a single one."""
+    return NormalizationPipeline(
+        "suburb_districts",
+        SuburbLocationData.objects.filter(STORED_RESPONSE),
+        parse_suburb_districts,
+        apply_suburb_districts,
+        fields=("requested_place",),
+        batch_size=batch_size,
+        workers=workers,
+    ).run(resume=resume)
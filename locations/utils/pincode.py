@@ -1,4 +1,16 @@
-from ..models import IndiaLocationData, PincodeAndCoordinate, UniquePlace
+import heapq
+import logging
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+
+from ..models import IndiaLocationDataOld, PincodeAndCoordinate, UniquePlace, PlacePincode, PlaceCoordinate
+
+logger = logging.getLogger(__name__)
+
+# Places consolidated per transaction
+CONSOLIDATION_CHUNK_SIZE = 1000
 
 def get_opencage_pincode_and_coordiante(json_item):
     results = json_item.get("results")
@@ -20,67 +32,177 @@ def get_opencage_pincode_and_coordiante(json_item):
     }
 
 
-def update_pincodes():
-    import logging
-    from ..models import PlacePincode, PlaceCoordinate
+def _as_pincode(pincode):
+    # PlacePincode.pincode is a PositiveIntegerField
+    pincode = str(pincode).replace(" ", "") if pincode is not None else ""
+    return int(pincode) if pincode.isdigit() else None
+
+
+def _group_by_place(rows, source):
+    """(place_id, source, rows) for each place of (place_id, ...) rows sorted by place id."""
+    for place_id, group in groupby(rows, key=itemgetter(0)):
+        yield place_id, source, [row[1:] for row in group]
 
-    logger = logging.getLogger(__name__)
 
-    opencage_collection = IndiaLocationData.objects.all()
-    post_office_collection = PincodeAndCoordinate.objects.all()
+def _stream_by_place(queryset, source, *fields):
+    """(place_id, source, rows) for each place of a queryset, read once in place id order."""
+    rows = queryset.order_by("place_id", *queryset.model._meta.ordering, "id").values_list(
+        "place_id", *fields
+    ).iterator(chunk_size=2000)
 
-    opencage_place_slugs = set(opencage_collection.values_list("place__slug", flat=True))
-    post_office_place_slugs = set(post_office_collection.values_list("place__slug", flat=True))
+    return _group_by_place(rows, source)
 
-    updating_place_slugs = opencage_place_slugs | post_office_place_slugs
-    modifying_places = UniquePlace.objects.filter(slug__in=updating_place_slugs)
 
-    places_length = len(modifying_places)
-    progress = 0
+def _opencage_place_rows():
+    """(place_id, pincode, latitude, longitude) of the OpenCage response stored for each place, in place id order."""
+    for place_id, json_data in IndiaLocationDataOld.objects.order_by("place_id").values_list(
+        "place_id", "json_data"
+    ).iterator(chunk_size=2000):
+        item = get_opencage_pincode_and_coordiante(json_data or {})
+        yield place_id, item["pincode"], item["latitude"], item["longitude"]
 
-    for index, place in enumerate(modifying_places):
-        current_progress = int((index + 1) * 100 / places_length)
 
-        if current_progress > progress:
-            progress = current_progress
-            logger.info(f"{current_progress}% Completed")
+def generate_place_targets():
+    """
+    (place_id, pincodes, coordinate) for every place of the OpenCage and
+    post office sources. Both are streamed in place id order and merged,
+    the OpenCage rows of a place first: pincodes are the union of both
+    sources and the coordinate is the first complete one, or None.
+    """
+    # IndiaLocationDataOld holds the one OpenCage response fetched for each place
+    opencage = _group_by_place(_opencage_place_rows(), 0)
+    post_office = _stream_by_place(PincodeAndCoordinate.objects.all(), 1, "pincode", "latitude", "longitude")
 
-        pincodes = []
+    for place_id, sources in groupby(heapq.merge(opencage, post_office, key=itemgetter(0, 1)), key=itemgetter(0)):
+        pincodes = set()
         latitude = None
         longitude = None
 
-        if place.slug in opencage_place_slugs:
-            for item in opencage_collection.filter(place__slug=place.slug):
-                place_data = get_opencage_pincode_and_coordiante(item)
-                pincode = place_data.get("pincode")
-                latitude = latitude or place_data.get("latitude")
-                longitude = longitude or place_data.get("longitude")
-                if pincode:
-                    pincodes.append(pincode)
+        for _, _, rows in sources:
+            for pincode, item_latitude, item_longitude in rows:
+                latitude = latitude or item_latitude
+                longitude = longitude or item_longitude
 
-        if place.slug in post_office_place_slugs:
-            for item in post_office_collection.filter(place__slug=place.slug):
-                pincode = item.pincode
-                latitude = latitude or item.latitude
-                longitude = longitude or item.longitude
+                pincode = _as_pincode(pincode)
                 if pincode:
-                    pincodes.append(pincode)
-
-        pincodes = set(pincodes)
-
+                    pincodes.add(pincode)
+
+        yield place_id, pincodes, (latitude, longitude) if latitude and longitude else None
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def sync_place_links(through, related_field, model, place_ids):
+    """Make the place M2M rows of `through` point exactly at the `model` rows of each place."""
+    target = set(model.objects.filter(place_id__in=place_ids).values_list("place_id", "id"))
+
+    stale = []
+    for pk, place_id, related_id in through.objects.filter(uniqueplace_id__in=place_ids).values_list(
+        "id", "uniqueplace_id", f"{related_field}_id"
+    ):
+        if (place_id, related_id) in target:
+            target.discard((place_id, related_id))
+        else:
+            stale.append(pk)
+
+    if stale:
+        through.objects.filter(id__in=stale).delete()
+
+    through.objects.bulk_create(
+        [through(uniqueplace_id=place_id, **{f"{related_field}_id": related_id}) for place_id, related_id in target],
+        batch_size=1000, ignore_conflicts=True
+    )
+
+
+def consolidate_places(targets):
+    """
+    Bring the PlacePincode and PlaceCoordinate rows of a chunk of places,
+    and their M2M links, in line with `targets` by applying the difference
+    to the rows that already exist.
+    """
+    place_ids = [place_id for place_id, _, _ in targets]
+
+    existing_pincodes = {}
+    for pk, place_id, pincode in PlacePincode.objects.filter(place_id__in=place_ids).order_by("id").values_list(
+        "id", "place_id", "pincode"
+    ):
+        existing_pincodes.setdefault(place_id, []).append((pk, pincode))
+
+    existing_coordinates = {}
+    for pk, place_id, latitude, longitude in PlaceCoordinate.objects.filter(place_id__in=place_ids).order_by("id").values_list(
+        "id", "place_id", "latitude", "longitude"
+    ):
+        existing_coordinates.setdefault(place_id, []).append((pk, (latitude, longitude)))
+
+    deleting_pincodes, creating_pincodes = [], []
+    deleting_coordinates, creating_coordinates = [], []
+
+    for place_id, pincodes, coordinate in targets:
+        # A place without pincodes or a coordinate keeps the rows it has
         if pincodes:
-            PlacePincode.objects.filter(place=place).delete()
-            PlacePincode.objects.bulk_create([
-                PlacePincode(place=place, pincode=p) for p in pincodes
-            ])
-
-        if latitude and longitude:
-            PlaceCoordinate.objects.filter(place=place).delete()
-            PlaceCoordinate.objects.create(
-                place=place, latitude=latitude, longitude=longitude
-            )
-
-        place.pincodes.set(PlacePincode.objects.filter(place=place))
-        place.coordinates.set(PlaceCoordinate.objects.filter(place=place))
-
-        logger.info(f"Updated {place.name} ({place.slug})")
+            missing = set(pincodes)
+            for pk, pincode in existing_pincodes.get(place_id, []):
+                if pincode in missing:
+                    missing.discard(pincode)
+                else:
+                    deleting_pincodes.append(pk)
+
+            creating_pincodes.extend(PlacePincode(place_id=place_id, pincode=pincode) for pincode in missing)
+
+        if coordinate:
+            kept = False
+            for pk, existing in existing_coordinates.get(place_id, []):
+                if existing == coordinate and not kept:
+                    kept = True
+                else:
+                    deleting_coordinates.append(pk)
+
+            if not kept:
+                creating_coordinates.append(
+                    PlaceCoordinate(place_id=place_id, latitude=coordinate[0], longitude=coordinate[1])
+                )
+
+    with transaction.atomic():
+        if deleting_pincodes:
+            PlacePincode.objects.filter(id__in=deleting_pincodes).delete()
+        if deleting_coordinates:
+            PlaceCoordinate.objects.filter(id__in=deleting_coordinates).delete()
+
+        PlacePincode.objects.bulk_create(creating_pincodes, batch_size=1000)
+        PlaceCoordinate.objects.bulk_create(creating_coordinates, batch_size=1000)
+
+        sync_place_links(UniquePlace.pincodes.through, "placepincode", PlacePincode, place_ids)
+        sync_place_links(UniquePlace.coordinates.through, "placecoordinate", PlaceCoordinate, place_ids)
+
+    return len(creating_pincodes) + len(creating_coordinates), len(deleting_pincodes) + len(deleting_coordinates)
+
+
+def update_pincodes(chunk_size=CONSOLIDATION_CHUNK_SIZE):
+    """
+    Consolidate the pincodes and coordinate of every place found in the
+    OpenCage or post office data into its PlacePincode and PlaceCoordinate
+    rows, a chunk of places per transaction.
+    """
+    places = 0
+    created = 0
+    deleted = 0
+
+    for targets in _chunks(generate_place_targets(), chunk_size):
+        chunk_created, chunk_deleted = consolidate_places(targets)
+
+        places += len(targets)
+        created += chunk_created
+        deleted += chunk_deleted
+        logger.info(f"Consolidated {places} places ({created} rows created, {deleted} deleted)")
+
+    logger.info("Completed")
+    return places
@@ -0,0 +1,84 @@
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+
+from ..models import Place, UniqueDistrict, UniquePlace, PlacePincode, PlaceCoordinate
+from .pincode import sync_place_links
+
+logger = logging.getLogger(__name__)
+
+
+def merge_district_places(district_id, district_name, state_name):
+    """
+    Copy the pincodes and coordinates of the Place rows named like each
+    UniquePlace of one district into its PlacePincode and PlaceCoordinate
+    rows, and link every place of the district to its rows.
+    """
+    place_index = defaultdict(lambda: {"pincodes": set(), "coordinates": set()})
+    for name, place_district, place_state, pincode, latitude, longitude in Place.objects.filter(
+        district__name = district_name, state__name = state_name
+    ).values_list("name", "district__name", "state__name", "pincode", "latitude", "longitude").iterator():
+        # The database matches names case-insensitively, the merge keys don't
+        key = (name, place_district, place_state)
+        place_index[key]["pincodes"].add(pincode)
+        place_index[key]["coordinates"].add((latitude, longitude))
+
+    unique_places = list(UniquePlace.objects.filter(district_id = district_id).values_list("id", "name", "state__name"))
+    place_ids = [place_id for place_id, _, _ in unique_places]
+
+    existing_pincodes = set(PlacePincode.objects.filter(place_id__in = place_ids).values_list("place_id", "pincode"))
+    existing_coordinates = set(
+        PlaceCoordinate.objects.filter(place_id__in = place_ids).values_list("place_id", "latitude", "longitude")
+    )
+
+    new_pincodes = []
+    new_coordinates = []
+
+    for place_id, name, place_state in unique_places:
+        data = place_index.get((name, district_name, place_state))
+        if not data:
+            continue
+
+        for pincode in data["pincodes"]:
+            if (place_id, pincode) not in existing_pincodes:
+                new_pincodes.append(PlacePincode(place_id = place_id, pincode = pincode))
+
+        for latitude, longitude in data["coordinates"]:
+            if (place_id, latitude, longitude) not in existing_coordinates:
+                new_coordinates.append(PlaceCoordinate(place_id = place_id, latitude = latitude, longitude = longitude))
+
+    with transaction.atomic():
+        PlacePincode.objects.bulk_create(new_pincodes, batch_size=1000)
+        PlaceCoordinate.objects.bulk_create(new_coordinates, batch_size=1000)
+
+        sync_place_links(UniquePlace.pincodes.through, "placepincode", PlacePincode, place_ids)
+        sync_place_links(UniquePlace.coordinates.through, "placecoordinate", PlaceCoordinate, place_ids)
+
+    return len(new_pincodes), len(new_coordinates)
+
+
+def update_places(selected_state):
+    """
+    Merge the Place data of `selected_state` into its UniquePlaces, one
+    district at a time so that memory stays bounded by the largest district.
+    """
+    districts = list(
+        UniqueDistrict.objects.filter(state__name = selected_state).order_by("name", "id").values_list(
+            "id", "name", "state__name"
+        )
+    )
+
+    logger.info(f"Merging the places of {len(districts)} districts of {selected_state}...")
+
+    total_pincodes = 0
+    total_coordinates = 0
+
+    for index, (district_id, district_name, state_name) in enumerate(districts, start=1):
+        pincodes, coordinates = merge_district_places(district_id, district_name, state_name)
+
+        total_pincodes += pincodes
+        total_coordinates += coordinates
+        logger.info(f"[{index}/{len(districts)}] {district_name}: {pincodes} pincodes and {coordinates} coordinates created")
+
+    logger.info(f"Update complete: {total_pincodes} pincodes and {total_coordinates} coordinates created.")
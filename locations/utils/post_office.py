@@ -0,0 +1,125 @@
+import logging
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Length of the name fragments the post office index is keyed on
+GRAM_SIZE = 3
+
+
+def normalize_name(value):
+    # Names are compared like MySQL does: case-insensitively
+    return " ".join(str(value or "").casefold().split())
+
+
+def _grams(name):
+    return {name[start:start + GRAM_SIZE] for start in range(len(name) - GRAM_SIZE + 1)}
+
+
+class PostOfficeIndex:
+    """
+    Post offices of one district, searchable by a fragment of their name.
+
+    Office names are normalized and split into overlapping fragments of
+    GRAM_SIZE characters, each mapped to the offices containing it. A search
+    intersects the offices of the query's fragments, rarest first, and
+    confirms the candidates with a substring test, so it returns exactly
+    what `office_name__icontains` does.
+    """
+
+    def __init__(self, offices):
+        self.offices = offices
+        self.names = [normalize_name(office[1]) for office in offices]
+
+        self.postings = defaultdict(set)
+        for index, name in enumerate(self.names):
+            for gram in _grams(name):
+                self.postings[gram].add(index)
+
+    def search(self, name):
+        name = normalize_name(name)
+
+        if len(name) < GRAM_SIZE:
+            candidates = range(len(self.offices))
+        else:
+            postings = sorted((self.postings.get(gram, set()) for gram in _grams(name)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            candidates = sorted(candidates)
+
+        return [self.offices[index] for index in candidates if name in self.names[index]]
+
+
+def match_state(places, offices, existing):
+    """
+    (place_id, office) pairs for the places of one state.
+
+    `places` holds (place_id, name, district key) tuples, `offices` maps a
+    district key to its (id, office_name, pincode, latitude, longitude)
+    tuples and `existing` holds the (place_id, pincode) pairs already
+    stored. Each place gets at most one post office per pincode.
+    """
+    indexes = {district: PostOfficeIndex(district_offices) for district, district_offices in offices.items()}
+    existing = set(existing)
+
+    matches = []
+    for place_id, name, district in places:
+        index = indexes.get(district)
+        if index is None:
+            continue
+
+        for office in index.search(name):
+            if (place_id, office[2]) in existing:
+                continue
+
+            existing.add((place_id, office[2]))
+            matches.append((place_id, office))
+
+    return matches
+
+
+def can_fork():
+    # Celery's prefork pool runs tasks in daemonic processes, which may not start children
+    return not multiprocessing.current_process().daemon
+
+
+def match_post_offices(places, post_offices, existing, workers=None):
+    """
+    Match places to the post offices of their district whose name contains
+    the place name, in one pass per state.
+
+    `places` holds (place_id, name, district, state) tuples, `post_offices`
+    (id, office_name, pincode, latitude, longitude, district, state_name)
+    tuples and `existing` (place_id, pincode) pairs. States are matched on
+    a process pool of `workers` processes when the caller may fork, and in
+    this process otherwise.
+    """
+    offices_by_state = defaultdict(lambda: defaultdict(list))
+    for office in post_offices:
+        district, state = normalize_name(office[5]), normalize_name(office[6])
+        offices_by_state[state][district].append(office[:5])
+
+    places_by_state = defaultdict(list)
+    for place_id, name, district, state in places:
+        places_by_state[normalize_name(state)].append((place_id, name, normalize_name(district)))
+
+    existing_by_place = defaultdict(list)
+    for place_id, pincode in existing:
+        existing_by_place[place_id].append((place_id, pincode))
+
+    jobs = []
+    for state, state_places in places_by_state.items():
+        if state not in offices_by_state:
+            continue
+
+        state_existing = [pair for place_id, _, _ in state_places for pair in existing_by_place.get(place_id, [])]
+        jobs.append((state_places, dict(offices_by_state[state]), state_existing))
+
+    if workers == 1 or len(jobs) < 2 or not can_fork():
+        results = [match_state(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(match_state, *zip(*jobs)))
+
+    return [match for state_matches in results for match in state_matches]
@@ -1,6 +1,6 @@
 from locations.models import UniquePlace, UniqueDistrict, UniqueState
 
-def generate_location_url_tails(state_ids = None):
+def _location_filters(state_ids):
     state_filters = {}
     district_filters = {}
     place_filters = {}
@@ -10,36 +10,43 @@ def generate_location_url_tails(state_ids = None):
         district_filters["state__id__in"] = state_ids
         place_filters["state__id__in"] = state_ids
 
-    for slug in UniqueState.objects.filter(**state_filters).values_list("slug", flat=True).iterator():
-        yield f"/{slug}"
+    return state_filters, district_filters, place_filters
 
-    for state, slug in UniqueDistrict.objects.filter(**district_filters).values_list("state__slug", "slug").iterator():
-        yield f"/{state}/{slug}"
+def generate_location_url_entries(state_ids = None):
+    """(url tail, updated) of every state, district and place."""
+    state_filters, district_filters, place_filters = _location_filters(state_ids)
 
-    for state, district, slug in UniquePlace.objects.filter(**place_filters).values_list(
-        "state__slug", "district__slug", "slug"
+    # Ties on name broken by id, so sitemaps come out the same on every run
+    for slug, updated in UniqueState.objects.filter(**state_filters).order_by("name", "id").values_list(
+        "slug", "updated"
     ).iterator():
-        yield f"/{state}/{district}/{slug}"
+        yield f"/{slug}", updated
 
-def generate_location_url_slugs(state_ids = None):
-    state_filters = {}
-    district_filters = {}
-    place_filters = {}
+    for state, slug, updated in UniqueDistrict.objects.filter(**district_filters).order_by("name", "id").values_list(
+        "state__slug", "slug", "updated"
+    ).iterator():
+        yield f"/{state}/{slug}", updated
 
-    if state_ids:
-        state_filters["id__in"] = state_ids
-        district_filters["state__id__in"] = state_ids
-        place_filters["state__id__in"] = state_ids
+    for state, district, slug, updated in UniquePlace.objects.filter(**place_filters).order_by("name", "id").values_list(
+        "state__slug", "district__slug", "slug", "updated"
+    ).iterator():
+        yield f"/{state}/{district}/{slug}", updated
+
+def generate_location_url_tails(state_ids = None):
+    for tail, _ in generate_location_url_entries(state_ids):
+        yield tail
+
+def generate_location_slug_entries(state_ids = None):
+    """(slug, updated) of the distinct state, district and place slugs, sorted by slug."""
+    latest = {}
+    for model, filters in zip([UniqueState, UniqueDistrict, UniquePlace], _location_filters(state_ids)):
+        for slug, updated in model.objects.filter(**filters).values_list("slug", "updated").iterator():
+            if slug and (slug not in latest or updated > latest[slug]):
+                latest[slug] = updated
 
-    seen = set()
-    for model, filters in [
-        (UniqueState, state_filters),
-        (UniqueDistrict, district_filters),
-        (UniquePlace, place_filters),
-    ]:
-        for slug in model.objects.filter(**filters).values_list("slug", flat=True).iterator():
-            if slug and slug not in seen:
-                seen.add(slug)
-
-    for slug in sorted(seen):
-        yield slug
\ No newline at end of file
+    for slug in sorted(latest):
+        yield slug, latest[slug]
+
+def generate_location_url_slugs(state_ids = None):
+    for slug, _ in generate_location_slug_entries(state_ids):
+        yield slug
@@ -1,9 +1,9 @@
 from django.http import JsonResponse, HttpResponse, Http404
-from django.core.cache import cache
 from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.views.generic import View
 from django.utils.text import slugify
+from django.utils import timezone
 
 import logging
 import requests
@@ -19,12 +19,12 @@ from .models import (
     TestedCoordinates, RetestedCoordinates, TestPincode, 
     UniqueState, UniqueDistrict, UniquePlace,
 
-    AndmanAndNicobarTestedCoordinates, UaeCoordinates, KsaCoordinates,    
-    UaeLocationData, KsaLocationData, PlacePincode, PlaceCoordinate,
-    KuwaitLocationData, KuwaitCoordinates, BahrainCoordinates, BahrainLocationData,
-    QatarCoordinates, QatarLocationData, OmanCoordinates, OmanLocationData,
-    IndiaCoordinates, IndiaLocationData
+    AndmanAndNicobarTestedCoordinates, PlacePincode, PlaceCoordinate,
     )
+from .trie_cache import publish_trie_change
+from .crawler import crawl_country
+from utility.quota import get_opencage_quota
+from utility.slugs import SlugAllocator
 
 logger = logging.getLogger(__name__)
 
@@ -57,635 +57,33 @@ def places_count():
     places = Place.objects.all()
     return places.count()
 
-def get_locations(top_left, bottom_right, api_key, opencage_cache):
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
+def get_locations(top_left, bottom_right, key_name):
+    crawl_country("india_places", top_left, bottom_right, key_name)
 
-    lat_step = 0.02
-    lon_step = 0.02
+def get_uae_locations(top_left, bottom_right, key_name):
+    crawl_country("uae", top_left, bottom_right, key_name)
 
-    latitude = top_left[0]
-    
-    while latitude >= bottom_right[0]:
-        longitude = top_left[1]
-
-        while longitude <= bottom_right[1]:
-            request_count = cache.get(opencage_cache, 0)
-
-            with transaction.atomic():            
-                if not RetestedCoordinates.objects.filter(latitude=latitude, longitude=longitude).exists():
-                    if request_count <= 6667:
-                        try:
-                            logger.info(f"Querying Coordinates: ({latitude}, {longitude})")
-                            response = requests.get(f"{base_url}?q={latitude}+{longitude}&key={api_key}")
-                            response.raise_for_status()
-
-                            request_count += 1
-                            cache.set(opencage_cache, request_count, timeout=60*60*24)
-                            data = response.json()
-
-                            logger.info(f"Request number: {request_count}")
-
-                            if "results" in data and data["results"]:
-                                components = data["results"][0].get("components", {})
-                                country = components.get("country")
-
-                                if country == "India":
-                                    place = components.get("village") or components.get("town") or components.get("city") or components.get("county")
-                                    state_name = components.get("state")
-                                    district_name = components.get("state_district")
-                                    pincode = components.get("postcode")
-                                    
-                                    if place and state_name and district_name:
-                                        state, _ = State.objects.get_or_create(name=state_name)
-                                        district, _ = District.objects.get_or_create(name=district_name, state=state)
-
-                                        if not Place.objects.filter(name = place, district = district, state = state, pincode = pincode).exists():
-
-                                            Place.objects.create(
-                                                name = place,
-                                                district=district,
-                                                state=state,
-                                                pincode=pincode,
-                                                latitude=data["results"][0]["geometry"]["lat"],
-                                                longitude=data["results"][0]["geometry"]["lng"]
-                                            )
-                                            logger.info(f"Place created for {place}, {district.name}, {state.name}")
-                            
-                            RetestedCoordinates.objects.create(latitude=latitude, longitude=longitude)
-                            
-                        except requests.exceptions.RequestException as e:
-                            logger.info(f"Error during API request: {e}")
-                            time.sleep(2)
-                            break
-
-                        except Exception as e:
-                            logger.info(f"An Unexpected Error occured: {e}")
-                            
-                            time.sleep(2)
-                            break
-                
-                        time.sleep(0.25)
-
-                    else:
-                        logger.info("You have used up your daily API call limit.")
-                        break
-
-                longitude += lon_step
-                longitude = round(longitude, 2)
-
-        latitude -= lat_step
-        latitude = round(latitude, 2)
-
-def get_uae_locations(top_left, bottom_right, api_key, opencage_cache):
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
-
-    lat_step = 0.01
-    lon_step = 0.01
-
-    latitude = top_left[0]
-    
-    while latitude >= bottom_right[0]:
-        longitude = top_left[1]
-
-        while longitude <= bottom_right[1]:
-            request_count = cache.get(opencage_cache, 0)
-
-            if not UaeCoordinates.objects.filter(latitude=latitude, longitude=longitude).exists():
-                with transaction.atomic():            
-                    if request_count <= 10000:
-                        try:
-                            logger.info(f"Querying Coordinates: ({latitude}, {longitude})")
-
-                            response = requests.get(base_url, params={
-                                "q": f"{latitude},{longitude}",
-                                "key": api_key
-                            })
-
-                            response.raise_for_status()
-
-                            request_count += 1
-                            cache.set(opencage_cache, request_count, timeout=60*60*24)
-                            data = response.json()
-
-                            logger.info(f"Request number: {request_count}")
-
-                            if "results" in data and data["results"]:
-                                first_result = data["results"][0]
-                                components = first_result.get("components", {})
-                                formatted = first_result.get("formatted")
-
-                                country = components.get("country")
-
-                                if str(country).lower() in {"united arab emirates", "uae"}:
-                                    road = components.get("road")
-                                    address = formatted.replace(f"{road},", "").strip() if road else formatted
-
-                                    location, created = UaeLocationData.objects.get_or_create(                                        
-                                        address= address,                                        
-                                        defaults={
-                                            "json_data": data,
-                                            "requested_latitude": latitude,
-                                            "requested_longitude": longitude
-                                            }
-                                    )
-
-                                    if created:
-                                        logger.info(f"Place created: '{address}'\n")
-                            
-                            UaeCoordinates.objects.get_or_create(latitude=latitude, longitude=longitude)
-
-                        except requests.exceptions.RequestException as e:
-                            logger.info(f"Error during API request: {e}")
-                            time.sleep(2)
-                            continue
-
-                        except Exception as e:
-                            logger.info(f"An Unexpected Error occured: {e}")
-                            time.sleep(2)
-                            continue
-                
-                        time.sleep(0.2)
-
-                    else:
-                        logger.info("You have used up your daily API call limit.")
-                        return
-
-            longitude += lon_step
-            longitude = round(longitude, 2)
-
-        latitude -= lat_step
-        latitude = round(latitude, 2)
-
-def get_ksa_locations(top_left, bottom_right, api_key, opencage_cache):
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
-
-    lat_step = 0.02
-    lon_step = 0.02
-
-    latitude = top_left[0]
-    
-    while latitude >= bottom_right[0]:
-        longitude = top_left[1]
-
-        while longitude <= bottom_right[1]:
-            request_count = cache.get(opencage_cache, 0)
-
-            if not KsaCoordinates.objects.filter(latitude=latitude, longitude=longitude).exists():
-                with transaction.atomic():            
-                    if request_count <= 6666:
-                        try:
-                            logger.info(f"Querying Coordinates: ({latitude}, {longitude})")
-
-                            response = requests.get(base_url, params={
-                                "q": f"{latitude},{longitude}",
-                                "key": api_key
-                            })
-
-                            response.raise_for_status()
-
-                            request_count += 1
-                            cache.set(opencage_cache, request_count, timeout=60*60*24)
-                            data = response.json()
-
-                            logger.info(f"Request number: {request_count}")
-
-                            if "results" in data and data["results"]:
-                                first_result = data["results"][0]
-                                components = first_result.get("components", {})
-                                formatted = first_result.get("formatted")
-
-                                country = components.get("country")                    
-
-                                if str(country).lower() in {"kingdom of saudi arabia", "saudi arabia", "ksa"}:
-                                    road = components.get("road")
-                                    address = formatted.replace(f"{road},", "").strip() if road else formatted
-
-                                    if not KsaLocationData.objects.filter(address= address).exists():
+def get_ksa_locations(top_left, bottom_right, key_name):
+    crawl_country("ksa", top_left, bottom_right, key_name)
 
-                                        KsaLocationData.objects.create(                                        
-                                            address = address, json_data = data, requested_latitude = latitude, requested_longitude = longitude                                            
-                                        )
+def get_kuwait_locations(top_left, bottom_right, key_name):
+    crawl_country("kuwait", top_left, bottom_right, key_name)
 
-                                        logger.info(f"Place created: '{address}'\n")
-                            
-                            KsaCoordinates.objects.get_or_create(latitude=latitude, longitude=longitude)
-
-                        except requests.exceptions.RequestException as e:
-                            logger.info(f"Error during API request: {e}")
-                            time.sleep(2)
-                            continue
-
-                        except Exception as e:
-                            # logger.info(f"An Unexpected Error occured: {e}")
-                            logger.exception(f"An Unexpected Error occured: {e}")
-                            time.sleep(2)
-                            continue
-                
-                        time.sleep(0.2)
-
-                    else:
-                        logger.info("You have used up your daily API call limit.")
-                        return
-
-            longitude += lon_step
-            longitude = round(longitude, 2)
-
-        latitude -= lat_step
-        latitude = round(latitude, 2)
-
-
-def get_kuwait_locations(top_left, bottom_right, api_key, opencage_cache):
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
-
-    lat_step = 0.02
-    lon_step = 0.02
-
-    latitude = top_left[0]
-    
-    while latitude >= bottom_right[0]:
-        longitude = top_left[1]
+def get_bahrain_locations(top_left, bottom_right, key_name):
+    crawl_country("bahrain", top_left, bottom_right, key_name)
 
-        while longitude <= bottom_right[1]:
-            request_count = cache.get(opencage_cache, 0)
+def get_qatar_locations(top_left, bottom_right, key_name):
+    crawl_country("qatar", top_left, bottom_right, key_name)
 
-            if not KuwaitCoordinates.objects.filter(latitude=latitude, longitude=longitude).exists():
-                with transaction.atomic():            
-                    if request_count <= 6666:
-                        try:
-                            logger.info(f"Querying Coordinates: ({latitude}, {longitude})")
+def get_oman_locations(top_left, bottom_right, key_name):
+    crawl_country("oman", top_left, bottom_right, key_name)
 
-                            response = requests.get(base_url, params={
-                                "q": f"{latitude},{longitude}",
-                                "key": api_key
-                            })
-
-                            response.raise_for_status()
-
-                            request_count += 1
-                            cache.set(opencage_cache, request_count, timeout=60*60*24)
-                            data = response.json()
-
-                            logger.info(f"Request number: {request_count}")
-
-                            if "results" in data and data["results"]:
-                                first_result = data["results"][0]
-                                components = first_result.get("components", {})
-                                formatted = first_result.get("formatted")
-
-                                country = components.get("country")                    
-
-                                if str(country).lower() in {"kuwait"}:
-                                    road = components.get("road")
-                                    address = formatted.replace(f"{road},", "").strip() if road else formatted
-
-                                    if not KuwaitLocationData.objects.filter(address= address).exists():
-
-                                        KuwaitLocationData.objects.create(                                        
-                                            address = address, json_data = data, requested_latitude = latitude, requested_longitude = longitude                                            
-                                        )
-
-                                        logger.info(f"Place created: '{address}'\n")
-                            
-                            KuwaitCoordinates.objects.get_or_create(latitude=latitude, longitude=longitude)
-
-                        except requests.exceptions.RequestException as e:
-                            logger.info(f"Error during API request: {e}")
-                            time.sleep(2)
-                            continue
-
-                        except Exception as e:
-                            # logger.info(f"An Unexpected Error occured: {e}")
-                            logger.exception(f"An Unexpected Error occured: {e}")
-                            time.sleep(2)
-                            continue
-                
-                        time.sleep(0.2)
-
-                    else:
-                        logger.info("You have used up your daily API call limit.")
-                        return
-
-            longitude += lon_step
-            longitude = round(longitude, 2)
-
-        latitude -= lat_step
-        latitude = round(latitude, 2)
-
-
-def get_bahrain_locations(top_left, bottom_right, api_key, opencage_cache):
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
-
-    lat_step = 0.02
-    lon_step = 0.02
-
-    latitude = top_left[0]
-    
-    while latitude >= bottom_right[0]:
-        longitude = top_left[1]
-
-        while longitude <= bottom_right[1]:
-            request_count = cache.get(opencage_cache, 0)
-
-            if not BahrainCoordinates.objects.filter(latitude=latitude, longitude=longitude).exists():
-                with transaction.atomic():            
-                    if request_count <= 6666:
-                        try:
-                            logger.info(f"Querying Coordinates: ({latitude}, {longitude})")
-
-                            response = requests.get(base_url, params={
-                                "q": f"{latitude},{longitude}",
-                                "key": api_key
-                            })
-
-                            response.raise_for_status()
-
-                            request_count += 1
-                            cache.set(opencage_cache, request_count, timeout=60*60*24)
-                            data = response.json()
-
-                            logger.info(f"Request number: {request_count}")
-
-                            if "results" in data and data["results"]:
-                                first_result = data["results"][0]
-                                components = first_result.get("components", {})
-                                formatted = first_result.get("formatted")
-
-                                country = components.get("country")                    
-
-                                if str(country).lower() in {"bahrain"}:
-                                    road = components.get("road")
-                                    address = formatted.replace(f"{road},", "").strip() if road else formatted
-
-                                    if not BahrainLocationData.objects.filter(address= address).exists():
-
-                                        BahrainLocationData.objects.create(                                        
-                                            address = address, json_data = data, requested_latitude = latitude, requested_longitude = longitude                                            
-                                        )
-
-                                        logger.info(f"Place created: '{address}'\n")
-                            
-                            BahrainCoordinates.objects.get_or_create(latitude=latitude, longitude=longitude)
-
-                        except requests.exceptions.RequestException as e:
-                            logger.info(f"Error during API request: {e}")
-                            time.sleep(2)
-                            continue
-
-                        except Exception as e:
-                            # logger.info(f"An Unexpected Error occured: {e}")
-                            logger.exception(f"An Unexpected Error occured: {e}")
-                            time.sleep(2)
-                            continue
-                
-                        time.sleep(0.2)
-
-                    else:
-                        logger.info("You have used up your daily API call limit.")
-                        return
-
-            longitude += lon_step
-            longitude = round(longitude, 2)
-
-        latitude -= lat_step
-        latitude = round(latitude, 2)
-
-
-def get_qatar_locations(top_left, bottom_right, api_key, opencage_cache):
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
-
-    lat_step = 0.02
-    lon_step = 0.02
-
-    latitude = top_left[0]
-    
-    while latitude >= bottom_right[0]:
-        longitude = top_left[1]
-
-        while longitude <= bottom_right[1]:
-            request_count = cache.get(opencage_cache, 0)
-
-            if not QatarCoordinates.objects.filter(latitude=latitude, longitude=longitude).exists():
-                with transaction.atomic():            
-                    if request_count <= 6666:
-                        try:
-                            logger.info(f"Querying Coordinates: ({latitude}, {longitude})")
-
-                            response = requests.get(base_url, params={
-                                "q": f"{latitude},{longitude}",
-                                "key": api_key
-                            })
-
-                            response.raise_for_status()
-
-                            request_count += 1
-                            cache.set(opencage_cache, request_count, timeout=60*60*24)
-                            data = response.json()
-
-                            logger.info(f"Request number: {request_count}")
-
-                            if "results" in data and data["results"]:
-                                first_result = data["results"][0]
-                                components = first_result.get("components", {})
-                                formatted = first_result.get("formatted")
-
-                                country = components.get("country")                    
-
-                                if str(country).lower() in {"qatar"}:
-                                    road = components.get("road")
-                                    address = formatted.replace(f"{road},", "").strip() if road else formatted
-
-                                    if not QatarLocationData.objects.filter(address= address).exists():
-
-                                        QatarLocationData.objects.create(                                        
-                                            address = address, json_data = data, requested_latitude = latitude, requested_longitude = longitude                                            
-                                        )
-
-                                        logger.info(f"Place created: '{address}'\n")
-                            
-                            QatarCoordinates.objects.get_or_create(latitude=latitude, longitude=longitude)
-
-                        except requests.exceptions.RequestException as e:
-                            logger.info(f"Error during API request: {e}")
-                            time.sleep(2)
-                            continue
-
-                        except Exception as e:
-                            # logger.info(f"An Unexpected Error occured: {e}")
-                            logger.exception(f"An Unexpected Error occured: {e}")
-                            time.sleep(2)
-                            continue
-                
-                        time.sleep(0.2)
-
-                    else:
-                        logger.info("You have used up your daily API call limit.")
-                        return
-
-            longitude += lon_step
-            longitude = round(longitude, 2)
-
-        latitude -= lat_step
-        latitude = round(latitude, 2)
-
-
-def get_oman_locations(top_left, bottom_right, api_key, opencage_cache):
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
-
-    lat_step = 0.02
-    lon_step = 0.02
-
-    latitude = top_left[0]
-    
-    while latitude >= bottom_right[0]:
-        longitude = top_left[1]
-
-        while longitude <= bottom_right[1]:
-            request_count = cache.get(opencage_cache, 0)
-
-            if not OmanCoordinates.objects.filter(latitude=latitude, longitude=longitude).exists():
-                with transaction.atomic():            
-                    if request_count <= 6666:
-                        try:
-                            logger.info(f"Querying Coordinates: ({latitude}, {longitude})")
-
-                            response = requests.get(base_url, params={
-                                "q": f"{latitude},{longitude}",
-                                "key": api_key
-                            })
-
-                            response.raise_for_status()
-
-                            request_count += 1
-                            cache.set(opencage_cache, request_count, timeout=60*60*24)
-                            data = response.json()
-
-                            logger.info(f"Request number: {request_count}")
-
-                            if "results" in data and data["results"]:
-                                first_result = data["results"][0]
-                                components = first_result.get("components", {})
-                                formatted = first_result.get("formatted")
-
-                                country = components.get("country")                    
-
-                                if str(country).lower() in {"oman"}:
-                                    road = components.get("road")
-                                    address = formatted.replace(f"{road},", "").strip() if road else formatted
-
-                                    if not OmanLocationData.objects.filter(address= address).exists():
-
-                                        OmanLocationData.objects.create(                                        
-                                            address = address, json_data = data, requested_latitude = latitude, requested_longitude = longitude                                            
-                                        )
-
-                                        logger.info(f"Place created: '{address}'\n")
-                            
-                            OmanCoordinates.objects.get_or_create(latitude=latitude, longitude=longitude)
-
-                        except requests.exceptions.RequestException as e:
-                            logger.info(f"Error during API request: {e}")
-                            time.sleep(2)
-                            continue
-
-                        except Exception as e:
-                            # logger.info(f"An Unexpected Error occured: {e}")
-                            logger.exception(f"An Unexpected Error occured: {e}")
-                            time.sleep(2)
-                            continue
-                
-                        time.sleep(0.2)
-
-                    else:
-                        logger.info("You have used up your daily API call limit.")
-                        return
-
-            longitude += lon_step
-            longitude = round(longitude, 2)
-
-        latitude -= lat_step
-        latitude = round(latitude, 2)
-
-def get_india_locations(top_left, bottom_right, api_key, opencage_cache):
-    base_url = 'https://api.opencagedata.com/geocode/v1/json'
-
-    lat_step = 0.03
-    lon_step = 0.03
-
-    latitude = top_left[0]
-    
-    while latitude >= bottom_right[0]:
-        longitude = top_left[1]
-
-        while longitude <= bottom_right[1]:
-            request_count = cache.get(opencage_cache, 0)
-
-            if not IndiaCoordinates.objects.filter(latitude=latitude, longitude=longitude).exists():
-                with transaction.atomic():            
-                    if request_count <= 10000:
-                        try:
-                            logger.info(f"Querying Coordinates: ({latitude}, {longitude})")
-
-                            response = requests.get(base_url, params={
-                                "q": f"{latitude},{longitude}",
-                                "key": api_key
-                            })
-
-                            response.raise_for_status()
-
-                            request_count += 1
-                            cache.set(opencage_cache, request_count, timeout=60*60*24)
-                            data = response.json()
-
-                            logger.info(f"Request number: {request_count}")
-
-                            if "results" in data and data["results"]:
-                                first_result = data["results"][0]
-                                components = first_result.get("components", {})
-                                formatted = first_result.get("formatted")
-
-                                country = components.get("country")                    
-
-                                if str(country).lower() in {"india"}:
-                                    road = components.get("road")
-                                    address = formatted.replace(f"{road},", "").strip() if road else formatted
-
-                                    if not IndiaLocationData.objects.filter(address= address).exists():
-
-                                        IndiaLocationData.objects.create(                                        
-                                            address = address, json_data = data, requested_latitude = latitude, requested_longitude = longitude                                            
-                                        )
-
-                                        logger.info(f"Place created: '{address}'\n")
-                            
-                            IndiaCoordinates.objects.get_or_create(latitude=latitude, longitude=longitude)
-
-                        except requests.exceptions.RequestException as e:
-                            logger.info(f"Error during API request: {e}")
-                            time.sleep(2)
-                            continue
-
-                        except Exception as e:
-                            # logger.info(f"An Unexpected Error occured: {e}")
-                            logger.exception(f"An Unexpected Error occured: {e}")
-                            time.sleep(2)
-                            continue
-                
-                        time.sleep(0.2)
-
-                    else:
-                        logger.info("You have used up your daily API call limit.")
-                        return
-
-            longitude += lon_step
-            longitude = round(longitude, 2)
-
-        latitude -= lat_step
-        latitude = round(latitude, 2)
+def get_india_locations(top_left, bottom_right, key_name):
+    crawl_country("india", top_left, bottom_right, key_name)
 
 
 def reset_count():
-    for opencage_count in ("opencage_requested_1", "opencage_requested_2", "opencage_requested_3"):
-        cache.set(opencage_count, 0, 24 * 3600)
+    get_opencage_quota().reset()
     
     print("Resetted Counts\n")
 
@@ -955,6 +353,28 @@ def populate_unique_districts():
 #     print(f"\nInserted {len(unique_places)} new unique place records.")
 
 
+def publish_place_inserts(places):
+    """
+    Publish trie inserts for UniquePlace instances just bulk created. MySQL
+    returns no primary keys from a bulk insert, so those left unset are read
+    back by (name, district, state), which populate_unique_places keeps
+    unique among the new places.
+    """
+    missing = {(place.name, place.district_id, place.state_id): place for place in places if place.pk is None}
+    if missing:
+        for pk, *key in UniquePlace.objects.filter(
+            name__in={name for name, _, _ in missing},
+            district_id__in={district_id for _, district_id, _ in missing},
+        ).order_by("pk").values_list("pk", "name", "district_id", "state_id"):
+            place = missing.get(tuple(key))
+            if place is not None:
+                place.pk = pk
+
+    for place in places:
+        if place.pk is not None:
+            publish_trie_change("place", "insert", place.slug, place.pk)
+
+
 def populate_unique_places():
     places = Place.objects.all()
     length = places.count()
@@ -965,6 +385,7 @@ def populate_unique_places():
         for district in UniqueDistrict.objects.select_related("state")
     }
     existing_places = set(UniquePlace.objects.values_list("name", "district_id", "state_id"))
+    slugs = SlugAllocator(UniquePlace)
 
     unique_places = []
     unique_combinations = set()
@@ -983,11 +404,16 @@ def populate_unique_places():
         unique_key = (name, district.id, state.id)
         
         if unique_key not in existing_places:
-            unique_places.append(UniquePlace(name=name, district=district, state=state))
+            unique_place = UniquePlace(name=name, district=district, state=state)
+            unique_place.slug = slugs.first_free(unique_place.get_slug_candidates())
+
+            unique_places.append(unique_place)
             existing_places.add(unique_key)
 
         if (index + 1) % batch_size == 0 or index + 1 == length:
-            UniquePlace.objects.bulk_create(unique_places, ignore_conflicts=True)
+            if unique_places:
+                UniquePlace.objects.bulk_create(unique_places)
+                publish_place_inserts(unique_places)
             unique_places.clear()
 
         new_progress = (index + 1) * 100 // length
@@ -999,10 +425,20 @@ def populate_unique_places():
 
     print(f"\nWait for the function to finish. . .")
 
-    unsaved_places = UniquePlace.objects.all()
+    # Places inserted without a slug by earlier runs
+    unsaved_places = list(UniquePlace.objects.filter(slug__isnull=True).select_related("district", "state"))
+
+    # bulk_update skips auto_now, so updated is set here for the sitemap lastmod
+    now = timezone.now()
+    for place in unsaved_places:
+        place.slug = slugs.first_free(place.get_slug_candidates())
+        place.updated = now
+
+    UniquePlace.objects.bulk_update(unsaved_places, ["slug", "updated"], batch_size=batch_size)
 
+    # bulk_update sends no signals, so publish the trie changes here
     for place in unsaved_places:
-        place.save()
+        publish_trie_change("place", "insert", place.slug, place.pk)
 
     print(f"\nCompleted!")
 
@@ -1044,72 +480,10 @@ def populate_unique_places():
 #         place.pincodes.set(updating_pincode_set)
 #         place.coordinates.set(updating_coordinate_set)
 
-from collections import defaultdict
-from django.db import transaction
-
 def update_places(selected_state):
-    # Step 1: Index all Place records in memory
-    print(f"Loading all Place of {selected_state} into memory...")
-    place_index = defaultdict(lambda: {"pincodes": set(), "coordinates": set()})
-    for pl in Place.objects.filter(state__name = selected_state).select_related("district", "state").values(
-        "name", "district__name", "state__name", "pincode", "latitude", "longitude"
-    ):
-        key = (pl["name"], pl["district__name"], pl["state__name"])
-        place_index[key]["pincodes"].add(pl["pincode"])
-        place_index[key]["coordinates"].add((pl["latitude"], pl["longitude"]))
-
-    print(f"Indexed {len(place_index)} place groups.")
-
-    # Step 2: Process UniquePlaces with minimal DB hits
-    unique_places = UniquePlace.objects.select_related("district", "state").prefetch_related("pincodes", "coordinates")
-
-    new_pincodes = []
-    new_coordinates = []
-    place_pincode_map = defaultdict(list)
-    place_coordinate_map = defaultdict(list)
-
-    print("Processing UniquePlaces...")
-    for place in unique_places:
-        key = (place.name, place.district.name, place.state.name)
-        data = place_index.get(key)
-        if not data:
-            continue
-
-        for pincode in data["pincodes"]:
-            new_pincodes.append(PlacePincode(place=place, pincode=pincode))
-            place_pincode_map[place].append(pincode)
+    from .utils.places import update_places as merge_places
 
-        for lat, lng in data["coordinates"]:
-            new_coordinates.append(PlaceCoordinate(place=place, latitude=lat, longitude=lng))
-            place_coordinate_map[place].append((lat, lng))
-
-    print("Bulk creating PlacePincode and PlaceCoordinate objects...")
-
-    # Step 3: Bulk create (ignore duplicates)
-    with transaction.atomic():
-        PlacePincode.objects.bulk_create(new_pincodes, ignore_conflicts=True)
-        PlaceCoordinate.objects.bulk_create(new_coordinates, ignore_conflicts=True)
-
-    print("Re-fetching created pincode and coordinate objects...")
-
-    # Step 4: Re-fetch related objects to set M2M
-    pincode_objs = PlacePincode.objects.filter(place__in=unique_places)
-    coordinate_objs = PlaceCoordinate.objects.filter(place__in=unique_places)
-
-    pincode_lookup = defaultdict(list)
-    for pp in pincode_objs:
-        pincode_lookup[pp.place_id].append(pp)
-
-    coordinate_lookup = defaultdict(list)
-    for pc in coordinate_objs:
-        coordinate_lookup[pc.place_id].append(pc)
-
-    print("Updating M2M relations in bulk...")
-    for place in unique_places:
-        place.pincodes.set(pincode_lookup[place.id])
-        place.coordinates.set(coordinate_lookup[place.id])
-
-    print("Update complete.")
+    merge_places(selected_state)
 
 
 from utility.location import transliterate_place_name
@@ -1162,15 +536,24 @@ def update_place_slug():
     places = UniquePlace.objects.filter(slug__regex=r"[0-9]$").select_related("district").iterator()
 
     updating_places = []
+    old_slugs = []
 
     for place in places:
         new_slug = slugify(f"{place.name}-{place.district.name}")
         if place.slug != new_slug:
+            old_slugs.append(place.slug)
             place.slug = new_slug
+            place.updated = timezone.now()
             updating_places.append(place)
 
     if updating_places:
-        UniquePlace.objects.bulk_update(updating_places, ["slug"])
+        UniquePlace.objects.bulk_update(updating_places, ["slug", "updated"])
+
+        # bulk_update sends no signals, so publish the trie changes here
+        for old_slug, place in zip(old_slugs, updating_places):
+            publish_trie_change("place", "delete", old_slug)
+            publish_trie_change("place", "insert", place.slug, place.pk)
+
         print(f"✅ Updated {len(updating_places)} place slugs.")
     else:
         print("No slugs required updating.")
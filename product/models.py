@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.text import slugify
+from utility.slugs import allocate_slug
 from django.contrib.auth.models import User
 from ckeditor.fields import RichTextField
 from datetime import datetime
@@ -60,14 +61,7 @@ class SubCategoryFaq(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.sub_category_slug}")
-            slug = base_slug
-
-            count = 1
-            while SubCategoryFaq.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(SubCategoryFaq, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -104,13 +98,7 @@ class SubCategory(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 1
-            while Category.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Category, base_slug)
         
         super().save(*args, **kwargs)
 
@@ -136,13 +124,7 @@ class Brand(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 1
-            while Brand.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Brand, base_slug)
         
         super().save(*args, **kwargs)
 
@@ -166,13 +148,7 @@ class Size(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.name}-{self.category.name}")
-            slug = base_slug
-            count = 1
-            while Brand.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Brand, base_slug)
         
         super().save(*args, **kwargs)
 
@@ -195,13 +171,7 @@ class Color(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.name}-{self.hexa}")
-            slug = base_slug
-            count = 1
-            while Brand.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Brand, base_slug)
         
         super().save(*args, **kwargs)
 
@@ -244,13 +214,7 @@ class Product(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 1
-            while Brand.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Brand, base_slug)
         
         super().save(*args, **kwargs)
 
@@ -352,14 +316,7 @@ class Faq(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.product.name)
-            slug = base_slug
-
-            count = 1
-            while Faq.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Faq, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -396,14 +353,7 @@ class Review(models.Model):
 
             base_slug = slugify(f"{self.product}-{user}")
 
-            slug = base_slug
-            count = 1
-
-            while Review.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Review, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -446,14 +396,7 @@ class Enquiry(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.product.name}-{self.email}")
-            slug = base_slug
-
-            count = 1
-            while Enquiry.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Enquiry, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -557,14 +500,7 @@ class ProductDetailPage(models.Model):
 
         if not self.slug:
             base_slug = slugify(self.product.name)
-            slug = base_slug
-            count = 1
-
-            while ProductDetailPage.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(ProductDetailPage, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -674,14 +610,7 @@ class TextEditor(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.text_editor_title}")
-            slug = base_slug
-
-            count = 1
-            while TextEditor.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(TextEditor, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -716,14 +645,7 @@ class MultiPageFaq(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.title)
-            slug = base_slug
-
-            count = 1
-            while MultiPageFaq.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(MultiPageFaq, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.text import slugify
+from utility.slugs import allocate_slug
 from ckeditor.fields import RichTextField
 from datetime import datetime
 from django.db.models import Avg
@@ -23,14 +24,7 @@ class RegistrationType(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 1
-            
-            while RegistrationType.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(RegistrationType, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -65,14 +59,7 @@ class SubTypeFaq(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.sub_type_slug}")
-            slug = base_slug
-
-            count = 1
-            while SubTypeFaq.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(SubTypeFaq, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -109,14 +96,7 @@ class RegistrationSubType(models.Model):
     def save(self, *args, **kwargs):        
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-            count = 1
-            
-            while RegistrationSubType.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug        
+            self.slug = allocate_slug(RegistrationSubType, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -169,14 +149,7 @@ class Registration(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.title)
-            slug = base_slug
-            count = 1
-            
-            while Registration.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Registration, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -204,14 +177,7 @@ class Faq(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.question}")
-            slug = base_slug
-
-            count = 1
-            while Faq.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Faq, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -240,14 +206,7 @@ class Enquiry(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.registration.title}-{self.email}")
-            slug = base_slug
-
-            count = 1
-            while Enquiry.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Enquiry, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -766,14 +725,7 @@ class TextEditor(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.text_editor_title}")
-            slug = base_slug
-
-            count = 1
-            while TextEditor.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(TextEditor, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -800,14 +752,7 @@ class MultiPageFaq(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.title}")
-            slug = base_slug
-
-            count = 1
-            while MultiPageFaq.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(MultiPageFaq, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.text import slugify
+from utility.slugs import allocate_slug
 from datetime import datetime
 from ckeditor.fields import RichTextField
 
@@ -21,14 +22,7 @@ class Category(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-
-            count = 1
-            while Category.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Category, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -64,14 +58,7 @@ class SubCategoryFaq(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.sub_category_slug}")
-            slug = base_slug
-
-            count = 1
-            while SubCategoryFaq.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(SubCategoryFaq, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -108,14 +95,7 @@ class SubCategory(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-
-            count = 1
-            while SubCategory.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(SubCategory, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -153,17 +133,7 @@ class Service(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
-            slug = base_slug
-
-            count = 1
-            while Service.objects.filter(slug = slug).exists():
-                if Service.objects.filter(slug = slug).first().pk == self.pk:
-                    break
-
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Service.objects.exclude(pk = self.pk), base_slug)
 
         super().save(*args, **kwargs)
 
@@ -401,14 +371,7 @@ class ServiceDetail(models.Model):
 
         if not self.slug:
             base_slug = slugify(self.service.name)
-            slug = base_slug
-            count = 1
-
-            while ServiceDetail.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(ServiceDetail, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -496,14 +459,7 @@ class Enquiry(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.service.name}-{self.email}")
-            slug = base_slug
-
-            count = 1
-            while Enquiry.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Enquiry, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -531,14 +487,7 @@ class Faq(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.question)
-            slug = base_slug
-
-            count = 1
-            while Faq.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(Faq, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -730,14 +679,7 @@ class TextEditor(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.text_editor_title}")
-            slug = base_slug
-
-            count = 1
-            while TextEditor.objects.filter(slug = slug).exists():
-                slug = f"{base_slug}{count}"
-                count += 1
-
-            self.slug = slug
+            self.slug = allocate_slug(TextEditor, base_slug)
 
         super().save(*args, **kwargs)
 
@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from locations.utils.post_office import can_fork
+
+from .sources import SECTIONS, location_stamps, urls_of
+from .writer import COMPRESSED_SUFFIXES, PAGE_SIZE, ShardWriter, brotli, write_index
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_GLOB = "sitemap-*.xml*"
+MANIFEST_NAME = "manifest.json"
+
+# Bump when the sitemap format changes, so existing manifests are discarded
+MANIFEST_VERSION = 1
+
+
+def sitemap_encodings():
+    """Encodings the sitemaps are precompressed in."""
+    if not settings.SITEMAP_BROTLI:
+        return ("gzip",)
+
+    if brotli is None:
+        logger.warning("SITEMAP_BROTLI is set but the brotli package isn't installed, writing gzip only")
+        return ("gzip",)
+
+    return ("br", "gzip")
+
+
+def plan_partitions(sections=None):
+    """Partitions of `sections` (all of them by default) in sitemap index order."""
+    return [
+        partition
+        for name in (sections or SECTIONS)
+        for partition in SECTIONS[name].partitions()
+    ]
+
+
+def build_partition(sitemap_dir, base, previous, encodings, partition, watermark=None):
+    """Runs in a pool process. Writes the files of `partition` and returns its manifest."""
+    with ShardWriter(sitemap_dir, base, partition.stem, previous=previous, encodings=encodings) as writer:
+        writer.write_all(urls_of(partition))
+
+    return {
+        "stem": partition.stem,
+        "section": partition.section,
+        "watermark": watermark,
+        "count": writer.count,
+        "files": writer.files,
+    }
+
+
+def load_manifest(sitemap_dir, base):
+    """The manifest of the last build, or an empty one when it was made differently."""
+    try:
+        with open(Path(sitemap_dir) / MANIFEST_NAME, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("base") != base or manifest.get("page_size") != PAGE_SIZE:
+        manifest = {}
+
+    return manifest.get("index_sha256"), {partition["stem"]: partition for partition in manifest.get("partitions", [])}
+
+
+def save_manifest(sitemap_dir, base, index_sha256, manifests):
+    path = Path(sitemap_dir) / MANIFEST_NAME
+
+    with open(path.with_suffix(".json.tmp"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": MANIFEST_VERSION, "base": base, "page_size": PAGE_SIZE,
+            "index_sha256": index_sha256, "partitions": manifests,
+        }, f)
+
+    os.replace(path.with_suffix(".json.tmp"), path)
+
+
+def is_current(sitemap_dir, manifest, watermark, encodings):
+    suffixes = [""] + [COMPRESSED_SUFFIXES[encoding] for encoding in encodings]
+    return (
+        manifest is not None
+        and manifest.get("watermark") == watermark
+        and all((Path(sitemap_dir) / f"{file['name']}{suffix}").exists() for file in manifest["files"] for suffix in suffixes)
+    )
+
+
+def remove_stale_files(sitemap_dir, filenames, encodings):
+    """Delete sitemap files left by partitions that no longer exist or got smaller, and copies in unused encodings."""
+    keep = set(filenames)
+    keep.update(name + COMPRESSED_SUFFIXES[encoding] for name in filenames for encoding in encodings)
+
+    for path in Path(sitemap_dir).glob(SITEMAP_GLOB):
+        if path.suffix != ".tmp" and path.name not in keep:
+            path.unlink()
+            logger.info(f"Removed stale sitemap {path.name}")
+
+
+def build_sitemaps(sitemap_dir, base, workers=1, incremental=False):
+    """
+    Build every sitemap partition and the sitemap index from their manifests.
+
+    Partitions share nothing, so with `workers` > 1 they are built on a
+    process pool (when the caller may fork). Each partition's files are
+    the same whichever process writes them, and manifests come back in plan
+    order, so the output doesn't depend on the number of workers.
+
+    The manifests are saved next to the sitemaps with a watermark of the
+    rows each partition was built from. With `incremental`, partitions
+    whose watermark hasn't changed since are kept as they are. Either way,
+    files whose content hash is unchanged are not rewritten. Every file is
+    written gzipped too (and brotli compressed with SITEMAP_BROTLI), for
+    sitemap.views.serve_sitemap.
+    """
+    sitemap_dir = Path(sitemap_dir)
+    encodings = sitemap_encodings()
+    previous_index, previous = load_manifest(sitemap_dir, base)
+    previous_hashes = {
+        file["name"]: file["sha256"] for manifest in previous.values() for file in manifest["files"]
+    }
+
+    partitions = plan_partitions()
+    stamps = location_stamps()
+    # Compared with the watermarks read back from JSON
+    watermarks = [json.loads(json.dumps(SECTIONS[p.section].watermark(p, stamps))) for p in partitions]
+
+    manifests = [None] * len(partitions)
+    pending = []
+    for position, (partition, watermark) in enumerate(zip(partitions, watermarks)):
+        if incremental and is_current(sitemap_dir, previous.get(partition.stem), watermark, encodings):
+            manifests[position] = previous[partition.stem]
+        else:
+            pending.append(position)
+
+    logger.info(f"Building {len(pending)} of {len(partitions)} sitemap partitions")
+    build = partial(build_partition, sitemap_dir, base, previous_hashes, encodings)
+    pending_partitions = [partitions[position] for position in pending]
+    pending_watermarks = [watermarks[position] for position in pending]
+
+    if workers == 1 or len(pending) < 2 or not can_fork():
+        built = map(build, pending_partitions, pending_watermarks)
+    else:
+        # Forked children must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            built = list(executor.map(build, pending_partitions, pending_watermarks))
+
+    for position, manifest in zip(pending, built):
+        manifests[position] = manifest
+
+    files = [file for manifest in manifests for file in manifest["files"]]
+    index_sha256 = write_index(sitemap_dir, base, files, previous_index, encodings)
+    remove_stale_files(sitemap_dir, [file["name"] for file in files], encodings)
+    save_manifest(sitemap_dir, base, index_sha256, manifests)
+
+    return manifests, len(pending)
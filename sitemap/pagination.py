@@ -0,0 +1,252 @@
+import hashlib
+from collections import defaultdict, namedtuple
+
+from django.core.cache import cache
+
+from company.models import Company
+from locations.models import UniquePlace, UniqueDistrict, UniqueState
+
+from .sources import SECTIONS, CHUNK_SIZE
+
+SEGMENT_CACHE_KEY = "sitemap_segment:{}"
+SEGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Segment plan of a section (see SectionPages.plan)
+PLAN_CACHE_KEY = "sitemap_plan:{}"
+
+# Primary keys kept per segment to seek from: one every CHECKPOINT_EVERY rows
+CHECKPOINT_EVERY = 1000
+
+API_COMPANY_PAGES = ["", "about-us", "contact-us", "faqs", "learn"]
+
+
+# A segment of SectionPages: `kind` and `args` are enough to build it again without any query
+SegmentSpec = namedtuple("SegmentSpec", ["key", "kind", "args"])
+
+
+def _url(loc, priority):
+    return {"loc": loc, "changefreq": "weekly", "priority": priority}
+
+
+class Segment:
+    """
+    A run of sitemap urls made from the rows of `queryset`, `per_row` urls
+    per row, in primary key order. Its row count and a primary key every
+    CHECKPOINT_EVERY rows are cached under `key`, so a page is read with
+    pk__gte from the nearest checkpoint and at most CHECKPOINT_EVERY rows
+    skipped, rather than by walking the rows before it.
+    """
+
+    def __init__(self, key, queryset, fields, render, per_row=1):
+        self.key = SEGMENT_CACHE_KEY.format(key)
+        self.queryset = queryset.order_by("pk")
+        self.fields = fields
+        self.render = render
+        self.per_row = per_row
+
+    def rows(self, start, stop, checkpoints):
+        """Rows [start, stop) of the segment."""
+        position = min(start // CHECKPOINT_EVERY, len(checkpoints) - 1) if checkpoints else -1
+
+        queryset = self.queryset
+        skip = start
+        if position >= 0:
+            queryset = queryset.filter(pk__gte=checkpoints[position])
+            skip = start - position * CHECKPOINT_EVERY
+
+        return queryset.values_list(*self.fields)[skip:skip + stop - start]
+
+    def urls(self, start, stop, checkpoints):
+        """Urls [start, stop) of the segment."""
+        first_row, last_row = start // self.per_row, (stop - 1) // self.per_row + 1
+
+        urls = []
+        for row in self.rows(first_row, last_row, checkpoints):
+            urls.extend(self.render(*row))
+
+        offset = start - first_row * self.per_row
+        return urls[offset:offset + stop - start]
+
+    def measure(self):
+        """{"count": urls, "checkpoints": [...]} of the segment, read in one pass over its primary keys."""
+        checkpoints = []
+        rows = 0
+        for rows, pk in enumerate(self.queryset.values_list("pk", flat=True).iterator(chunk_size=CHUNK_SIZE), start=1):
+            if (rows - 1) % CHECKPOINT_EVERY == 0:
+                checkpoints.append(pk)
+
+        return {"count": rows * self.per_row, "checkpoints": checkpoints}
+
+
+class SectionPages:
+    """
+    The sitemap API urls of a CompanySection as a sequence of segments:
+    company pages, categories, subcategories, detail pages, then every
+    multipage followed by its location pages (states, districts and places
+    of its available states). The section's plan (the spec, url count and
+    checkpoints of every segment) is cached under one key, so a page is
+    found without querying the multipages and read from the segments it
+    overlaps only.
+    """
+
+    def __init__(self, section_name):
+        self.section = SECTIONS[section_name]
+        self.key = PLAN_CACHE_KEY.format(self.section.name)
+
+    def specs(self):
+        """SegmentSpec of every segment, in url order."""
+        section = self.section
+        name = section.name
+
+        specs = [
+            SegmentSpec(f"{name}:{kind}", kind, ())
+            for kind in ("companies", "categories", "sub_categories", "details")
+        ]
+
+        multipage_model = section.multipage_model
+        states = defaultdict(list)
+        for multipage_id, state_id in multipage_model.available_states.through.objects.order_by(
+            "multipage_id", "uniquestate_id"
+        ).values_list("multipage_id", "uniquestate_id"):
+            states[multipage_id].append(state_id)
+
+        for multipage_id, company, slug, url_type in multipage_model.objects.order_by("pk").values_list(
+            "id", "company__slug", "slug", "url_type"
+        ):
+            multipage = (multipage_id, company, slug, url_type)
+            specs.append(SegmentSpec(f"{name}:multipage:{multipage_id}", "multipage", multipage))
+
+            if url_type == "location_filtered" or "place_name" in slug:
+                state_ids = tuple(states[multipage_id])
+                # Multipages with the same states share their location counts
+                states_key = hashlib.md5(",".join(map(str, state_ids)).encode()).hexdigest() if state_ids else "all"
+                specs += [
+                    SegmentSpec(f"{level}:{states_key}", level, (state_ids, multipage))
+                    for level in ("states", "districts", "places")
+                ]
+
+        return specs
+
+    def segment(self, spec):
+        """The Segment described by `spec`, built without any query."""
+        section = self.section
+        kind = spec.kind
+
+        if kind == "companies":
+            return Segment(
+                spec.key, Company.objects.filter(type__name=section.company_type), ["slug"],
+                lambda slug: [_url(f"/{slug}/{page}" if page else f"/{slug}/", 1.0) for page in API_COMPANY_PAGES],
+                per_row=len(API_COMPANY_PAGES),
+            )
+
+        if kind == "categories":
+            return Segment(
+                spec.key, section.category_model.objects.all(), ["company__slug", "slug"],
+                lambda company, slug: [_url(f"/{company}/{slug}/", 0.6)],
+            )
+
+        if kind == "sub_categories":
+            return Segment(
+                spec.key, section.sub_category_model.objects.all(),
+                ["company__slug", f"{section.category_parent}__slug", "slug"],
+                lambda company, category, slug: [_url(f"/{company}/{category}/{slug}/", 0.6)],
+            )
+
+        if kind == "details":
+            category_path = f"{section.detail_item}__{section.item_category}"
+            sub_category_path = f"{section.detail_item}__{section.item_sub_category}"
+
+            return Segment(
+                spec.key,
+                # computed_url can't be built without its category
+                section.detail_model.objects.filter(**{
+                    f"{category_path}__isnull": False, f"{sub_category_path}__isnull": False
+                }),
+                ["company__slug", f"{category_path}__slug", f"{sub_category_path}__slug", "slug"],
+                lambda company, category, sub_category, slug: [
+                    _url(f"/{company}/{category}/", 0.9),
+                    _url(f"/{company}/{category}/{sub_category}/", 0.9),
+                    _url(f"/{company}/{category}/{sub_category}/{slug}/", 0.9),
+                ],
+                per_row=3,
+            )
+
+        if kind == "multipage":
+            multipage_id, company, slug, url_type = spec.args
+            return Segment(
+                spec.key, section.multipage_model.objects.filter(pk=multipage_id), ["url_type"],
+                lambda url_type: [_url(
+                    f"/{company}/{slug}/" if url_type == "location_filtered" else f"/{company}/{slug.replace('place_name', 'india')}/",
+                    0.9,
+                )],
+            )
+
+        return self.location_segment(spec)
+
+    def location_segment(self, spec):
+        """Segment of the states, districts or places of a multipage's states (all of them when it has none)."""
+        state_ids, (_, company, slug, url_type) = spec.args
+
+        if url_type == "location_filtered":
+            render = lambda *slugs: [_url(f"/{company}/{slug}/{'/'.join(slugs)}", 0.9)]
+        else:
+            render = lambda *slugs: [_url(f"/{company}/{slug.replace('place_name', slugs[-1])}", 0.9)]
+
+        state_filters = {"pk__in": state_ids} if state_ids else {}
+        filters = {"state__in": state_ids} if state_ids else {}
+
+        if spec.kind == "states":
+            return Segment(spec.key, UniqueState.objects.filter(**state_filters), ["slug"], render)
+        if spec.kind == "districts":
+            return Segment(spec.key, UniqueDistrict.objects.filter(**filters), ["state__slug", "slug"], render)
+        return Segment(spec.key, UniquePlace.objects.filter(**filters), ["state__slug", "district__slug", "slug"], render)
+
+    def measurements(self, segments):
+        """Cached measure() of `segments`, measuring the ones missing from the cache."""
+        keys = [segment.key for segment in segments]
+        cached = cache.get_many(keys)
+
+        missing = {}
+        for segment in segments:
+            if segment.key not in cached and segment.key not in missing:
+                missing[segment.key] = segment.measure()
+
+        if missing:
+            cache.set_many(missing, timeout=SEGMENT_CACHE_TIMEOUT)
+            cached.update(missing)
+
+        return [cached[key] for key in keys]
+
+    def plan(self):
+        """[(spec, count, checkpoints)] of every segment, rebuilt only when its cache key is missing."""
+        plan = cache.get(self.key)
+        if plan is None:
+            specs = self.specs()
+            measurements = self.measurements([self.segment(spec) for spec in specs])
+            plan = [
+                (spec, measurement["count"], measurement["checkpoints"])
+                for spec, measurement in zip(specs, measurements)
+            ]
+            cache.set(self.key, plan, timeout=SEGMENT_CACHE_TIMEOUT)
+
+        return plan
+
+    def count(self):
+        return sum(count for _, count, _ in self.plan())
+
+    def page(self, page, page_size):
+        """Urls of the 1-based `page` of `page_size` urls."""
+        start = (page - 1) * page_size
+        stop = start + page_size
+
+        urls = []
+        offset = 0
+        for spec, count, checkpoints in self.plan():
+            if offset + count > start and count:
+                urls += self.segment(spec).urls(max(start - offset, 0), min(stop - offset, count), checkpoints)
+
+            offset += count
+            if offset >= stop:
+                break
+
+        return urls
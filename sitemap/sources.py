@@ -0,0 +1,323 @@
+from collections import defaultdict, namedtuple
+
+from django.db.models import Count, Max
+
+from product.models import (
+    ProductDetailPage, Category as ProductCategory, SubCategory as ProductSubCategory, MultiPage as ProductMultiPage
+)
+from service.models import (
+    ServiceDetail, Category as ServiceCategory, SubCategory as ServiceSubCategory, MultiPage as ServiceMultiPage
+)
+from registration.models import (
+    RegistrationDetailPage, RegistrationType, RegistrationSubType, MultiPage as RegistrationMultiPage
+)
+from educational.models import (
+    CourseDetail, Program, Specialization, MultiPage as CourseMultiPage
+)
+from custom_pages.models import FAQ
+from blog.models import Blog
+from company.models import Company
+from locations.models import UniqueState
+from locations.models import UniqueDistrict, UniquePlace
+from locations.utils.url import generate_location_url_entries, generate_location_slug_entries
+
+# Rows fetched per round trip by the .iterator() querysets
+CHUNK_SIZE = 2000
+
+# lastmod is the updated time of the row behind the page, None for static pages
+SitemapUrl = namedtuple("SitemapUrl", ["loc", "changefreq", "priority", "lastmod"], defaults=[None])
+
+# One independently built run of sitemap files: {stem}.xml, {stem}-1.xml, ...
+# holding the urls of SECTIONS[section].<method>(*args)
+Partition = namedtuple("Partition", ["stem", "section", "method", "args"])
+
+STATIC_PAGES = [
+    ("/", "daily", 1.0),
+    ("/about-us", "monthly", 0.8),
+    ("/contact-us", "monthly", 0.8),
+    ("/faqs", "monthly", 0.8),
+    ("/learn", "monthly", 0.8),
+    ("/privacy-policy", "monthly", 0.8),
+    ("/terms-conditions", "monthly", 0.8),
+    ("/shipping-delivery-policy", "monthly", 0.8),
+    ("/cancellation-refund-policy", "monthly", 0.8),
+    ("/services", "monthly", 0.8),
+    ("/products", "monthly", 0.8),
+    ("/courses", "monthly", 0.8),
+    ("/registrations", "monthly", 0.8),
+]
+
+COMPANY_PAGES = ["", "about-us", "contact-us", "faqs", "learn"]
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def stamp(queryset):
+    """[row count, latest updated] of `queryset`: any row added, edited or deleted changes it."""
+    aggregate = queryset.order_by().aggregate(count=Count("pk"), latest=Max("updated"))
+    return [aggregate["count"], _isoformat(aggregate["latest"])]
+
+
+def location_stamps():
+    """Stamps of the states, districts and places of each state, by state id, in three grouped queries."""
+    stamps = defaultdict(lambda: [[0, None], [0, None], [0, None]])
+
+    for position, (model, field) in enumerate([(UniqueState, "id"), (UniqueDistrict, "state_id"), (UniquePlace, "state_id")]):
+        for state_id, count, latest in model.objects.order_by().values_list(field).annotate(Count("pk"), Max("updated")):
+            stamps[state_id][position] = [count, _isoformat(latest)]
+
+    return stamps
+
+
+def latest(*values):
+    return max((value for value in values if value), default=None)
+
+
+class BzindiaSection:
+    name = "bzindia"
+
+    def urls(self):
+        for loc, changefreq, priority in STATIC_PAGES:
+            yield SitemapUrl(loc, changefreq, priority)
+
+        for slug, updated in FAQ.objects.filter(company__isnull = True).order_by("pk").values_list(
+            "slug", "updated"
+        ).iterator(chunk_size=CHUNK_SIZE):
+            yield SitemapUrl(f"/faqs/{slug}/", "weekly", 1.0, updated)
+
+        for slug, updated in Blog.objects.filter(company__isnull = True).order_by("pk").values_list(
+            "slug", "updated"
+        ).iterator(chunk_size=CHUNK_SIZE):
+            yield SitemapUrl(f"/learn/{slug}/", "weekly", 1.0, updated)
+
+    def partitions(self):
+        yield Partition(f"sitemap-{self.name}", self.name, "urls", ())
+
+    def watermark(self, partition, stamps):
+        return [stamp(FAQ.objects.filter(company__isnull = True)), stamp(Blog.objects.filter(company__isnull = True))]
+
+
+class IndiaSection:
+    name = "india"
+
+    def root_urls(self):
+        yield SitemapUrl("/state-list-in-india/", "monthly", 0.8)
+
+    def state_urls(self, state_id):
+        for tail, updated in generate_location_url_entries(state_ids=[state_id]):
+            yield SitemapUrl(f"/state-list-in-india{tail}/", "monthly", 0.8, updated)
+
+    def partitions(self):
+        yield Partition(f"sitemap-{self.name}", self.name, "root_urls", ())
+
+        for state_id in UniqueState.objects.order_by("pk").values_list("id", flat=True):
+            yield Partition(f"sitemap-{self.name}-s{state_id}", self.name, "state_urls", (state_id,))
+
+    def watermark(self, partition, stamps):
+        if partition.method == "state_urls":
+            return stamps[partition.args[0]]
+        return []
+
+    def urls(self):
+        yield from urls_of_partitions(self.partitions())
+
+
+class CompanySection:
+    """
+    The pages of the companies of one type: their own pages, FAQs and blogs,
+    categories, subcategories, detail pages and multipages. Each model's
+    rows are streamed with .iterator(), so urls() yields in constant memory.
+
+    partitions() splits the section into its base pages and one partition
+    per multipage and state (per multipage for place_name slugs, whose
+    place slugs are deduplicated across states). watermark() stamps the rows
+    a partition is built from, so unchanged partitions can be skipped.
+
+    `category_parent` is the subcategory's foreign key to its category, and
+    `detail_item`, `item_category` and `item_sub_category` the path from a
+    detail page to the slugs in its computed_url.
+    """
+
+    def __init__(
+        self, name, company_type, listing, category_model, sub_category_model, category_parent,
+        detail_model, detail_item, item_category, item_sub_category, multipage_model
+    ):
+        self.name = name
+        self.company_type = company_type
+        self.listing = listing
+        self.category_model = category_model
+        self.sub_category_model = sub_category_model
+        self.category_parent = category_parent
+        self.detail_model = detail_model
+        self.detail_item = detail_item
+        self.item_category = item_category
+        self.item_sub_category = item_sub_category
+        self.multipage_model = multipage_model
+
+    def companies(self):
+        return Company.objects.filter(type__name=self.company_type)
+
+    def company_urls(self):
+        for slug, updated in self.companies().order_by("pk").values_list("slug", "updated").iterator(chunk_size=CHUNK_SIZE):
+            for page in COMPANY_PAGES + [self.listing]:
+                yield SitemapUrl(f"/{slug}/{page}" if page else f"/{slug}/", "weekly", 1.0, updated)
+
+            for faq_slug, faq_updated in FAQ.objects.filter(company__slug = slug).order_by("pk").values_list("slug", "updated"):
+                yield SitemapUrl(f"/{slug}/faqs/{faq_slug}/", "weekly", 1.0, faq_updated)
+
+            for blog_slug, blog_updated in Blog.objects.filter(company__slug = slug).order_by("pk").values_list("slug", "updated"):
+                yield SitemapUrl(f"/{slug}/learn/{blog_slug}/", "weekly", 1.0, blog_updated)
+
+    def category_urls(self):
+        for company, slug, updated in self.category_model.objects.order_by("pk").values_list(
+            "company__slug", "slug", "updated"
+        ).iterator(chunk_size=CHUNK_SIZE):
+            yield SitemapUrl(f"/{company}/{slug}/", "weekly", 0.6, updated)
+
+        for company, category, slug, updated in self.sub_category_model.objects.order_by("pk").values_list(
+            "company__slug", f"{self.category_parent}__slug", "slug", "updated"
+        ).iterator(chunk_size=CHUNK_SIZE):
+            yield SitemapUrl(f"/{company}/{category}/{slug}/", "weekly", 0.6, updated)
+
+    def detail_urls(self):
+        category_path = f"{self.detail_item}__{self.item_category}"
+        sub_category_path = f"{self.detail_item}__{self.item_sub_category}"
+
+        for company, category, category_updated, sub_category, sub_category_updated, slug, updated in self.detail_model.objects.order_by(
+            "pk"
+        ).values_list(
+            "company__slug", f"{category_path}__slug", f"{category_path}__updated",
+            f"{sub_category_path}__slug", f"{sub_category_path}__updated", "slug", "updated"
+        ).iterator(chunk_size=CHUNK_SIZE):
+            # computed_url can't be built without its category
+            if category is None or sub_category is None:
+                continue
+
+            yield SitemapUrl(f"/{company}/{category}/", "weekly", 0.9, category_updated)
+            yield SitemapUrl(f"/{company}/{category}/{sub_category}/", "weekly", 0.9, sub_category_updated)
+            yield SitemapUrl(f"/{company}/{category}/{sub_category}/{slug}/", "weekly", 0.9, updated)
+
+    def multipages(self):
+        return self.multipage_model.objects.order_by("pk").values_list("id", "company__slug", "slug", "url_type", "updated")
+
+    def multipage(self, multipage_id):
+        return self.multipage_model.objects.filter(pk=multipage_id).values_list("company__slug", "slug", "updated").get()
+
+    def multipage_root_urls(self):
+        for _, company, slug, url_type, updated in self.multipages().iterator(chunk_size=CHUNK_SIZE):
+            if url_type == "location_filtered":
+                yield SitemapUrl(f"/{company}/{slug}/", "weekly", 0.9, updated)
+            elif "place_name" in slug:
+                yield SitemapUrl(f"/{company}/{slug.replace('place_name', 'india')}/", "weekly", 0.9, updated)
+
+    def base_urls(self):
+        yield from self.company_urls()
+        yield from self.category_urls()
+        yield from self.detail_urls()
+        yield from self.multipage_root_urls()
+
+    def state_ids(self, multipage_id):
+        # No available states means every state
+        return list(
+            self.multipage_model.available_states.through.objects.filter(multipage_id=multipage_id).order_by(
+                "uniquestate_id"
+            ).values_list("uniquestate_id", flat=True)
+        )
+
+    def multipage_state_urls(self, multipage_id, state_id):
+        company, slug, multipage_updated = self.multipage(multipage_id)
+
+        for tail, updated in generate_location_url_entries(state_ids=[state_id]):
+            yield SitemapUrl(f"/{company}/{slug}{tail}", "weekly", 0.9, latest(multipage_updated, updated))
+
+    def multipage_slug_urls(self, multipage_id):
+        company, slug, multipage_updated = self.multipage(multipage_id)
+
+        for place_slug, updated in generate_location_slug_entries(state_ids=self.state_ids(multipage_id)):
+            yield SitemapUrl(f"/{company}/{slug.replace('place_name', place_slug)}", "weekly", 0.9, latest(multipage_updated, updated))
+
+    def watermark(self, partition, stamps):
+        if partition.method == "base_urls":
+            item_model = self.detail_model._meta.get_field(self.detail_item).related_model
+            return [
+                stamp(self.companies()),
+                stamp(FAQ.objects.filter(company__type__name=self.company_type)),
+                stamp(Blog.objects.filter(company__type__name=self.company_type)),
+                stamp(self.category_model.objects.all()),
+                stamp(self.sub_category_model.objects.all()),
+                stamp(item_model.objects.all()),
+                stamp(self.detail_model.objects.all()),
+                stamp(self.multipage_model.objects.all()),
+            ]
+
+        multipage_id = partition.args[0]
+        multipage = [
+            _isoformat(updated)
+            for updated in self.multipage_model.objects.filter(pk=multipage_id).values_list("updated", "company__updated").get()
+        ]
+
+        if partition.method == "multipage_state_urls":
+            return [multipage, stamps[partition.args[1]]]
+
+        state_ids = self.state_ids(multipage_id)
+        return [multipage, state_ids, [stamps[state_id] for state_id in state_ids or sorted(stamps)]]
+
+    def partitions(self):
+        stem = f"sitemap-{self.name}"
+        yield Partition(stem, self.name, "base_urls", ())
+
+        all_states = None
+        for multipage_id, _, slug, url_type in self.multipages():
+            if url_type == "location_filtered":
+                state_ids = self.state_ids(multipage_id)
+                if not state_ids:
+                    if all_states is None:
+                        all_states = list(UniqueState.objects.order_by("pk").values_list("id", flat=True))
+                    state_ids = all_states
+
+                for state_id in state_ids:
+                    yield Partition(
+                        f"{stem}-mp{multipage_id}-s{state_id}", self.name, "multipage_state_urls", (multipage_id, state_id)
+                    )
+
+            elif "place_name" in slug:
+                yield Partition(f"{stem}-mp{multipage_id}", self.name, "multipage_slug_urls", (multipage_id,))
+
+    def urls(self):
+        yield from urls_of_partitions(self.partitions())
+
+
+COMPANY_SECTIONS = [
+    CompanySection(
+        "products", "Product", "products", ProductCategory, ProductSubCategory, "category",
+        ProductDetailPage, "product", "category", "sub_category", ProductMultiPage
+    ),
+    CompanySection(
+        "registrations", "Registration", "registrations", RegistrationType, RegistrationSubType, "type",
+        RegistrationDetailPage, "registration", "registration_type", "sub_type", RegistrationMultiPage
+    ),
+    CompanySection(
+        "courses", "Education", "courses", Program, Specialization, "program",
+        CourseDetail, "course", "program", "specialization", CourseMultiPage
+    ),
+    CompanySection(
+        "services", "Service", "more-services", ServiceCategory, ServiceSubCategory, "category",
+        ServiceDetail, "service", "category", "sub_category", ServiceMultiPage
+    ),
+]
+
+SECTIONS = {
+    section.name: section
+    for section in [BzindiaSection(), *COMPANY_SECTIONS, IndiaSection()]
+}
+
+
+def urls_of(partition):
+    return getattr(SECTIONS[partition.section], partition.method)(*partition.args)
+
+
+def urls_of_partitions(partitions):
+    for partition in partitions:
+        yield from urls_of(partition)
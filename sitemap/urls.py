@@ -1,5 +1,8 @@
 from django.urls import path
-from .views import sitemap_urls, product_sitemap_urls, product_sitemap_count
+from .views import (
+    sitemap_urls, product_sitemap_urls, product_sitemap_count, service_sitemap_urls, service_sitemap_count,
+    registration_sitemap_urls, registration_sitemap_count, course_sitemap_urls, course_sitemap_count
+)
 
 app_name="sitemap"
 
@@ -7,4 +10,10 @@ urlpatterns = [
     path("", sitemap_urls, name="sitemap"),
     path("products/", product_sitemap_urls, name="products"),
     path("product_count/", product_sitemap_count, name="product_count"),
+    path("services/", service_sitemap_urls, name="services"),
+    path("service_count/", service_sitemap_count, name="service_count"),
+    path("registrations/", registration_sitemap_urls, name="registrations"),
+    path("registration_count/", registration_sitemap_count, name="registration_count"),
+    path("courses/", course_sitemap_urls, name="courses"),
+    path("course_count/", course_sitemap_count, name="course_count"),
 ]
@@ -1,143 +1,70 @@
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from product.models import ProductDetailPage, Category as ProductCategory, SubCategory as ProductSubCategory, MultiPage as ProductMultiPage
+from product.models import ProductDetailPage, Category as ProductCategory, SubCategory as ProductSubCategory
 from service.models import ServiceDetail, Category as ServiceCategory, SubCategory as ServiceSubCategory
 from registration.models import RegistrationDetailPage, RegistrationType, RegistrationSubType
 from educational.models import CourseDetail, Program, Specialization
 from blog.models import Blog
 from company.models import Company
 from base.models import MetaTag
-from locations.models import UniquePlace, UniqueDistrict, UniqueState
 
-def generate_location_url_tails():
-    for slug in UniqueState.objects.values_list("slug", flat=True).iterator():
-        yield f"/{slug}"
+from .pagination import SectionPages
+
+# Largest page the paginated sitemap APIs return
+MAX_API_PAGE_SIZE = 10000
 
-    for state, slug in UniqueDistrict.objects.values_list("state__slug", "slug").iterator():
-        yield f"/{state}/{slug}"
 
-    for state, district, slug in UniquePlace.objects.values_list(
-        "state__slug", "district__slug", "slug"
-    ).iterator():
-        yield f"/{state}/{district}/{slug}"
+def paginated_sitemap_urls(request, section):
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+        page_size = min(max(int(request.GET.get("page_size", 2000)), 1), MAX_API_PAGE_SIZE)
+    except ValueError:
+        return Response({"detail": "page and page_size must be integers."}, status=400)
 
-def generate_location_url_slugs():
-    for slug in UniqueState.objects.values_list("slug", flat=True).iterator():
-        yield slug
+    return Response(SectionPages(section).page(page, page_size))
 
-    for slug in UniqueDistrict.objects.values_list("slug", flat=True).iterator():
-        yield slug
 
-    for slug in UniquePlace.objects.values_list("slug", flat=True).iterator():
-        yield slug
+def paginated_sitemap_count(request, section):
+    return Response({"total_urls": SectionPages(section).count()})
 
 @api_view(["GET"])
 def product_sitemap_count(request):
-    total_places = UniquePlace.objects.count()
-    url_tails_count = total_places * 4
-    url_place_count = total_places * 2
-
-    company_urls = Company.objects.filter(type__name="Product").count() * 5
-    category_urls = ProductCategory.objects.count()
-    sub_category_urls = ProductSubCategory.objects.count()
-    detail_page_urls = ProductDetailPage.objects.count() * 3
-    multi_location_urls = ProductMultiPage.objects.filter(url_type = "location_filtered").count() * url_tails_count
-    multi_slug_urls = ProductMultiPage.objects.filter(url_type = "slug_filtered").count() * url_place_count
-
-    total_urls = company_urls + category_urls + sub_category_urls + detail_page_urls + multi_location_urls + multi_slug_urls
-
-    return Response({"total_urls": total_urls})
+    return paginated_sitemap_count(request, "products")
 
 @api_view(["GET"])
 def product_sitemap_urls(request):
-    page = int(request.GET.get("page", 1))
-    page_size = int(request.GET.get("page_size", 2000))
-
-    if page_size:
-        page_size = 2000
-
-    urls = []
-
-    # 🔹 Companies of type Product
-    for c in Company.objects.filter(type__name="Product").values("slug"):
-        urls.extend([
-            {"loc": f"/{c['slug']}/", "changefreq": "weekly", "priority": 1.0},
-            {"loc": f"/{c['slug']}/about-us", "changefreq": "weekly", "priority": 1.0},
-            {"loc": f"/{c['slug']}/contact-us", "changefreq": "weekly", "priority": 1.0},
-            {"loc": f"/{c['slug']}/faqs", "changefreq": "weekly", "priority": 1.0},
-            {"loc": f"/{c['slug']}/learn", "changefreq": "weekly", "priority": 1.0},
-        ])
-
-    # 🔹 Product categories
-    for category in ProductCategory.objects.values("company__slug", "slug"):
-        urls.append({"loc": f"/{category['company__slug']}/{category['slug']}/", "changefreq": "weekly", "priority": 0.6})
-
-    # 🔹 Product subcategories
-    for sub_category in ProductSubCategory.objects.values("company__slug", "category__slug", "slug"):
-        urls.append({"loc": f"/{sub_category['company__slug']}/{sub_category['category__slug']}/{sub_category['slug']}/", "changefreq": "weekly", "priority": 0.6})
-
-    # 🔹 Product detail pages
-    for p in ProductDetailPage.objects.select_related("company", "product__category", "product__sub_category"):
-        urls.extend([
-            {"loc": f"/{p.company.slug}/{p.product.category.slug}/", "changefreq": "weekly", "priority": 0.9},
-            {"loc": f"/{p.company.slug}/{p.product.category.slug}/{p.product.sub_category.slug}/", "changefreq": "weekly", "priority": 0.9},
-            {"loc": f"/{p.computed_url}/", "changefreq": "weekly", "priority": 0.9},
-        ])
-
-    for p in ProductMultiPage.objects.select_related("company"):
-        if p.url_type == "location_filtered":
-            url_tails = generate_location_url_tails()
-
-            multi_location_urls = [
-                {
-                    "loc": f"/{p.company.slug}/{p.slug}{tail}",
-                    "changefreq": "weekly",
-                    "priority": 0.9,
-                }
-                for tail in url_tails
-            ]
-
-            # Add the base URL
-            urls.append(
-                {
-                    "loc": f"/{p.company.slug}/{p.slug}/",
-                    "changefreq": "weekly",
-                    "priority": 0.9,
-                }
-            )
-
-            urls.extend(multi_location_urls)
+    return paginated_sitemap_urls(request, "products")
 
-        else:
-
-            place_slugs = generate_location_url_slugs()
-
-            multi_slug_urls = [
-                {
-                    "loc": f"/{p.company.slug}/{p.slug.replace('place_name', place_slug)}",
-                    "changefreq": "weekly",
-                    "priority": 0.9,
-                }
-                for place_slug in place_slugs
-            ]
+@api_view(["GET"])
+def service_sitemap_count(request):
+    return paginated_sitemap_count(request, "services")
 
-            urls.append(
-                {
-                    "loc": f"/{p.company.slug}/{p.slug.replace('place_name', 'india')}/",
-                    "changefreq": "weekly",
-                    "priority": 0.9,
-                }
-            )
+@api_view(["GET"])
+def service_sitemap_urls(request):
+    return paginated_sitemap_urls(request, "services")
 
-            urls.extend(multi_slug_urls)
+@api_view(["GET"])
+def registration_sitemap_count(request):
+    return paginated_sitemap_count(request, "registrations")
 
+@api_view(["GET"])
+def registration_sitemap_urls(request):
+    return paginated_sitemap_urls(request, "registrations")
 
-    # 🔹 Paginate URLs
-    start = (page - 1) * page_size
-    end = start + page_size
-    paginated_urls = urls[start:end]
+@api_view(["GET"])
+def course_sitemap_count(request):
+    return paginated_sitemap_count(request, "courses")
 
-    return Response(paginated_urls)
+@api_view(["GET"])
+def course_sitemap_urls(request):
+    return paginated_sitemap_urls(request, "courses")
 
 
 @api_view(["GET"])
@@ -238,23 +165,94 @@ def sitemap_urls(request):
     return Response(urls)
 
 
+SITEMAP_CONTENT_TYPE = "application/xml; charset=utf-8"
 
-@api_view(["GET"])
-def service_sitemap_urls(request):
-    urls = []
+# Precompressed copies written by sitemap.writer, most preferred first
+SITEMAP_ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
 
-    for c in Company.objects.filter(type__name = "Service").values("slug"):
-        urls.append({"loc": f"/{c['slug']}/", "changefreq": "weekly", "priority": 1.0})
-        urls.append({"loc": f"/{c['slug']}/about-us", "changefreq": "weekly", "priority": 1.0})
-        urls.append({"loc": f"/{c['slug']}/contact-us", "changefreq": "weekly", "priority": 1.0})
-        urls.append({"loc": f"/{c['slug']}/faqs", "changefreq": "weekly", "priority": 1.0})
-        urls.append({"loc": f"/{c['slug']}/learn", "changefreq": "weekly", "priority": 1.0})
 
-    for category in ServiceCategory.objects.values("company__slug", "slug"):
-        urls.append({"loc": f"/{category['company__slug']}/{category['slug']}/", "changefreq": "weekly", "priority": 0.6})
+def accepted_encodings(header):
+    """Content codings of an Accept-Encoding header mapped to their q-value."""
+    accepted = {}
+    for part in header.split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
 
-    for sub_category in ServiceSubCategory.objects.values("company__slug", "category__slug", "slug"):
-        urls.append({"loc": f"/{sub_category['company__slug']}/{sub_category['category__slug']}/{sub_category['slug']}/", "changefreq": "weekly", "priority": 0.6})
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
 
-    for s in ServiceDetail.objects.select_related("company", "service__category", "service__sub_category"):
-        urls.append({"loc": f"/{s.computed_url}/", "changefreq": "weekly", "priority": 0.9})
\ No newline at end of file
+        accepted[coding] = quality
+
+    return accepted
+
+
+def negotiate_sitemap(path, accept_encoding):
+    """(path, content coding, stat) of the best copy of `path` the client accepts, stat()ed but not opened."""
+    accepted = accepted_encodings(accept_encoding)
+
+    for encoding, suffix in SITEMAP_ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0)) <= 0:
+            continue
+
+        compressed = path.with_name(path.name + suffix)
+        try:
+            return compressed, encoding, os.stat(compressed)
+        except FileNotFoundError:
+            continue
+
+    try:
+        return path, None, os.stat(path)
+    except FileNotFoundError:
+        raise Http404("Sitemap not found")
+
+
+def sitemap_etag(stat, encoding):
+    # Files are only ever replaced whole, and left alone when their content is unchanged
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+
+
+def is_not_modified(request, etag, modified):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        # Weak comparison, as for any GET
+        candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return if_modified_since is not None and int(modified) <= if_modified_since
+
+
+@require_safe
+def serve_sitemap(request, name):
+    """
+    Serve a generated sitemap from SITEMAP_ROOT, in the precompressed copy
+    matching the client's Accept-Encoding. Conditional requests are
+    answered from the file's stat() alone, without opening it.
+    """
+    path, encoding, stat = negotiate_sitemap(Path(settings.SITEMAP_ROOT) / Path(name).name, request.headers.get("Accept-Encoding", ""))
+
+    headers = {
+        "ETag": sitemap_etag(stat, encoding),
+        "Last-Modified": http_date(stat.st_mtime),
+        "Vary": "Accept-Encoding",
+        "Cache-Control": f"public, max-age={settings.SITEMAP_CACHE_SECONDS}",
+    }
+
+    if is_not_modified(request, headers["ETag"], stat.st_mtime):
+        return HttpResponseNotModified(headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    if request.method == "HEAD":
+        return HttpResponse(content_type=SITEMAP_CONTENT_TYPE, headers={**headers, "Content-Length": str(stat.st_size)})
+
+    return FileResponse(open(path, "rb"), filename=Path(name).name, content_type=SITEMAP_CONTENT_TYPE, headers=headers)
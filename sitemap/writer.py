@@ -0,0 +1,242 @@
+import gzip
+import hashlib
+import os
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# URLs per sitemap file (the protocol allows up to 50,000)
+PAGE_SIZE = 10000
+
+# Rendered <url> entries joined into each write
+WRITE_BATCH = 1000
+
+URLSET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+URLSET_FOOTER = "</urlset>\n"
+
+URL_ENTRY = (
+    "  <url>\n"
+    "    <loc>{base}{loc}</loc>\n"
+    "    <lastmod>{lastmod}</lastmod>\n"
+    "    <changefreq>{changefreq}</changefreq>\n"
+    "    <priority>{priority}</priority>\n"
+    "  </url>\n"
+)
+
+# Static pages have no row to take a lastmod from
+URL_ENTRY_NO_LASTMOD = (
+    "  <url>\n"
+    "    <loc>{base}{loc}</loc>\n"
+    "    <changefreq>{changefreq}</changefreq>\n"
+    "    <priority>{priority}</priority>\n"
+    "  </url>\n"
+)
+
+
+# Content-Encoding of each precompressed copy, by file suffix
+COMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def format_lastmod(value):
+    return value.replace(microsecond=0).isoformat()
+
+
+def _temporary(path):
+    return path.with_name(f"{path.name}.tmp")
+
+
+class SitemapFile:
+    """
+    One sitemap file and its precompressed copies (`encodings`, see
+    COMPRESSED_SUFFIXES), written together under temporary names. gzip
+    copies are made without a timestamp, so equal content gives equal bytes.
+    """
+
+    def __init__(self, path: Path, encodings=("gzip",)):
+        self.path = path
+        self.digest = hashlib.sha256()
+        self.paths = [path] + [path.with_name(path.name + COMPRESSED_SUFFIXES[encoding]) for encoding in encodings]
+
+        self.outputs = []
+        for output_path, encoding in zip(self.paths, (None, *encodings)):
+            raw = open(_temporary(output_path), "wb")
+
+            if encoding == "gzip":
+                stream = gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0)
+                self.outputs.append((stream.write, [stream.close, raw.close]))
+            elif encoding == "br":
+                compressor = brotli.Compressor(mode=brotli.MODE_TEXT)
+                self.outputs.append((
+                    lambda data, raw=raw, compressor=compressor: raw.write(compressor.process(data)),
+                    [lambda raw=raw, compressor=compressor: raw.write(compressor.finish()), raw.close],
+                ))
+            else:
+                self.outputs.append((raw.write, [raw.close]))
+
+    def write(self, data: bytes):
+        self.digest.update(data)
+        for write, _ in self.outputs:
+            write(data)
+
+    def _close(self):
+        for _, closers in self.outputs:
+            for close in closers:
+                close()
+        self.outputs = []
+
+    def commit(self, previous_sha256=None):
+        """Move the files into place, unless they already hold this content. Returns the sha256."""
+        self._close()
+        sha256 = self.digest.hexdigest()
+
+        unchanged = previous_sha256 == sha256 and all(path.exists() for path in self.paths)
+        # The uncompressed file last, so that it is never newer than its copies
+        for path in reversed(self.paths):
+            if unchanged:
+                os.remove(_temporary(path))
+            else:
+                os.replace(_temporary(path), path)
+
+        return sha256
+
+    def discard(self):
+        self._close()
+        for path in self.paths:
+            os.remove(_temporary(path))
+
+
+class ShardWriter:
+    """
+    Writes a stream of SitemapUrls to {stem}.xml, {stem}-1.xml, ... in
+    `sitemap_dir`, starting a new file every `page_size` urls, so only the
+    file being written is open and nothing is accumulated. Entries are
+    rendered into batches of WRITE_BATCH written at once, and files are
+    written under a temporary name and moved into place when complete.
+
+    Each url carries its own lastmod, and a file's lastmod is the latest of
+    its urls. `previous` maps file names to the sha256 they were last
+    written with; a file whose content hasn't changed is left untouched, so
+    its modification time still says when it last changed. Every file is
+    also written compressed in each of `encodings`.
+
+        with ShardWriter(sitemap_dir, base, "sitemap-products") as writer:
+            writer.write_all(urls)
+        writer.files  # [{"name": "sitemap-products.xml", "count": 10000, "sha256": ..., "lastmod": ...}, ...]
+    """
+
+    def __init__(self, sitemap_dir: Path, base: str, stem: str, page_size=PAGE_SIZE, previous=None, encodings=("gzip",)):
+        self.sitemap_dir = Path(sitemap_dir)
+        self.base = base.rstrip("/")
+        self.stem = stem
+        self.page_size = page_size
+        self.previous = previous or {}
+        self.encodings = encodings
+
+        self.files: list[dict] = []
+        self.count = 0
+        self.file = None
+        self.lastmod = None
+        self.pending: list[str] = []
+
+    @property
+    def filenames(self):
+        return [file["name"] for file in self.files]
+
+    def _write(self, text):
+        self.file.write(text.encode("utf-8"))
+
+    def _flush(self):
+        if self.pending:
+            self._write("".join(self.pending))
+            self.pending.clear()
+
+    def open_next(self):
+        self.close_file()
+
+        page = len(self.files)
+        filename = f"{self.stem}.xml" if page == 0 else f"{self.stem}-{page}.xml"
+        self.files.append({"name": filename, "count": 0, "sha256": None, "lastmod": None})
+
+        self.sitemap_dir.mkdir(parents=True, exist_ok=True)
+        self.file = SitemapFile(self.sitemap_dir / filename, self.encodings)
+        self.lastmod = None
+        self._write(URLSET_HEADER)
+
+    def close_file(self):
+        if self.file is None:
+            return
+
+        self._flush()
+        self._write(URLSET_FOOTER)
+
+        current = self.files[-1]
+        current["sha256"] = self.file.commit(self.previous.get(current["name"]))
+        current["lastmod"] = format_lastmod(self.lastmod) if self.lastmod else None
+        self.file = None
+
+    def write(self, url):
+        if self.file is None or self.files[-1]["count"] >= self.page_size:
+            self.open_next()
+
+        if url.lastmod:
+            self.pending.append(URL_ENTRY.format(
+                base=self.base, loc=url.loc, lastmod=format_lastmod(url.lastmod), changefreq=url.changefreq, priority=url.priority
+            ))
+            if self.lastmod is None or url.lastmod > self.lastmod:
+                self.lastmod = url.lastmod
+        else:
+            self.pending.append(URL_ENTRY_NO_LASTMOD.format(
+                base=self.base, loc=url.loc, changefreq=url.changefreq, priority=url.priority
+            ))
+        if len(self.pending) >= WRITE_BATCH:
+            self._flush()
+
+        self.files[-1]["count"] += 1
+        self.count += 1
+
+    def write_all(self, urls):
+        for url in urls:
+            self.write(url)
+        return self.count
+
+    def close(self):
+        self.close_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.file is not None:
+            # Leave the last complete files in place
+            self.file.discard()
+            self.file = None
+
+
+def write_index(sitemap_dir: Path, base: str, files: list[dict], previous_sha256=None, encodings=("gzip",)) -> str:
+    """Write sitemap_index.xml listing `files`, the ShardWriter.files of every partition. Returns its sha256."""
+    base = base.rstrip("/")
+
+    # IMPORTANT: always public base here
+    entries = "".join(
+        f"  <sitemap>\n    <loc>{base}/{file['name']}</loc>\n    <lastmod>{file['lastmod']}</lastmod>\n  </sitemap>\n"
+        if file["lastmod"] else
+        f"  <sitemap>\n    <loc>{base}/{file['name']}</loc>\n  </sitemap>\n"
+        for file in files
+    )
+
+    index = SitemapFile(Path(sitemap_dir) / "sitemap_index.xml", encodings)
+    index.write((
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        f"{entries}</sitemapindex>\n"
+    ).encode("utf-8"))
+
+    return index.commit(previous_sha256)
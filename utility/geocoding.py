@@ -0,0 +1,258 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+OPENCAGE_URL = "https://api.opencagedata.com/geocode/v1/json"
+
+# "12.3,45.6", "12.3+45.6" and "12.3 45.6" are the same coordinate query
+COORDINATE_QUERY = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*[,+\s]\s*(-?\d+(?:\.\d+)?)\s*$")
+
+# Sets between two checks of the total store size
+EVICTION_CHECK_INTERVAL = 100
+
+# Hits refresh an entry's last access time at most this often (seconds)
+ACCESS_RESOLUTION = 60 * 60
+
+
+def compress_response(data):
+    """zlib-compressed compact JSON of a stored API response."""
+    return zlib.compress(json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), 6)
+
+
+def decompress_response(blob):
+    return json.loads(zlib.decompress(bytes(blob)))
+
+
+def extract_response_fields(data):
+    """Fields of the first result of an OpenCage response that are kept in their own columns."""
+    results = (data or {}).get("results") or []
+    first_result = results[0] if results else {}
+
+    components = first_result.get("components", {})
+    geometry = first_result.get("geometry", {})
+    postcode = components.get("postcode")
+
+    return {
+        "formatted": first_result.get("formatted"),
+        "country": components.get("country"),
+        "state": components.get("state"),
+        "district": components.get("state_district"),
+        "city": components.get("city"),
+        "town": components.get("town"),
+        "village": components.get("village"),
+        "suburb": components.get("suburb"),
+        "postcode": str(postcode) if postcode is not None else None,
+        "latitude": geometry.get("lat"),
+        "longitude": geometry.get("lng"),
+        "confidence": first_result.get("confidence"),
+    }
+
+
+def normalize_query(query):
+    """Canonical form of a geocoding query, used as the cache key."""
+    query = str(query)
+
+    match = COORDINATE_QUERY.match(query)
+    if match:
+        return f"{float(match[1]):.6f},{float(match[2]):.6f}"
+
+    return ",".join(" ".join(part.split()) for part in query.lower().split(","))
+
+
+class GeocodeCache:
+    """
+    Persistent store of geocoding API responses.
+
+    Each response is gzip-compressed JSON in a file named after the SHA-256
+    of its normalized query. A SQLite index beside the files records each
+    entry's size and timestamps: entries older than `ttl` seconds are
+    misses, and once the store grows past `max_bytes` the least recently
+    used entries are evicted.
+    """
+
+    def __init__(self, directory, ttl, max_bytes):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self._local = threading.local()
+        self._sets = 0
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        # Connections are not shared across threads or forked processes
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            connection = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, query TEXT, size INTEGER, created REAL, accessed REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            connection.commit()
+
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    def get(self, query):
+        normalized = normalize_query(query)
+        key = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        now = time.time()
+
+        connection = self._connection()
+        row = connection.execute("SELECT created, accessed FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        created, accessed = row
+        try:
+            if now - created > self.ttl:
+                raise FileNotFoundError
+
+            with open(self._path(key), "rb") as f:
+                data = json.loads(gzip.decompress(f.read()))
+        except (OSError, ValueError):
+            self._delete(connection, [key])
+            return None
+
+        if now - accessed > ACCESS_RESOLUTION:
+            with connection:
+                connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+
+        return data
+
+    def set(self, query, data):
+        normalized = normalize_query(query)
+        key = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        now = time.time()
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        content = gzip.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, query, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, normalized, len(content), now, now)
+            )
+
+        self._sets += 1
+        if self._sets % EVICTION_CHECK_INTERVAL == 0:
+            self.evict()
+
+    def _delete(self, connection, keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+        with connection:
+            connection.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in keys])
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the store fits max_bytes."""
+        connection = self._connection()
+
+        expired = [key for key, in connection.execute(
+            "SELECT key FROM entries WHERE created < ?", (time.time() - self.ttl,)
+        )]
+        if expired:
+            self._delete(connection, expired)
+
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Free a tenth more than needed so eviction doesn't run on every check
+        excess = total - self.max_bytes * 0.9
+        evicting = []
+        for key, size in connection.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if excess <= 0:
+                break
+            evicting.append(key)
+            excess -= size
+
+        self._delete(connection, evicting)
+        logger.info(f"Evicted {len(evicting)} geocoding responses from {self.directory}")
+
+
+_geocode_cache = None
+_geocode_cache_lock = threading.Lock()
+
+
+def get_geocode_cache():
+    global _geocode_cache
+
+    if _geocode_cache is None:
+        with _geocode_cache_lock:
+            if _geocode_cache is None:
+                _geocode_cache = GeocodeCache(
+                    settings.GEOCODE_CACHE_DIR, settings.GEOCODE_CACHE_TTL, settings.GEOCODE_CACHE_MAX_BYTES
+                )
+
+    return _geocode_cache
+
+
+def opencage_geocode(query, api_key, session=None, limiter=None, timeout=30, base_url=OPENCAGE_URL):
+    """
+    OpenCage response for `query` as (data, cached). Cached responses cost
+    no API request; `limiter.acquire()` is only called before a live one,
+    and a 429 response pauses the limiter for its Retry-After. Failed
+    requests raise requests.exceptions.RequestException and are not cached.
+    """
+    geocode_cache = get_geocode_cache()
+
+    try:
+        data = geocode_cache.get(query)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not read the geocoding cache: {e}")
+        data = None
+
+    if data is not None:
+        return data, True
+
+    if limiter is not None:
+        limiter.acquire()
+
+    response = (session or requests).get(base_url, params={"q": query, "key": api_key}, timeout=timeout)
+
+    if response.status_code == 429 and limiter is not None:
+        try:
+            retry_after = int(response.headers.get("Retry-After", 60))
+        except ValueError:
+            retry_after = 60
+        limiter.pause(retry_after)
+
+    response.raise_for_status()
+    data = response.json()
+
+    try:
+        geocode_cache.set(query, data)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Could not store the geocoding response for {query}: {e}")
+
+    return data, False
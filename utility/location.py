@@ -1,10 +1,87 @@
 import os
+import threading
+import time
+from collections import OrderedDict
+
 from django.conf import settings
 from django.http import HttpRequest
 from geoip2.database import Reader
+from geoip2.errors import AddressNotFoundError
 from ipware import get_client_ip
+from maxminddb import MODE_MMAP
 
 from locations.models import PlaceCoordinate, UniquePlace
+from locations.spatial import get_place_index
+
+GEOIP_DATABASE = "GeoLite2-City.mmdb"
+
+# Bounds of the per-process IP -> coordinates cache
+GEOIP_CACHE_SIZE = 10000
+GEOIP_CACHE_TTL = 60 * 60
+
+_geoip_reader = None
+_geoip_lock = threading.Lock()
+_ip_locations = OrderedDict()
+
+
+def get_geoip_reader():
+    """One memory-mapped GeoLite2 reader per process, opened on first use."""
+    global _geoip_reader
+
+    if _geoip_reader is None:
+        with _geoip_lock:
+            if _geoip_reader is None:
+                _geoip_reader = Reader(os.path.join(settings.GEOIP_PATH, GEOIP_DATABASE), mode=MODE_MMAP)
+
+    return _geoip_reader
+
+
+def _read_ip_location(ip):
+    # A missing or corrupt database raises here rather than reading as "not found"
+    reader = get_geoip_reader()
+
+    try:
+        response = reader.city(ip)
+    except (AddressNotFoundError, ValueError):
+        return None
+
+    return {
+        "latitude": response.location.latitude,
+        "longitude": response.location.longitude,
+    }
+
+
+def lookup_ip_location(ip):
+    """
+    {"latitude", "longitude"} of an IP address, or None when it is invalid
+    or not in the database. Results (including those misses) are kept in a
+    bounded LRU cache for GEOIP_CACHE_TTL seconds; errors opening or reading
+    the database are raised and never cached.
+    """
+    now = time.monotonic()
+
+    with _geoip_lock:
+        cached = _ip_locations.get(ip)
+        if cached is not None and cached[0] > now:
+            _ip_locations.move_to_end(ip)
+            location = cached[1]
+            return dict(location) if location else None
+
+    location = _read_ip_location(ip)
+
+    with _geoip_lock:
+        _ip_locations[ip] = (now + GEOIP_CACHE_TTL, location)
+        _ip_locations.move_to_end(ip)
+        while len(_ip_locations) > GEOIP_CACHE_SIZE:
+            _ip_locations.popitem(last=False)
+
+    return dict(location) if location else None
+
+
+def lookup_ip_locations(ips):
+    """Batch form of lookup_ip_location for log processing: {ip: location or None}."""
+    return {ip: lookup_ip_location(ip) for ip in dict.fromkeys(ips)}
+
 
 def get_ip_location(request: HttpRequest):
     ip, _ = get_client_ip(request)
@@ -13,61 +90,24 @@ def get_ip_location(request: HttpRequest):
     
     ip = request.META.get("HTTP_X_FORWARDED_FOR", "103.25.204.10")
 
-    # Path to the GeoLite2-City.mmdb file
-    db_path = os.path.join(settings.BASE_DIR, 'geoip', 'GeoLite2-City.mmdb')
+    return lookup_ip_location(ip)
 
-    try:
-        reader = Reader(db_path)
-        response = reader.city(ip)
 
-        # return {
-        #     "ip": ip,
-        #     "country": response.country.name,
-        #     "region": response.subdivisions.most_specific.name,
-        #     "city": response.city.name,
-        #     "latitude": response.location.latitude,
-        #     "longitude": response.location.longitude,
-        # }
+# Radius matching the old ±0.05° search box (0.05° of latitude)
+NEARBY_RADIUS_KM = 5.56
 
-        return {            
-            "latitude": response.location.latitude,
-            "longitude": response.location.longitude,
-        }
 
-    except Exception as e:
-        return None
-    finally:
-        reader.close()
-
-
-def get_nearby_locations(lat, lon):
+def get_nearby_locations(lat, lon, radius_km=NEARBY_RADIUS_KM):
     try:    
         lat = float(lat)
         lon = float(lon)
     except (TypeError, ValueError):
         return PlaceCoordinate.objects.none()
 
-    difference = 0.05
-
-    start_lat = lat - difference
-    start_lon = lon - difference
-
-    end_lat = lat + difference
-    end_lon = lon + difference
-
-    starting_point = [start_lat, start_lon]
-    ending_point = [end_lat, end_lon]
+    # One place per name, the nearest one
+    place_ids = get_place_index().nearby_ids(lat, lon, radius_km)
 
-    unfiltered_places = PlaceCoordinate.objects.filter(
-        latitude__range=(starting_point[0], ending_point[0]),
-        longitude__range=(starting_point[1], ending_point[1])
-    )
-
-    unique_places_dict = dict()
-    for place_obj in unfiltered_places:
-        unique_places_dict[place_obj.place.name] = place_obj.place.slug
-
-    return UniquePlace.objects.filter(slug__in = unique_places_dict.values()).select_related("district", "state")
+    return UniquePlace.objects.filter(id__in = place_ids).select_related("district", "state")
 
 
 from indic_transliteration import sanscript
@@ -114,4 +154,37 @@ def transliterate_place_name(text):
     simplified = re.sub(r'([a-z])\1+', r'\1', simplified)  # reduce double letters
     simplified = re.sub(r'[^a-z]', '', simplified)         # remove special characters
 
-    return simplified
\ No newline at end of file
+    return simplified
+
+import unicodedata
+
+# Romanizations that spell the same Indian place name differently
+SPELLING_VARIANTS = [
+    (re.compile(r"([kgcjtdpbs])h"), r"\1"),  # aspirates: kh, ch, th, dh, bh, sh, ...
+    (re.compile(r"ee"), "i"),
+    (re.compile(r"oo"), "u"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"z"), "j"),
+]
+
+def normalize_place_name(name):
+    """
+    Spelling-insensitive matching key of a place name. Names in Indian
+    scripts are transliterated first; case, accents, punctuation, notes in
+    brackets, aspirate and long vowel spellings and doubled letters are ignored.
+    """
+    if not name:
+        return ""
+
+    name = re.sub(r"\(.*?\)", " ", str(name))
+
+    if detect_script(name):
+        name = transliterate_place_name(name)
+
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").lower()
+    name = re.sub(r"[^a-z]", "", name)
+
+    for pattern, replacement in SPELLING_VARIANTS:
+        name = pattern.sub(replacement, name)
+
+    return re.sub(r"([a-z])\1+", r"\1", name)
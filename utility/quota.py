@@ -0,0 +1,202 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+# KEYS: daily counter, per second counter, pause marker
+# ARGV: daily budget, requests per second
+# Returns 1 when a request was reserved, 0 when the daily budget is used up,
+# or minus the number of milliseconds to wait before trying again.
+RESERVE_SCRIPT = """
+local paused = redis.call('PTTL', KEYS[3])
+if paused > 0 then
+    return -paused
+end
+
+if tonumber(redis.call('GET', KEYS[1]) or '0') >= tonumber(ARGV[1]) then
+    return 0
+end
+
+local second = redis.call('INCR', KEYS[2])
+if second == 1 then
+    redis.call('PEXPIRE', KEYS[2], 2000)
+end
+if second > tonumber(ARGV[2]) then
+    return -1
+end
+
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], 172800)
+return 1
+"""
+
+
+# KEYS: pause marker
+# ARGV: milliseconds to pause for
+# Sets the marker unless it already expires later, so a shorter pause never
+# cuts a longer one short.
+PAUSE_SCRIPT = """
+if redis.call('PTTL', KEYS[1]) < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], 1, 'PX', ARGV[1])
+end
+return 1
+"""
+
+
+class QuotaExhausted(Exception):
+    pass
+
+
+class ApiQuota:
+    """
+    Daily budgets and per-second rate limits of API keys, shared by every
+    process through Redis.
+
+    A request is reserved by one Lua script that checks a pause marker (set
+    from Retry-After), the key's UTC day counter and its current second
+    counter, and only then increments, so concurrent workers can never
+    spend more than the budget. `limits` maps a key name to
+    {"daily": ..., "per_second": ...}.
+    """
+
+    def __init__(self, redis, limits, prefix="api_quota"):
+        self.redis = redis
+        self.limits = limits
+        self.prefix = prefix
+        self._reserve = redis.register_script(RESERVE_SCRIPT)
+        self._pause = redis.register_script(PAUSE_SCRIPT)
+
+    def _day(self):
+        return datetime.now(timezone.utc).strftime("%Y%m%d")
+
+    def _daily_key(self, name):
+        return f"{self.prefix}:{name}:{self._day()}"
+
+    def _pause_key(self, name):
+        return f"{self.prefix}:{name}:paused"
+
+    def reserve(self, name):
+        """
+        Reserve one request for key `name`, waiting for the rate limit or a
+        pause to pass. Raises QuotaExhausted when the daily budget is spent.
+        """
+        limits = self.limits[name]
+
+        while True:
+            now = time.time()
+            result = self._reserve(
+                keys=[self._daily_key(name), f"{self.prefix}:{name}:second:{int(now)}", self._pause_key(name)],
+                args=[limits["daily"], limits["per_second"]],
+            )
+
+            if result == 1:
+                return
+            if result == 0:
+                raise QuotaExhausted(f"Daily budget of {name} is used up")
+
+            if result == -1:
+                time.sleep(1 - now % 1)
+            else:
+                time.sleep(-result / 1000)
+
+    def pause(self, name, seconds):
+        """Hold back every request of key `name` for at least `seconds` (e.g. from Retry-After)."""
+        milliseconds = max(int(seconds * 1000), 1)
+        self._pause(keys=[self._pause_key(name)], args=[milliseconds])
+
+    def used(self, name):
+        return int(self.redis.get(self._daily_key(name)) or 0)
+
+    def remaining(self, name):
+        return max(self.limits[name]["daily"] - self.used(name), 0)
+
+    def reset(self):
+        for name in self.limits:
+            self.redis.delete(self._daily_key(name))
+
+    def limiter(self, name):
+        return KeyLimiter(self, name)
+
+
+class KeyLimiter:
+    """Per-key view of an ApiQuota, used where a limiter with acquire()/pause() is expected."""
+
+    def __init__(self, quota, name):
+        self.quota = quota
+        self.name = name
+
+    def acquire(self):
+        self.quota.reserve(self.name)
+
+    def pause(self, seconds):
+        self.quota.pause(self.name, seconds)
+
+
+class WorkQueue:
+    """
+    Chunks of work items in a Redis list. Workers lease one chunk at a time,
+    so whichever worker (API key) still has budget keeps taking work, and
+    put back what they could not finish. Items that failed are kept in a
+    dead-letter set until the queue is filled again.
+    """
+
+    def __init__(self, redis, name):
+        self.redis = redis
+        self.key = f"work_queue:{name}"
+        self.failed_key = f"work_queue:{name}:failed"
+
+    def fill(self, items, chunk_size):
+        items = list(items)
+
+        self.redis.delete(self.key, self.failed_key)
+        chunks = [json.dumps(items[start:start + chunk_size]) for start in range(0, len(items), chunk_size)]
+        if chunks:
+            self.redis.rpush(self.key, *chunks)
+
+        return len(chunks)
+
+    def lease(self):
+        chunk = self.redis.lpop(self.key)
+        return json.loads(chunk) if chunk is not None else None
+
+    def release(self, items):
+        if items:
+            self.redis.lpush(self.key, json.dumps(list(items)))
+
+    def fail(self, items):
+        if items:
+            self.redis.sadd(self.failed_key, *(json.dumps(item) for item in items))
+
+    def failures(self):
+        return sorted(json.loads(item) for item in self.redis.smembers(self.failed_key))
+
+    def __len__(self):
+        return self.redis.llen(self.key)
+
+
+_opencage_quota = None
+_opencage_quota_lock = threading.Lock()
+
+
+def get_opencage_quota():
+    """ApiQuota of the OpenCage keys in settings.OPENCAGE_KEY_LIMITS, on the default cache's Redis."""
+    global _opencage_quota
+
+    if _opencage_quota is None:
+        with _opencage_quota_lock:
+            if _opencage_quota is None:
+                from django_redis import get_redis_connection
+
+                _opencage_quota = ApiQuota(
+                    get_redis_connection("default"), settings.OPENCAGE_KEY_LIMITS, prefix="opencage_quota"
+                )
+
+    return _opencage_quota
+
+
+def get_opencage_limiter(key_name):
+    """(api_key, limiter) of the OpenCage key stored in the `key_name` environment variable."""
+    return os.getenv(key_name), get_opencage_quota().limiter(key_name)
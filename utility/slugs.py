@@ -0,0 +1,96 @@
+def _numbered(base_slug, count):
+    return f"{base_slug}{count}"
+
+
+def _queryset(model):
+    # A model, or a queryset to restrict the rows checked (e.g. excluding the instance itself)
+    return model._default_manager.all() if isinstance(model, type) else model
+
+
+def _taken(queryset, field):
+    # MySQL compares slugs case-insensitively
+    return {slug.lower() for slug in queryset.values_list(field, flat=True).iterator() if slug is not None}
+
+
+def _candidates_filter(base_slug, field):
+    """Filter matching every slug that base_slug or one of its numbered forms could clash with."""
+    if not base_slug:
+        # Every slug starts with "": only the empty and the all-digit slugs can clash
+        return {f"{field}__regex": r"^[0-9]*$"}
+    return {f"{field}__istartswith": base_slug}
+
+
+def allocate_slug(model, base_slug, start=1, field="slug"):
+    """
+    First of `base_slug`, `base_slug{start}`, `base_slug{start + 1}`, ...
+    that no row of `model` (a model or queryset) uses, found with a single
+    prefix query instead of one exists() query per candidate.
+    """
+    taken = _taken(_queryset(model).filter(**_candidates_filter(base_slug, field)), field)
+
+    slug = base_slug
+    count = start
+    while slug.lower() in taken:
+        slug = _numbered(base_slug, count)
+        count += 1
+
+    return slug
+
+
+def first_free_slug(model, candidates, field="slug"):
+    """First of `candidates` that no row of `model` uses, else the last one."""
+    taken = _taken(_queryset(model).filter(**{f"{field}__in": candidates}), field)
+    return next((slug for slug in candidates if slug.lower() not in taken), candidates[-1])
+
+
+class SlugAllocator:
+    """
+    Hands out slugs for bulk imports. The slugs of `model` that can clash
+    with a base slug are loaded with one prefix query the first time that
+    base is seen, and every slug handed out is added to the same set, so
+    repeated names cost a few set lookups and instances can be created with
+    bulk_create.
+    """
+
+    def __init__(self, model, field="slug"):
+        self.queryset = _queryset(model)
+        self.field = field
+        self.taken = set()
+        # Base slugs whose clashing slugs are in `taken`, and slugs looked up on their own
+        self.loaded = set()
+        self.checked = set()
+        # Next counter to try per base slug, so repeated names don't rescan
+        self.counters = {}
+
+    def _load(self, base_slug):
+        key = base_slug.lower()
+        if key not in self.loaded:
+            self.taken |= _taken(self.queryset.filter(**_candidates_filter(base_slug, self.field)), self.field)
+            self.loaded.add(key)
+
+    def allocate(self, base_slug, start=1):
+        self._load(base_slug)
+        slug = base_slug
+
+        if slug.lower() in self.taken:
+            count = self.counters.get(base_slug, start)
+            slug = _numbered(base_slug, count)
+            while slug.lower() in self.taken:
+                count += 1
+                slug = _numbered(base_slug, count)
+            self.counters[base_slug] = count + 1
+
+        self.taken.add(slug.lower())
+        return slug
+
+    def first_free(self, candidates):
+        unknown = [
+            slug for slug in candidates if slug.lower() not in self.loaded and slug.lower() not in self.checked
+        ]
+        if unknown:
+            self.taken |= _taken(self.queryset.filter(**{f"{self.field}__in": unknown}), self.field)
+            self.checked.update(slug.lower() for slug in unknown)
+
+        slug = next((slug for slug in candidates if slug.lower() not in self.taken), candidates[-1])
+        self.taken.add(slug.lower())
+        return slug
@@ -0,0 +1,142 @@
+import threading
+import time
+from unittest import mock
+
+import fakeredis
+from django.test import SimpleTestCase
+
+from .quota import ApiQuota, QuotaExhausted, WorkQueue
+
+
+class FakeClock:
+    """Stands in for the time module of utility.quota: sleep() moves time() forward instead of waiting."""
+
+    def __init__(self, start=1000.0):
+        self.now = start
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ApiQuotaTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+
+    def quota(self, daily=100, per_second=1000):
+        return ApiQuota(self.redis, {"key": {"daily": daily, "per_second": per_second}}, prefix="test_quota")
+
+    def test_concurrent_reservations_never_exceed_the_daily_budget(self):
+        quota = self.quota(daily=50)
+        reserved = []
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                try:
+                    quota.reserve("key")
+                except QuotaExhausted:
+                    return
+                with lock:
+                    reserved.append(1)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(reserved), 50)
+        self.assertEqual(quota.used("key"), 50)
+        self.assertEqual(quota.remaining("key"), 0)
+
+    def test_reserve_holds_to_the_per_second_limit(self):
+        quota = self.quota(per_second=3)
+        clock = FakeClock()
+        seconds = []
+
+        with mock.patch("utility.quota.time", clock):
+            for _ in range(7):
+                quota.reserve("key")
+                seconds.append(int(clock.time()))
+
+        self.assertEqual(seconds, [1000, 1000, 1000, 1001, 1001, 1001, 1002])
+        self.assertEqual(quota.used("key"), 7)
+
+    def test_reserve_waits_out_a_pause(self):
+        quota = self.quota()
+        quota.pause("key", 0.3)
+
+        started = time.monotonic()
+        quota.reserve("key")
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.25)
+        self.assertEqual(quota.used("key"), 1)
+
+    def test_pause_is_only_ever_extended(self):
+        quota = self.quota()
+        pause_key = "test_quota:key:paused"
+
+        quota.pause("key", 60)
+        quota.pause("key", 1)
+        self.assertGreater(self.redis.pttl(pause_key), 50000)
+
+        quota.pause("key", 120)
+        self.assertGreater(self.redis.pttl(pause_key), 110000)
+
+    def test_reserve_raises_once_the_budget_is_spent(self):
+        quota = self.quota(daily=2)
+        quota.reserve("key")
+        quota.reserve("key")
+
+        with self.assertRaises(QuotaExhausted):
+            quota.reserve("key")
+
+
+class WorkQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.queue = WorkQueue(fakeredis.FakeRedis(), "test")
+
+    def test_fill_splits_items_into_chunks(self):
+        self.assertEqual(self.queue.fill(range(10), 4), 3)
+        self.assertEqual(len(self.queue), 3)
+        self.assertEqual(self.queue.lease(), [0, 1, 2, 3])
+
+    def test_released_items_are_leased_again(self):
+        self.queue.fill(range(10), 4)
+
+        chunk = self.queue.lease()
+        # A worker that ran out of budget after the first two items puts the rest back
+        self.queue.release(chunk[2:])
+        self.assertEqual(len(self.queue), 3)
+
+        leased = []
+        while (chunk := self.queue.lease()) is not None:
+            leased.extend(chunk)
+
+        self.assertEqual(leased[:2], [2, 3])
+        self.assertEqual(sorted(leased), list(range(2, 10)))
+        self.assertEqual(len(self.queue), 0)
+
+    def test_failed_items_are_kept_until_the_next_fill(self):
+        self.queue.fill(range(4), 4)
+        self.queue.lease()
+        self.queue.fail([3, 1])
+        self.queue.fail([])
+
+        self.assertEqual(self.queue.failures(), [1, 3])
+        self.assertIsNone(self.queue.lease())
+
+        self.queue.fill(range(4), 4)
+        self.assertEqual(self.queue.failures(), [])
+
+    def test_release_of_nothing_adds_no_chunk(self):
+        self.queue.fill(range(4), 4)
+        self.queue.lease()
+        self.queue.release([])
+
+        self.assertIsNone(self.queue.lease())